@@ -0,0 +1,266 @@
+import os
+import sys
+import time
+import logging
+import numpy as np
+from sklearn.base import clone
+from sklearn.preprocessing import StandardScaler
+
+from indicators import compute_indicators, FEATURE_COLUMNS
+from kline_store import KlineStore, OHLCV_COLUMNS
+from model_training import make_candidates, _limit_threads
+from signals import SIGNAL_LABELS, SIGNAL_POSITIONS, signal_codes
+
+logger = logging.getLogger(__name__)
+
+def feature_matrix(df):
+    """(X, close) của một DataFrame OHLCV: X theo thứ tự FEATURE_COLUMNS, NaN ở các nến chưa đủ dữ liệu"""
+    columns = {col: df[col].to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS}
+    columns.update(compute_indicators(*(columns[col] for col in OHLCV_COLUMNS)))
+    return np.column_stack([columns[col] for col in FEATURE_COLUMNS]), columns['close']
+
+def walk_forward_predict(X, close, model, train_window, retrain_every, horizon=1, min_samples=50):
+    """Dự đoán close[t + horizon] cho mỗi nến t theo walk-forward, trả về (predicted, số lần fit).
+
+    Mỗi retrain_every nến, model (và scaler) được fit lại trên train_window dòng gần nhất
+    mà target đã biết tại thời điểm đó (dòng i có target khi i + horizon <= t), rồi dự đoán
+    cả khối nến tiếp theo trong một lần predict. Chỉ báo chỉ dùng dữ liệu quá khứ nên không nhìn trước.
+    """
+    n = len(close)
+    predicted = np.full(n, np.nan)
+    target = np.full(n, np.nan)
+    target[:n - horizon] = close[horizon:]
+    valid = np.isfinite(X).all(axis=1)
+    if not valid.any():
+        return predicted, 0
+
+    fits = 0
+    # Lần fit đầu khi đủ train_window dòng có chỉ báo (dữ liệu ngắn hơn thì dùng nửa đầu để training)
+    first = int(np.argmax(valid)) + min(train_window, max(min_samples, n // 2)) + horizon - 1
+    for start in range(first, n, retrain_every):
+        train_end = start - horizon + 1
+        rows = np.arange(max(0, train_end - train_window), train_end)
+        rows = rows[valid[rows]]
+        block = np.arange(start, min(start + retrain_every, n))
+        block = block[valid[block]]
+        if len(rows) < min_samples or not len(block):
+            continue
+
+        scaler = StandardScaler().fit(X[rows])
+        fitted = _limit_threads(clone(model), 1).fit(scaler.transform(X[rows]), target[rows])
+        predicted[block] = fitted.predict(scaler.transform(X[block]))
+        fits += 1
+    return predicted, fits
+
+def evaluate_signals(predicted, close, horizon=1, fee=0.001):
+    """Đánh giá recommendation cho mọi nến của mọi symbol trong các phép NumPy.
+
+    predicted, close: mảng (symbols, bars) (hoặc 1-D), NaN là không có dự đoán/dữ liệu.
+    Tín hiệu ở nến t giữ vị thế theo SIGNAL_POSITIONS đến nến t + 1, phí = fee * |thay đổi vị thế|.
+    Trả về dict các mảng theo symbol và thống kê theo từng loại tín hiệu.
+    """
+    predicted = np.atleast_2d(np.asarray(predicted, dtype=np.float64))
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change = (predicted - close) / close * 100
+        next_return = np.full_like(close, np.nan)
+        next_return[:, :-1] = close[:, 1:] / close[:, :-1] - 1
+        actual = np.full_like(close, np.nan)
+        actual[:, :close.shape[1] - horizon] = close[:, horizon:]
+        forward_return = actual / close - 1
+
+    evaluated = np.isfinite(change) & np.isfinite(next_return)
+    codes = signal_codes(np.where(evaluated, change, np.nan))
+    positions = SIGNAL_POSITIONS[codes]
+
+    # Lợi nhuận chiến lược theo nến và equity (log để cộng dồn)
+    turnover = np.abs(np.diff(positions, axis=1, prepend=0))
+    strategy = np.where(evaluated, positions * np.nan_to_num(next_return), 0.0) - fee * turnover
+    log_equity = np.cumsum(np.log1p(strategy), axis=1)
+    drawdown = 1 - np.exp(log_equity - np.maximum.accumulate(log_equity, axis=1))
+    buy_hold = np.expm1(np.log1p(np.where(evaluated, next_return, 0.0)).sum(axis=1))
+
+    # Hit rate: tín hiệu mua/bán đúng chiều giá sau `horizon` nến
+    known = evaluated & np.isfinite(forward_return)
+    active = known & (positions != 0)
+    hits = active & (np.sign(forward_return) == positions)
+
+    # Sai số dự đoán giá
+    errors = np.where(known, np.abs(predicted - actual), 0.0)
+    pct_errors = np.where(known, errors / np.abs(np.where(known, actual, 1.0)), 0.0)
+    direction = known & (np.sign(predicted - close) == np.sign(actual - close))
+
+    counts = known.sum(axis=1)
+    active_counts = active.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = {
+            'bars': evaluated.sum(axis=1),
+            'trades': (turnover > 0).sum(axis=1),
+            'pnl': np.expm1(log_equity[:, -1]),
+            'buy_hold': buy_hold,
+            'max_drawdown': drawdown.max(axis=1),
+            'exposure': active_counts / counts,
+            'hit_rate': hits.sum(axis=1) / active_counts,
+            'mae': errors.sum(axis=1) / counts,
+            'mape': pct_errors.sum(axis=1) / counts * 100,
+            'direction_accuracy': direction.sum(axis=1) / counts
+        }
+        # Gộp mọi symbol: PnL của danh mục chia đều vốn, các tỷ lệ tính trên tổng số nến
+        total_known = counts.sum()
+        result['total'] = {
+            'bars': int(evaluated.sum()),
+            'pnl': np.nanmean(result['pnl']),
+            'buy_hold': np.nanmean(buy_hold),
+            'hit_rate': hits.sum() / active_counts.sum(),
+            'mae': errors.sum() / total_known,
+            'mape': pct_errors.sum() / total_known * 100,
+            'direction_accuracy': direction.sum() / total_known
+        }
+
+    # Theo loại tín hiệu, gộp mọi symbol
+    flat_codes = codes[known]
+    flat_returns = forward_return[known]
+    totals = np.bincount(flat_codes, minlength=len(SIGNAL_LABELS))
+    return_sums = np.bincount(flat_codes, weights=flat_returns, minlength=len(SIGNAL_LABELS))
+    hit_sums = np.bincount(flat_codes, weights=np.sign(flat_returns) == SIGNAL_POSITIONS[flat_codes],
+                           minlength=len(SIGNAL_LABELS))
+    result['signals'] = {
+        label: {
+            'count': int(totals[code]),
+            'avg_return_percent': float(return_sums[code] / totals[code] * 100) if totals[code] else None,
+            'hit_rate': float(hit_sums[code] / totals[code]) if totals[code] and SIGNAL_POSITIONS[code] else None
+        }
+        for code, label in enumerate(SIGNAL_LABELS)
+    }
+    return result
+
+def _stack(arrays):
+    """Xếp các mảng 1-D dài khác nhau thành (len(arrays), max_len), phần thiếu là NaN"""
+    stacked = np.full((len(arrays), max((len(a) for a in arrays), default=0)), np.nan)
+    for i, array in enumerate(arrays):
+        stacked[i, :len(array)] = array
+    return stacked
+
+class WalkForwardBacktest:
+    """Backtest recommendation của predict_price trên nến đã lưu trong KlineStore, không gọi API.
+
+    Model được retrain theo cửa sổ trượt (walk-forward) thay vì chia train/test xáo trộn,
+    nên MAE/MAPE và hit rate là kết quả ngoài mẫu thật sự.
+    """
+
+    def __init__(self, model=None, train_window=None, retrain_every=None, horizon=None, fee=None):
+        self.model_name = model or os.getenv('BACKTEST_MODEL', 'lr')
+        candidates = make_candidates()
+        if self.model_name not in candidates:
+            raise ValueError(f"BACKTEST_MODEL phải là một trong {', '.join(candidates)}")
+        self.model = candidates[self.model_name]
+        # Giống production: training trên 500 nến gần nhất, retrain mỗi ngày (24 nến 1h)
+        self.train_window = int(train_window or os.getenv('BACKTEST_TRAIN_WINDOW', '500'))
+        self.retrain_every = int(retrain_every or os.getenv('BACKTEST_RETRAIN_EVERY', '24'))
+        self.horizon = int(horizon or os.getenv('BACKTEST_HORIZON', '1'))
+        self.fee = float(fee if fee is not None else os.getenv('BACKTEST_FEE', '0.001'))
+        self.stats = {'symbols': 0, 'bars': 0, 'fits': 0, 'predict_seconds': 0.0, 'signal_seconds': 0.0}
+
+    def load(self, symbols=None, interval='1h', store=None):
+        """{symbol: DataFrame OHLCV} từ KlineStore (mặc định mọi symbol đã lưu của interval)"""
+        store = store or KlineStore()
+        symbols = symbols or store.stored_symbols(interval)
+        frames = {}
+        for symbol in symbols:
+            df = store.read(symbol, interval)
+            if len(df):
+                frames[symbol] = df
+            else:
+                logger.warning(f"Không có nến {interval} đã lưu cho {symbol}")
+        return frames
+
+    def predict(self, df):
+        """(predicted, close) walk-forward cho một symbol"""
+        X, close = feature_matrix(df)
+        predicted, fits = walk_forward_predict(X, close, self.model, self.train_window,
+                                               self.retrain_every, self.horizon)
+        self.stats['fits'] += fits
+        return predicted, close
+
+    def run(self, frames):
+        """Chạy backtest cho {symbol: DataFrame}, trả về báo cáo theo symbol, tổng hợp và theo tín hiệu"""
+        symbols = list(frames)
+        if not symbols:
+            return None
+
+        started = time.perf_counter()
+        predictions = [self.predict(frames[symbol]) for symbol in symbols]
+        self.stats['predict_seconds'] += time.perf_counter() - started
+
+        # Lớp tín hiệu: mọi nến của mọi symbol trong một lần
+        predicted = _stack([p for p, _ in predictions])
+        close = _stack([c for _, c in predictions])
+        started = time.perf_counter()
+        result = evaluate_signals(predicted, close, self.horizon, self.fee)
+        signal_seconds = time.perf_counter() - started
+
+        self.stats['symbols'] += len(symbols)
+        self.stats['bars'] += result['total']['bars']
+        self.stats['signal_seconds'] += signal_seconds
+
+        per_symbol = {
+            symbol: {key: _number(values[i]) for key, values in result.items() if key not in ('signals', 'total')}
+            for i, symbol in enumerate(symbols)
+        }
+        return {
+            'model': self.model_name,
+            'train_window': self.train_window,
+            'retrain_every': self.retrain_every,
+            'horizon': self.horizon,
+            'symbols': per_symbol,
+            'total': {key: _number(value) for key, value in result['total'].items()},
+            'signals': result['signals'],
+            'signal_seconds': signal_seconds,
+            'bars_per_second': predicted.size / signal_seconds if signal_seconds else None
+        }
+
+    def metrics(self):
+        return dict(self.stats)
+
+def _number(value):
+    """Số Python cho báo cáo: số nguyên giữ nguyên, NaN/inf thành None"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+def _percent(value):
+    return f"{value * 100:7.2f}%" if value is not None else "    n/a"
+
+def main():
+    """python backtest.py [SYMBOL ...]: backtest trên nến 1h đã lưu (mặc định mọi symbol trong store)"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    backtest = WalkForwardBacktest()
+    frames = backtest.load([s.upper() for s in sys.argv[1:]] or None, interval='1h')
+    report = backtest.run(frames)
+    if report is None:
+        print("Không có dữ liệu nến đã lưu để backtest (chạy bot để KlineStore lưu nến trước)")
+        return
+
+    print(f"\n📉 Backtest walk-forward: model {report['model']}, train {report['train_window']} nến, "
+          f"retrain mỗi {report['retrain_every']} nến, dự đoán {report['horizon']} nến tới")
+    print("=" * 70)
+    print(f"{'Symbol':<12}{'Nến':>8}{'PnL':>10}{'Buy&Hold':>10}{'Hit rate':>10}{'MAPE':>10}{'Max DD':>10}")
+    for symbol, row in report['symbols'].items():
+        mape = f"{row['mape']:7.2f}%" if row['mape'] is not None else "    n/a"
+        print(f"{symbol:<12}{row['bars']:>8}{_percent(row['pnl']):>10}{_percent(row['buy_hold']):>10}"
+              f"{_percent(row['hit_rate']):>10}{mape:>10}{_percent(row['max_drawdown']):>10}")
+    total = report['total']
+    print("-" * 70)
+    print(f"{'Tổng':<12}{total['bars']:>8}{_percent(total['pnl']):>10}{_percent(total['buy_hold']):>10}"
+          f"{_percent(total['hit_rate']):>10}")
+    print("\nTheo tín hiệu:")
+    for label, row in report['signals'].items():
+        avg = f"{row['avg_return_percent']:+.3f}%" if row['avg_return_percent'] is not None else "n/a"
+        print(f"   {label:<16} {row['count']:>7} nến, lợi nhuận TB {avg:>9}, hit rate {_percent(row['hit_rate'])}")
+    if report['bars_per_second']:
+        print(f"\nLớp tín hiệu: {report['bars_per_second']:,.0f} nến/s")
+
+if __name__ == '__main__':
+    main()
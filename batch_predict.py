@@ -0,0 +1,51 @@
+import logging
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+def scale_rows(scalers, X):
+    """Chuẩn hóa dòng i của X bằng scalers[i].
+
+    Các StandardScaler được tính trong một phép NumPy cho cả ma trận, scaler khác gọi transform từng dòng.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    scaled = np.empty_like(X)
+    standard = [i for i, scaler in enumerate(scalers) if type(scaler) is StandardScaler]
+    if standard:
+        means = np.vstack([scalers[i].mean_ if scalers[i].with_mean else np.zeros(X.shape[1]) for i in standard])
+        scales = np.vstack([scalers[i].scale_ if scalers[i].with_std else np.ones(X.shape[1]) for i in standard])
+        scaled[standard] = (X[standard] - means) / scales
+    for i in sorted(set(range(len(scalers))) - set(standard)):
+        scaled[i] = scalers[i].transform(X[i:i + 1])[0]
+    return scaled
+
+def predict_rows(models, X):
+    """Dự đoán dòng i của X bằng models[i], gộp theo model.
+
+    - LinearRegression: một phép einsum cho cả nhóm
+    - model khác: một lần predict() cho mọi dòng dùng chung model đó
+
+    Model lỗi hoặc sai số feature cho NaN ở các dòng của nó, không làm hỏng cả batch.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    predictions = np.full(len(models), np.nan)
+    valid = [i for i, model in enumerate(models) if getattr(model, 'n_features_in_', X.shape[1]) == X.shape[1]]
+
+    linear = [i for i in valid if type(models[i]) is LinearRegression and np.ndim(models[i].coef_) == 1]
+    if linear:
+        coefs = np.vstack([models[i].coef_ for i in linear])
+        intercepts = np.array([models[i].intercept_ for i in linear], dtype=np.float64)
+        predictions[linear] = np.einsum('ij,ij->i', X[linear], coefs) + intercepts
+
+    groups = {}
+    for i in sorted(set(valid) - set(linear)):
+        groups.setdefault(id(models[i]), []).append(i)
+    for rows in groups.values():
+        model = models[rows[0]]
+        try:
+            predictions[rows] = model.predict(X[rows])
+        except Exception as e:
+            logger.error(f"Lỗi dự đoán {len(rows)} dòng ({type(model).__name__}): {e}")
+    return predictions
@@ -1,143 +1,422 @@
 import os
+import json
+import time
+import hmac
+import hashlib
 import asyncio
 import aiohttp
-import pandas as pd
-from datetime import datetime, timedelta
-from binance.client import Client
-from binance.exceptions import BinanceAPIException
+from functools import partial
+from urllib.parse import urlencode
+from email.utils import parsedate_to_datetime
 import logging
 
+from market_stream import MarketStream
+from order_book import DepthStream
+from market_cap import MarketCapCache
+from host_pool import HostPool, DEFAULT_BASE_URLS
+from health_monitor import HealthMonitor
+from market_universe import UniverseSnapshot
+from symbol_index import SymbolIndex
+from single_flight import SingleFlight
+from rate_limiter import RequestScheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, request_weight
+from kline_codec import decode_klines
+from kline_store import (
+    KlineStore, INTERVAL_MS, backfill, candle_open_time, to_milliseconds, to_ohlcv_frame
+)
+
 logger = logging.getLogger(__name__)
 
+def server_time_ms(headers):
+    """Thời điểm sàn tạo response (ms) từ header Date, None nếu thiếu"""
+    # Date làm tròn xuống giây nên không bao giờ muộn hơn đồng hồ thật của sàn
+    try:
+        return int(parsedate_to_datetime(headers['Date']).timestamp() * 1000)
+    except (KeyError, TypeError, ValueError):
+        return None
+
 class BinanceClient:
     def __init__(self):
         self.api_key = os.getenv('BINANCE_API_KEY')
         self.secret_key = os.getenv('BINANCE_SECRET_KEY')
         
-        # Khởi tạo client (có thể hoạt động mà không cần API key cho dữ liệu công khai)
+        if not (self.api_key and self.secret_key):
+            logger.warning("Sử dụng Binance API công khai - một số tính năng có thể bị hạn chế")
+        
+        # Cấu hình connection pool dùng chung cho API công khai
+        self.base_url = os.getenv('BINANCE_BASE_URL', 'https://api.binance.com')
+        self.pool_limit = int(os.getenv('BINANCE_POOL_LIMIT', '100'))
+        self.pool_limit_per_host = int(os.getenv('BINANCE_POOL_LIMIT_PER_HOST', '20'))
+        self.dns_cache_ttl = int(os.getenv('BINANCE_DNS_CACHE_TTL', '300'))
+        self.keepalive_timeout = float(os.getenv('BINANCE_KEEPALIVE_TIMEOUT', '30'))
+        self.request_timeout = float(os.getenv('BINANCE_REQUEST_TIMEOUT', '10'))
+        self.session = None
+        
+        # Các host REST tương đương: hedged request cho request tương tác, circuit breaker theo host
+        base_urls = [url.strip().rstrip('/') for url in
+                     os.getenv('BINANCE_BASE_URLS', ','.join(DEFAULT_BASE_URLS)).split(',') if url.strip()]
+        self.host_pool = HostPool([self.base_url] + [url for url in base_urls if url != self.base_url.rstrip('/')])
+        self.hedge_enabled = os.getenv('BINANCE_HEDGE_ENABLED', 'True').lower() == 'true'
+        # Request nặng (ticker toàn thị trường, exchangeInfo, depth lớn) không hedge: bản dự phòng tốn gấp đôi weight
+        self.hedge_max_weight = int(os.getenv('BINANCE_HEDGE_MAX_WEIGHT', '10'))
+        
+        # Điều phối request theo weight Binance, ưu tiên request của người dùng
+        self.scheduler = RequestScheduler()
+        
+        # Gộp các request giống hệt nhau đang chạy đồng thời
+        self.single_flight = SingleFlight()
+        
+        # Số symbol tối đa trong một request batch (giới hạn độ dài URL)
+        self.batch_chunk_size = int(os.getenv('BINANCE_BATCH_CHUNK_SIZE', '100'))
+        
+        # Snapshot 24h toàn thị trường dùng chung cho top gainers/losers
+        self.universe_ttl = float(os.getenv('BINANCE_UNIVERSE_TTL', '30'))
+        self.universe = None
+        self._universe_lock = asyncio.Lock()
+        
+        # Index exchangeInfo: load từ đĩa khi khởi động, làm mới ở background
+        self.symbol_index = SymbolIndex(os.getenv('BINANCE_EXCHANGE_INFO_CACHE', 'cache/exchange_info.json'))
+        self.exchange_info_ttl = float(os.getenv('BINANCE_EXCHANGE_INFO_TTL', '3600'))
+        self._symbol_index_lock = asyncio.Lock()
+        self._symbol_index_task = None
+        
+        # Market cap từ CoinGecko: index symbol -> coin id, cache theo TTL cho cả watchlist
+        self.market_caps = MarketCapCache(self._fetch_json)
+        
+        # Kho nến cục bộ cho get_historical_data
+        self.kline_store_enabled = os.getenv('KLINE_STORE_ENABLED', 'True').lower() == 'true'
+        self.kline_store = KlineStore() if self.kline_store_enabled else None
+        
+        # Số request /klines chạy song song khi backfill
+        self.backfill_semaphore = asyncio.Semaphore(int(os.getenv('BINANCE_BACKFILL_CONCURRENCY', '5')))
+        if self.kline_store is not None:
+            self.kline_store.semaphore = self.backfill_semaphore
+        
+        # Bảng ticker real-time từ WebSocket (chỉ chạy khi gọi start())
+        self.stream_enabled = os.getenv('BINANCE_STREAM_ENABLED', 'True').lower() == 'true'
+        self.market_stream = MarketStream() if self.stream_enabled else None
+        
+        # Probe Binance và CoinGecko ở background; các service khác có thể đăng ký thêm probe
+        self.health_monitor = HealthMonitor()
+        self.health_monitor.add_probe('binance', self.ping)
+        self.health_monitor.add_probe('coingecko', self.ping_coingecko,
+                                      interval=self.health_monitor.third_party_interval)
+        
+        # Order book cục bộ từ depth diff stream, symbol được đăng ký khi gọi get_order_book
+        self.depth_enabled = os.getenv('BINANCE_DEPTH_ENABLED', 'True').lower() == 'true'
+        self.depth_stream = DepthStream(self._fetch_depth_snapshot) if self.depth_enabled else None
+    
+    async def start(self):
+        """Mở connection pool và market stream"""
+        session = await self._get_session()
+        if self.market_stream is not None:
+            self.market_stream.start(session)
+        if self.depth_stream is not None:
+            self.depth_stream.start(session)
+        if self._symbol_index_task is None or self._symbol_index_task.done():
+            self._symbol_index_task = asyncio.create_task(self._symbol_index_loop())
+        self.health_monitor.start()
+        return session
+    
+    async def _get_session(self):
+        """Khởi tạo session aiohttp dùng chung (keep-alive, DNS cache)"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+        return self.session
+    
+    async def close(self):
+        """Dừng market stream, đóng session và giải phóng các kết nối trong pool"""
+        if self.market_stream is not None:
+            await self.market_stream.stop()
+        if self.depth_stream is not None:
+            await self.depth_stream.stop()
+        await self.health_monitor.stop()
+        if self._symbol_index_task is not None:
+            self._symbol_index_task.cancel()
+            try:
+                await self._symbol_index_task
+            except asyncio.CancelledError:
+                pass
+            self._symbol_index_task = None
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+    
+    async def _fetch_json(self, url, params=None, headers=None):
+        """GET một URL qua session dùng chung và trả về JSON (gộp các lời gọi trùng)"""
+        key = ('GET', url, tuple(sorted((params or {}).items())))
+        return await self.single_flight.do(key, self._get_json, url, params, headers)
+    
+    async def _get_json(self, url, params=None, headers=None):
+        session = await self._get_session()
+        async with session.get(url, params=params, headers=headers) as response:
+            response.raise_for_status()
+            return await response.json()
+    
+    def _sign(self, params):
+        """Ký HMAC-SHA256 cho endpoint SIGNED của Binance"""
+        params = dict(params or {})
+        params['timestamp'] = int(time.time() * 1000)
+        query = urlencode(params)
+        params['signature'] = hmac.new(
+            self.secret_key.encode(), query.encode(), hashlib.sha256
+        ).hexdigest()
+        return params
+    
+    async def _request(self, path, params=None, signed=False, priority=PRIORITY_INTERACTIVE, raw=False):
+        """Gọi endpoint REST của Binance (bất đồng bộ hoàn toàn, qua rate limiter); raw=True trả về (bytes, server time ms)"""
+        headers = None
+        if self.api_key:
+            headers = {'X-MBX-APIKEY': self.api_key}
+        if signed:
+            if not (self.api_key and self.secret_key):
+                raise ValueError("Endpoint SIGNED yêu cầu BINANCE_API_KEY và BINANCE_SECRET_KEY")
+            params = self._sign(params)
+            return await self._send(path, params, headers, priority, raw, signed=True)
+        
+        # Request công khai giống hệt nhau (cùng mức ưu tiên) dùng chung một lần gọi upstream
+        key = (path, tuple(sorted((params or {}).items())), priority, raw)
+        return await self.single_flight.do(key, self._send, path, params, headers, priority, raw)
+    
+    async def _send(self, path, params, headers, priority, raw=False, signed=False):
+        weight = request_weight(path, params)
+        await self.scheduler.acquire(weight, priority)
+        session = await self._get_session()
+        
+        async def send(base_url, attempt):
+            if attempt:
+                # Request dự phòng/failover cũng bị sàn tính weight
+                self.scheduler.charge(weight)
+            async with session.get(f"{base_url}{path}", params=params, headers=headers) as response:
+                self.scheduler.update_from_response(response.status, response.headers)
+                response.raise_for_status()
+                if raw:
+                    return await response.read(), server_time_ms(response.headers)
+                return await response.json()
+        
+        # data-api.binance.vision chỉ phục vụ dữ liệu thị trường, không nhận endpoint SIGNED
+        return await self.host_pool.request(
+            send,
+            hedge=(self.hedge_enabled and not signed and priority == PRIORITY_INTERACTIVE
+                   and weight <= self.hedge_max_weight),
+            exclude=(lambda url: 'data-api' in url) if signed else None
+        )
+    
+    def get_request_metrics(self):
+        """Độ sâu hàng đợi, budget weight, thống kê throttle, single-flight và latency từng host"""
+        return {
+            **self.scheduler.metrics(),
+            'single_flight': self.single_flight.metrics(),
+            'hosts': self.host_pool.metrics()
+        }
+    
+    def _stream_ticker(self, symbol):
+        """Lấy ticker từ market stream nếu còn mới"""
+        if self.market_stream is None:
+            return None
+        return self.market_stream.get_ticker(symbol)
+    
+    def _parse_24h_ticker(self, data):
+        """Chuyển ticker 24h dạng REST thành dict chuẩn"""
+        return {
+            'symbol': data['symbol'],
+            'price': float(data['lastPrice']),
+            'change': float(data['priceChange']),
+            'change_percent': float(data['priceChangePercent']),
+            'high': float(data['highPrice']),
+            'low': float(data['lowPrice']),
+            'volume': float(data['volume']),
+            'quote_volume': float(data['quoteVolume'])
+        }
+    
+    async def _fetch_batch(self, path, symbols):
+        """Gọi endpoint ticker với symbols=[...], chia nhóm và chạy song song"""
+        async def fetch_chunk(chunk):
+            try:
+                return await self._request(path, {'symbols': json.dumps(chunk, separators=(',', ':'))})
+            except aiohttp.ClientResponseError as e:
+                if e.status != 400:
+                    logger.error(f"Lỗi lấy batch {path} cho {len(chunk)} symbols: {e}")
+                    return []
+                if len(chunk) == 1:
+                    logger.warning(f"Symbol không hợp lệ, bỏ qua: {chunk[0]}")
+                    return []
+                # Một symbol không hợp lệ làm cả nhóm lỗi 400: chia đôi để giữ lại các symbol hợp lệ
+                middle = len(chunk) // 2
+                halves = await asyncio.gather(fetch_chunk(chunk[:middle]), fetch_chunk(chunk[middle:]))
+                return halves[0] + halves[1]
+            except Exception as e:
+                logger.error(f"Lỗi lấy batch {path} cho {len(chunk)} symbols: {e}")
+                return []
+        
+        chunks = [symbols[i:i + self.batch_chunk_size] for i in range(0, len(symbols), self.batch_chunk_size)]
+        results = await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks])
+        return [item for result in results for item in result]
+    
+    async def get_current_prices(self, symbols):
+        """Lấy giá hiện tại của nhiều symbol trong một request, trả về {symbol: price}"""
         try:
-            if self.api_key and self.secret_key:
-                self.client = Client(self.api_key, self.secret_key)
-            else:
-                self.client = Client()  # Client công khai
-                logger.warning("Sử dụng Binance client công khai - một số tính năng có thể bị hạn chế")
+            prices = {}
+            missing = []
+            
+            # Ưu tiên bảng ticker real-time, chỉ gọi REST cho các symbol stale
+            for symbol in dict.fromkeys(symbols):
+                ticker = self._stream_ticker(symbol)
+                if ticker is not None:
+                    prices[symbol] = ticker['price']
+                else:
+                    missing.append(symbol)
+            
+            if missing:
+                for data in await self._fetch_batch('/api/v3/ticker/price', missing):
+                    prices[data['symbol']] = float(data['price'])
+            
+            return prices
         except Exception as e:
-            logger.error(f"Lỗi khởi tạo Binance client: {e}")
-            self.client = None
+            logger.error(f"Lỗi lấy giá hiện tại cho {len(symbols)} symbols: {e}")
+            return {}
     
-    async def get_current_price(self, symbol):
-        """Lấy giá hiện tại của một symbol"""
+    def get_cached_prices(self, symbols):
+        """Giá đã có trong bộ nhớ (ticker stream còn mới, snapshot 24h còn hạn), không gọi mạng"""
+        prices = {}
+        snapshot = self.universe
+        if snapshot is not None and snapshot.age() >= self.universe_ttl:
+            snapshot = None
+        for symbol in dict.fromkeys(symbols):
+            ticker = self._stream_ticker(symbol)
+            if ticker is not None:
+                prices[symbol] = ticker['price']
+            elif snapshot is not None and snapshot.price(symbol) is not None:
+                prices[symbol] = snapshot.price(symbol)
+        return prices
+    
+    async def get_24h_tickers(self, symbols):
+        """Lấy ticker 24h của nhiều symbol trong một request, trả về {symbol: ticker}"""
         try:
-            if self.client:
-                ticker = self.client.get_symbol_ticker(symbol=symbol)
-                return float(ticker['price'])
-            else:
-                # Sử dụng API công khai
-                async with aiohttp.ClientSession() as session:
-                    url = f"https://api.binance.com/api/v3/ticker/price?symbol={symbol}"
-                    async with session.get(url) as response:
-                        data = await response.json()
-                        return float(data['price'])
+            tickers = {}
+            missing = []
+            
+            for symbol in dict.fromkeys(symbols):
+                ticker = self._stream_ticker(symbol)
+                if ticker is not None:
+                    tickers[symbol] = dict(ticker)
+                else:
+                    missing.append(symbol)
+            
+            if missing:
+                for data in await self._fetch_batch('/api/v3/ticker/24hr', missing):
+                    tickers[data['symbol']] = self._parse_24h_ticker(data)
+            
+            return tickers
         except Exception as e:
-            logger.error(f"Lỗi lấy giá hiện tại cho {symbol}: {e}")
-            return None
+            logger.error(f"Lỗi lấy ticker 24h cho {len(symbols)} symbols: {e}")
+            return {}
+    
+    async def get_current_price(self, symbol):
+        """Lấy giá hiện tại của một symbol"""
+        prices = await self.get_current_prices([symbol])
+        return prices.get(symbol)
     
     async def get_24h_ticker(self, symbol):
         """Lấy thông tin ticker 24h"""
-        try:
-            if self.client:
-                ticker = self.client.get_ticker(symbol=symbol)
-                return {
-                    'symbol': ticker['symbol'],
-                    'price': float(ticker['lastPrice']),
-                    'change': float(ticker['priceChange']),
-                    'change_percent': float(ticker['priceChangePercent']),
-                    'high': float(ticker['highPrice']),
-                    'low': float(ticker['lowPrice']),
-                    'volume': float(ticker['volume']),
-                    'quote_volume': float(ticker['quoteVolume'])
-                }
-            else:
-                async with aiohttp.ClientSession() as session:
-                    url = f"https://api.binance.com/api/v3/ticker/24hr?symbol={symbol}"
-                    async with session.get(url) as response:
-                        data = await response.json()
-                        return {
-                            'symbol': data['symbol'],
-                            'price': float(data['lastPrice']),
-                            'change': float(data['priceChange']),
-                            'change_percent': float(data['priceChangePercent']),
-                            'high': float(data['highPrice']),
-                            'low': float(data['lowPrice']),
-                            'volume': float(data['volume']),
-                            'quote_volume': float(data['quoteVolume'])
-                        }
-        except Exception as e:
-            logger.error(f"Lỗi lấy ticker 24h cho {symbol}: {e}")
-            return None
+        tickers = await self.get_24h_tickers([symbol])
+        return tickers.get(symbol)
+    
+    async def _fetch_klines(self, symbol, interval, start_time=None, end_time=None, limit=500,
+                            priority=PRIORITY_INTERACTIVE):
+        """Gọi /klines, trả về DataFrame OHLCV với index là open time (ms)"""
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        if end_time is not None:
+            params['endTime'] = int(end_time)
+        raw, server_time = await self._request('/api/v3/klines', params, priority=priority, raw=True)
+        
+        # Giải mã thẳng từ bytes thành các cột float64/int64; server time để kline store biết nến nào đã đóng
+        frame = decode_klines(raw).frame
+        frame.attrs['server_time'] = server_time
+        return frame
     
     async def get_historical_data(self, symbol, interval='1h', limit=100):
         """Lấy dữ liệu lịch sử"""
+        # Các caller có thể sửa DataFrame (thêm cột chỉ báo) nên mỗi caller nhận một bản copy
+        df = await self.single_flight.do(('historical', symbol, interval, limit),
+                                         self._get_historical_data, symbol, interval, limit)
+        return df.copy() if df is not None else None
+    
+    async def _get_historical_data(self, symbol, interval, limit):
         try:
-            if self.client:
-                klines = self.client.get_historical_klines(symbol, interval, f"{limit} hours ago UTC")
-            else:
-                async with aiohttp.ClientSession() as session:
-                    url = f"https://api.binance.com/api/v3/klines?symbol={symbol}&interval={interval}&limit={limit}"
-                    async with session.get(url) as response:
-                        klines = await response.json()
-            
-            # Chuyển đổi thành DataFrame
-            df = pd.DataFrame(klines, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_asset_volume', 'number_of_trades',
-                'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-            ])
+            # Phục vụ từ kho nến cục bộ, chỉ tải phần delta
+            if self.kline_store is not None and self.kline_store.supports(interval):
+                return await self.kline_store.get(self._fetch_klines, symbol, interval, limit)
             
-            # Chuyển đổi kiểu dữ liệu
-            numeric_columns = ['open', 'high', 'low', 'close', 'volume']
-            for col in numeric_columns:
-                df[col] = pd.to_numeric(df[col])
+            # Vượt giới hạn 1000 nến/request thì backfill theo khoảng thời gian
+            if limit > 1000 and interval in INTERVAL_MS:
+                end_time = int(time.time() * 1000)
+                start_time = candle_open_time(end_time, interval) - (limit - 1) * INTERVAL_MS[interval]
+                df = await backfill(self._fetch_klines, symbol, interval, start_time, end_time,
+                                    semaphore=self.backfill_semaphore)
+            else:
+                df = await self._fetch_klines(symbol, interval, limit=limit)
+            return to_ohlcv_frame(df)
             
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
+        except Exception as e:
+            logger.error(f"Lỗi lấy dữ liệu lịch sử cho {symbol}: {e}")
+            return None
+    
+    async def get_historical_range(self, symbol, interval, start_time, end_time=None,
+                                   priority=PRIORITY_BACKGROUND):
+        """Lấy toàn bộ nến trong [start_time, end_time), không giới hạn 1000 nến"""
+        try:
+            start_ms = to_milliseconds(start_time)
+            end_ms = to_milliseconds(end_time) if end_time is not None else int(time.time() * 1000)
             
-            return df[numeric_columns]
+            fetch = partial(self._fetch_klines, priority=priority)
+            df = await backfill(fetch, symbol, interval, start_ms, end_ms, semaphore=self.backfill_semaphore)
+            return to_ohlcv_frame(df)
             
         except Exception as e:
-            logger.error(f"Lỗi lấy dữ liệu lịch sử cho {symbol}: {e}")
+            logger.error(f"Lỗi backfill dữ liệu lịch sử cho {symbol}: {e}")
             return None
     
+    async def get_historical_ranges(self, symbols, interval, start_time, end_time=None,
+                                    priority=PRIORITY_BACKGROUND):
+        """Backfill nhiều symbol song song (dùng chung giới hạn request), trả về {symbol: DataFrame}"""
+        frames = await asyncio.gather(*[
+            self.get_historical_range(symbol, interval, start_time, end_time, priority) for symbol in symbols
+        ])
+        return {symbol: df for symbol, df in zip(symbols, frames) if df is not None}
+    
+    async def get_universe_snapshot(self):
+        """Snapshot 24h toàn thị trường, làm mới tối đa một lần mỗi TTL và dùng chung"""
+        snapshot = self.universe
+        if snapshot is not None and snapshot.age() < self.universe_ttl:
+            return snapshot
+        
+        # Chỉ một coroutine tải lại, các coroutine khác chờ và dùng kết quả
+        async with self._universe_lock:
+            snapshot = self.universe
+            if snapshot is None or snapshot.age() >= self.universe_ttl:
+                # Weight 80: chạy ở mức nền để không lấn budget dành cho request tương tác
+                tickers = await self._request('/api/v3/ticker/24hr', priority=PRIORITY_BACKGROUND)
+                snapshot = UniverseSnapshot(tickers)
+                self.universe = snapshot
+            return snapshot
+    
     async def get_top_gainers_losers(self, limit=10):
         """Lấy danh sách top tăng/giảm"""
         try:
-            if self.client:
-                tickers = self.client.get_ticker()
-            else:
-                async with aiohttp.ClientSession() as session:
-                    url = "https://api.binance.com/api/v3/ticker/24hr"
-                    async with session.get(url) as response:
-                        tickers = await response.json()
-            
-            # Lọc các cặp USDT
-            usdt_pairs = [t for t in tickers if t['symbol'].endswith('USDT') and float(t['quoteVolume']) > 1000000]
-            
-            # Sắp xếp theo % thay đổi
-            gainers = sorted(usdt_pairs, key=lambda x: float(x['priceChangePercent']), reverse=True)[:limit]
-            losers = sorted(usdt_pairs, key=lambda x: float(x['priceChangePercent']))[:limit]
-            
-            return {
-                'gainers': [{
-                    'symbol': t['symbol'],
-                    'price': float(t['lastPrice']),
-                    'change_percent': float(t['priceChangePercent'])
-                } for t in gainers],
-                'losers': [{
-                    'symbol': t['symbol'],
-                    'price': float(t['lastPrice']),
-                    'change_percent': float(t['priceChangePercent'])
-                } for t in losers]
-            }
+            snapshot = await self.get_universe_snapshot()
+            return snapshot.top_movers(limit)
             
         except Exception as e:
             logger.error(f"Lỗi lấy top gainers/losers: {e}")
@@ -146,33 +425,33 @@ class BinanceClient:
     async def get_market_cap_info(self, symbol):
         """Lấy thông tin market cap (sử dụng API bên thứ 3)"""
         try:
-            coin_id = symbol.replace('USDT', '').lower()
-            
-            async with aiohttp.ClientSession() as session:
-                url = f"https://api.coingecko.com/api/v3/coins/{coin_id}"
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            'market_cap': data['market_data']['market_cap']['usd'],
-                            'total_supply': data['market_data']['total_supply'],
-                            'circulating_supply': data['market_data']['circulating_supply'],
-                            'max_supply': data['market_data']['max_supply']
-                        }
+            info = self.symbol_index.get(symbol)
+            base_asset = info['base_asset'] if info else symbol.replace('USDT', '')
+            
+            market_cap = await self.market_caps.get(base_asset)
+            return dict(market_cap) if market_cap else None
         except Exception as e:
             logger.error(f"Lỗi lấy thông tin market cap cho {symbol}: {e}")
             return None
     
+    async def _fetch_depth_snapshot(self, symbol, limit):
+        """Snapshot /depth để đồng bộ order book cục bộ"""
+        return await self._request('/api/v3/depth', {'symbol': symbol, 'limit': limit},
+                                   priority=PRIORITY_BACKGROUND)
+    
     async def get_order_book(self, symbol, limit=10):
-        """Lấy order book"""
+        """Lấy order book (đọc từ book cục bộ nếu đã đồng bộ)"""
         try:
-            if self.client:
-                order_book = self.client.get_order_book(symbol=symbol, limit=limit)
-            else:
-                async with aiohttp.ClientSession() as session:
-                    url = f"https://api.binance.com/api/v3/depth?symbol={symbol}&limit={limit}"
-                    async with session.get(url) as response:
-                        order_book = await response.json()
+            if self.depth_stream is not None:
+                book = self.depth_stream.get_book(symbol)
+                if book is not None:
+                    return book.top(limit)
+            
+            order_book = await self._request('/api/v3/depth', {'symbol': symbol, 'limit': limit})
+            
+            # Symbol hợp lệ: các lần gọi sau sẽ đọc từ book cục bộ
+            if self.depth_stream is not None:
+                await self.depth_stream.subscribe(symbol)
             
             return {
                 'bids': [[float(price), float(qty)] for price, qty in order_book['bids']],
@@ -183,24 +462,46 @@ class BinanceClient:
             logger.error(f"Lỗi lấy order book cho {symbol}: {e}")
             return None
     
+    async def refresh_symbol_index(self, priority=PRIORITY_BACKGROUND):
+        """Tải lại /exchangeInfo và lưu index xuống đĩa"""
+        async with self._symbol_index_lock:
+            exchange_info = await self._request('/api/v3/exchangeInfo', priority=priority)
+            self.symbol_index.load_exchange_info(exchange_info)
+            self.symbol_index.save()
+            logger.info(f"Đã làm mới symbol index ({len(self.symbol_index)} symbols)")
+        return self.symbol_index
+    
+    async def get_symbol_index(self):
+        """Index symbol đã sẵn sàng; chỉ tải exchangeInfo khi chưa có dữ liệu"""
+        if not len(self.symbol_index):
+            self.symbol_index.load()
+        if not len(self.symbol_index) or (
+            self._symbol_index_task is None and self.symbol_index.age() > self.exchange_info_ttl
+        ):
+            await self.refresh_symbol_index()
+        return self.symbol_index
+    
+    async def _symbol_index_loop(self):
+        """Làm mới symbol index định kỳ ở background"""
+        if not len(self.symbol_index):
+            self.symbol_index.load()
+        while True:
+            try:
+                if self.symbol_index.age() > self.exchange_info_ttl:
+                    await self.refresh_symbol_index()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Lỗi làm mới symbol index: {e}")
+                await asyncio.sleep(60)
+                continue
+            await asyncio.sleep(max(60, self.exchange_info_ttl - self.symbol_index.age()))
+    
     async def search_symbols(self, query):
         """Tìm kiếm symbols"""
         try:
-            if self.client:
-                exchange_info = self.client.get_exchange_info()
-                symbols = [s['symbol'] for s in exchange_info['symbols'] if s['status'] == 'TRADING']
-            else:
-                async with aiohttp.ClientSession() as session:
-                    url = "https://api.binance.com/api/v3/exchangeInfo"
-                    async with session.get(url) as response:
-                        data = await response.json()
-                        symbols = [s['symbol'] for s in data['symbols'] if s['status'] == 'TRADING']
-            
-            # Tìm kiếm symbols phù hợp
-            query = query.upper()
-            matching_symbols = [s for s in symbols if query in s and s.endswith('USDT')]
-            
-            return matching_symbols[:20]  # Giới hạn 20 kết quả
+            index = await self.get_symbol_index()
+            return index.search(query, quote_asset='USDT', limit=20)  # Giới hạn 20 kết quả
             
         except Exception as e:
             logger.error(f"Lỗi tìm kiếm symbols: {e}")
@@ -209,7 +510,7 @@ class BinanceClient:
     async def get_top_gainers(self, limit=10):
         """Lấy top gainers"""
         try:
-            data = await self.get_top_gainers_losers(limit * 2)  # Lấy nhiều hơn để filter
+            data = await self.get_top_gainers_losers(limit)
             if data and 'gainers' in data:
                 return data['gainers'][:limit]
             return []
@@ -220,7 +521,7 @@ class BinanceClient:
     async def get_top_losers(self, limit=10):
         """Lấy top losers"""
         try:
-            data = await self.get_top_gainers_losers(limit * 2)  # Lấy nhiều hơn để filter
+            data = await self.get_top_gainers_losers(limit)
             if data and 'losers' in data:
                 return data['losers'][:limit]
             return []
@@ -228,12 +529,14 @@ class BinanceClient:
             logger.error(f"Lỗi lấy top losers: {e}")
             return []
     
+    async def ping(self):
+        """Probe /api/v3/ping (weight 1)"""
+        await self._request('/api/v3/ping', priority=PRIORITY_BACKGROUND)
+    
+    async def ping_coingecko(self):
+        """Probe /ping của CoinGecko"""
+        await self._fetch_json(f"{self.market_caps.base_url}/ping")
+    
     def is_connected(self):
-        """Kiểm tra kết nối"""
-        try:
-            if self.client:
-                self.client.get_server_time()
-                return True
-            return False
-        except:
-            return False
\ No newline at end of file
+        """Kiểm tra kết nối (trạng thái đã cache từ health monitor, không gọi mạng)"""
+        return self.health_monitor.is_up('binance')
\ No newline at end of file
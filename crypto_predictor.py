@@ -1,79 +1,74 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-import ta
 import joblib
 import os
 from datetime import datetime, timedelta
+import time
 import logging
 import asyncio
 
 from binance_client import BinanceClient
+from indicators import compute_indicators, INDICATOR_COLUMNS, FEATURE_COLUMNS
+from indicator_state import IndicatorStates, open_times_ms
+from feature_cache import FeatureCache, FeatureSet
+from kline_store import INTERVAL_MS, candle_open_time
+from training_queue import TrainingQueue, QueueFullError
+from model_training import train_candidates
+from model_registry import ModelRegistry
+from model_cache import ModelCache, model_nbytes
+from single_flight import SingleFlight
+from batch_predict import scale_rows, predict_rows
+from signals import recommendation
 
 logger = logging.getLogger(__name__)
 
+INDICATOR_INDEX = pd.Index(INDICATOR_COLUMNS)
+
 class CryptoPredictor:
-    def __init__(self):
-        self.binance_client = BinanceClient()
-        self.models = {}
-        self.scalers = {}
+    def __init__(self, binance_client=None):
+        self.binance_client = binance_client or BinanceClient()
+        # Model + scaler trong bộ nhớ, giới hạn theo byte; model bị bỏ được load lại từ registry khi cần
+        self.model_cache = ModelCache()
+        self.model_loads = SingleFlight()
+        self.model_versions = {}  # symbol -> metadata của phiên bản đang dùng
         self.model_dir = 'models'
+        self.registry = ModelRegistry()
+        # File staging của job training bị bỏ dở từ lần chạy trước
+        self.registry.sweep_staging()
+        
+        # Trạng thái chỉ báo theo symbol: dự đoán real-time chỉ nạp các nến mới đóng
+        self.indicator_state_enabled = os.getenv('INDICATOR_STATE_ENABLED', 'True').lower() == 'true'
+        self.indicator_states = IndicatorStates()
+        
+        # Chỉ báo của nến đã đóng dùng chung cho dự đoán và phân tích kỹ thuật
+        self.feature_cache = FeatureCache()
+        # Dữ liệu chưa có nến vừa đóng (sàn/đồng hồ lệch): dùng tạm entry cũ trong khoảng này rồi mới tải lại
+        self.feature_retry_seconds = float(os.getenv('FEATURE_CACHE_RETRY_SECONDS', '10'))
+        
+        # Training chạy trong process pool, mỗi symbol tối đa một job
+        self.training_queue = TrainingQueue()
+        # Successive halving khi chọn model: chỉ 1/eta ứng viên được fit tiếp trên nhiều dữ liệu hơn
+        self.halving_eta = int(os.getenv('TRAINING_HALVING_ETA', '3'))
         
         # Tạo thư mục models nếu chưa có
         if not os.path.exists(self.model_dir):
             os.makedirs(self.model_dir)
     
     def calculate_technical_indicators(self, df):
-        """Tính toán các chỉ báo kỹ thuật"""
+        """Tính toán các chỉ báo kỹ thuật (một lượt NumPy, kết quả khớp thư viện ta)"""
         try:
-            # Moving Averages
-            df['sma_7'] = ta.trend.sma_indicator(df['close'], window=7)
-            df['sma_25'] = ta.trend.sma_indicator(df['close'], window=25)
-            df['ema_12'] = ta.trend.ema_indicator(df['close'], window=12)
-            df['ema_26'] = ta.trend.ema_indicator(df['close'], window=26)
-            
-            # MACD
-            df['macd'] = ta.trend.macd_diff(df['close'])
-            df['macd_signal'] = ta.trend.macd_signal(df['close'])
-            
-            # RSI
-            df['rsi'] = ta.momentum.rsi(df['close'], window=14)
-            
-            # Bollinger Bands
-            bb = ta.volatility.BollingerBands(df['close'])
-            df['bb_upper'] = bb.bollinger_hband()
-            df['bb_lower'] = bb.bollinger_lband()
-            df['bb_middle'] = bb.bollinger_mavg()
-            df['bb_width'] = (df['bb_upper'] - df['bb_lower']) / df['bb_middle']
-            
-            # Stochastic
-            df['stoch_k'] = ta.momentum.stoch(df['high'], df['low'], df['close'])
-            df['stoch_d'] = ta.momentum.stoch_signal(df['high'], df['low'], df['close'])
-            
-            # Williams %R
-            df['williams_r'] = ta.momentum.williams_r(df['high'], df['low'], df['close'])
-            
-            # Volume indicators
-            df['volume_sma'] = df['volume'].rolling(window=20).mean()
-            df['vwap'] = ta.volume.volume_weighted_average_price(df['high'], df['low'], df['close'], df['volume'])
-            
-            # Price features
-            df['price_change'] = df['close'].pct_change()
-            df['high_low_ratio'] = df['high'] / df['low']
-            df['close_open_ratio'] = df['close'] / df['open']
-            
-            # Volatility
-            df['volatility'] = df['close'].rolling(window=20).std()
-            
-            # Support and Resistance levels
-            df['support'] = df['low'].rolling(window=20).min()
-            df['resistance'] = df['high'].rolling(window=20).max()
-            
-            return df
+            indicators = compute_indicators(
+                df['open'].values, df['high'].values, df['low'].values,
+                df['close'].values, df['volume'].values
+            )
+            
+            # Ghép tất cả cột chỉ báo trong một lần (một mảng 2-D) thay vì chèn từng cột
+            if df.columns.isin(INDICATOR_COLUMNS).any():
+                df = df.drop(columns=INDICATOR_COLUMNS, errors='ignore')
+            return pd.concat([
+                df,
+                pd.DataFrame(np.column_stack(list(indicators.values())), index=df.index, columns=INDICATOR_INDEX)
+            ], axis=1)
             
         except Exception as e:
             logger.error(f"Lỗi tính toán chỉ báo kỹ thuật: {e}")
@@ -81,19 +76,8 @@ class CryptoPredictor:
     
     def prepare_features(self, df):
         """Chuẩn bị features cho model"""
-        feature_columns = [
-            'open', 'high', 'low', 'volume',
-            'sma_7', 'sma_25', 'ema_12', 'ema_26',
-            'macd', 'macd_signal', 'rsi',
-            'bb_upper', 'bb_lower', 'bb_middle', 'bb_width',
-            'stoch_k', 'stoch_d', 'williams_r',
-            'volume_sma', 'vwap',
-            'price_change', 'high_low_ratio', 'close_open_ratio',
-            'volatility', 'support', 'resistance'
-        ]
-        
         # Lọc các cột có sẵn
-        available_features = [col for col in feature_columns if col in df.columns]
+        available_features = [col for col in FEATURE_COLUMNS if col in df.columns]
         
         # Tạo target (giá sau 1 giờ)
         df['target'] = df['close'].shift(-1)
@@ -110,160 +94,319 @@ class CryptoPredictor:
         
         return X, y
     
-    async def train_model(self, symbol, retrain=False):
-        """Training model cho một symbol"""
+    def latest_features(self, symbol, df, interval='1h', end=-1):
+        """Feature của nến đã đóng gần nhất, tức dòng cuối mà prepare_features trả về.
+        
+        State chỉ báo của symbol chỉ nạp các nến mới (O(1) mỗi nến) thay vì tính lại cả DataFrame;
+        EMA/RSI khi đó dùng toàn bộ lịch sử state đã nhận chứ không chỉ các nến trong df. Với cửa sổ
+        100 nến, sai khác so với prepare_features dưới 0.02 độ lệch chuẩn của feature khi train.
+        """
+        if not self.indicator_state_enabled:
+            # prepare_features bỏ dòng cuối (chưa có target) nên giữ thêm một nến sau end
+            X, _ = self.prepare_features(self.calculate_technical_indicators(df.iloc[:end + 1 or None]))
+            return None if X is None else X.iloc[-1:]
+        
+        # Nến cuối chưa đóng (prepare_features cũng bỏ dòng này vì chưa có target)
+        state = self.indicator_states.update(symbol, interval, df, end=end)
+        if not state.ready():
+            return None
+        return state.features_frame(df.index[end - 1:end])
+    
+    async def get_features(self, symbol, interval='1h', limit=100):
+        """Chỉ báo của các nến đã đóng, chỉ tính lại khi có nến mới đóng (dùng chung giữa các handler)"""
         try:
-            model_path = os.path.join(self.model_dir, f'{symbol}_model.pkl')
-            scaler_path = os.path.join(self.model_dir, f'{symbol}_scaler.pkl')
+            key = None
+            if interval in INTERVAL_MS:
+                # Open time của nến đã đóng gần nhất suy ra từ đồng hồ, cache hit không cần gọi API
+                closed_time = candle_open_time(int(time.time() * 1000), interval) - INTERVAL_MS[interval]
+                key = (symbol, interval, closed_time)
+                features = self.feature_cache.get(key)
+                if features is not None and (features.closed_time == closed_time or
+                                             time.time() - features.fetched_at < self.feature_retry_seconds):
+                    return features
+            
+            df = await self.binance_client.get_historical_data(symbol, interval=interval, limit=limit)
+            if df is None or len(df) < 2:
+                return None
             
+            # Các nến có open time trước nến đang chạy là nến đã đóng
+            times = open_times_ms(df.index)
+            end = -1
+            if key is not None:
+                closed = int(np.searchsorted(times, key[2], side='right'))
+                if closed == 0:
+                    # Đồng hồ máy chậm hơn sàn cả một nến: tin dữ liệu, chỉ bỏ nến cuối (đang chạy)
+                    logger.warning(f"Đồng hồ máy chậm hơn dữ liệu nến {symbol} {interval}, bỏ qua key theo đồng hồ")
+                else:
+                    # Nếu dữ liệu chưa có nến đang chạy thì nến cuối có thể chưa chốt: vẫn bỏ dòng cuối
+                    end = min(closed - len(times), -1)
+            
+            features = FeatureSet(
+                symbol, interval, int(times[end - 1]),
+                self.calculate_technical_indicators(df.iloc[:end]),
+                self.latest_features(symbol, df, interval, end=end)
+            )
+            if key is not None:
+                # Lưu theo key tra cứu (đồng hồ); nếu dữ liệu chưa có nến vừa đóng thì features.closed_time cũ hơn
+                # key và entry chỉ được dùng trong feature_retry_seconds
+                features.fetched_at = time.time()
+                self.feature_cache.put(key, features)
+            return features
+            
+        except Exception as e:
+            logger.error(f"Lỗi tính features cho {symbol}: {e}")
+            return None
+    
+    async def train_model(self, symbol, retrain=False):
+        """Training model cho một symbol (phần fit chạy trong process pool, không chặn event loop)"""
+        try:
             # Kiểm tra nếu model đã tồn tại và không cần retrain
-            if not retrain and os.path.exists(model_path) and os.path.exists(scaler_path):
-                self.models[symbol] = joblib.load(model_path)
-                self.scalers[symbol] = joblib.load(scaler_path)
-                logger.info(f"Đã load model cho {symbol}")
+            if not retrain and await self.load_model(symbol):
                 return True
             
-            # Lấy dữ liệu lịch sử
-            logger.info(f"Đang lấy dữ liệu training cho {symbol}...")
-            df = await self.binance_client.get_historical_data(symbol, interval='1h', limit=500)
-            
-            if df is None or len(df) < 100:
-                logger.error(f"Không đủ dữ liệu cho {symbol}")
+            # Nhiều người cùng yêu cầu một symbol thì chỉ có một job training
+            job = self.training_queue.submit(symbol, lambda: self._train_job(symbol))
+            try:
+                return await self.training_queue.wait(symbol)
+            except asyncio.CancelledError:
+                # Chỉ nuốt lỗi khi chính job bị hủy, không phải caller bị hủy
+                if job.status != 'cancelled':
+                    raise
+                logger.info(f"Job training {symbol} đã bị hủy")
                 return False
             
-            # Tính toán chỉ báo kỹ thuật
-            df = self.calculate_technical_indicators(df)
-            
-            # Chuẩn bị features
-            X, y = self.prepare_features(df)
-            
-            if X is None or len(X) < 50:
-                logger.error(f"Không đủ features cho {symbol}")
-                return False
-            
-            # Chia dữ liệu
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            # Chuẩn hóa dữ liệu
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train)
-            X_test_scaled = scaler.transform(X_test)
-            
-            # Training ensemble model
-            models = {
-                'rf': RandomForestRegressor(n_estimators=100, random_state=42),
-                'gb': GradientBoostingRegressor(n_estimators=100, random_state=42),
-                'lr': LinearRegression()
+        except QueueFullError as e:
+            logger.warning(f"Không thể training model cho {symbol}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Lỗi training model cho {symbol}: {e}")
+            return False
+    
+    async def _train_job(self, symbol):
+        """Lấy dữ liệu, tính features, fit model trong worker process rồi đăng ký phiên bản mới"""
+        # Lấy dữ liệu lịch sử
+        logger.info(f"Đang lấy dữ liệu training cho {symbol}...")
+        df = await self.binance_client.get_historical_data(symbol, interval='1h', limit=500)
+        
+        if df is None or len(df) < 100:
+            logger.error(f"Không đủ dữ liệu cho {symbol}")
+            return False
+        
+        # Tính toán chỉ báo kỹ thuật
+        df = self.calculate_technical_indicators(df)
+        
+        # Chuẩn bị features
+        X, y = self.prepare_features(df)
+        
+        if X is None or len(X) < 50:
+            logger.error(f"Không đủ features cho {symbol}")
+            return False
+        
+        # Worker ghi bundle vào file staging, chỉ thành phiên bản khi training xong
+        staging = self.registry.staging_path(symbol)
+        worker = None
+        try:
+            metadata = {
+                'interval': '1h',
+                'training_window': {'start': str(X.index[0]), 'end': str(X.index[-1]), 'samples': len(X)},
+                'features': list(X.columns)
             }
-            
-            best_model = None
-            best_score = float('inf')
-            
-            for name, model in models.items():
-                model.fit(X_train_scaled, y_train)
-                y_pred = model.predict(X_test_scaled)
-                mse = mean_squared_error(y_test, y_pred)
-                
-                if mse < best_score:
-                    best_score = mse
-                    best_model = model
-            
-            # Lưu model và scaler
-            self.models[symbol] = best_model
-            self.scalers[symbol] = scaler
-            
-            joblib.dump(best_model, model_path)
-            joblib.dump(scaler, scaler_path)
-            
-            # Tính accuracy
-            y_pred = best_model.predict(X_test_scaled)
-            mae = mean_absolute_error(y_test, y_pred)
-            mape = np.mean(np.abs((y_test - y_pred) / y_test)) * 100
-            
-            logger.info(f"Model {symbol} trained - MAE: {mae:.4f}, MAPE: {mape:.2f}%")
+            worker = asyncio.ensure_future(self.training_queue.run_in_worker(
+                train_candidates, X, y, staging, metadata, self.training_queue.job_cpus, self.halving_eta
+            ))
+            # shield: job bị hủy thì worker vẫn chạy nốt (process không dừng giữa chừng được)
+            result = await asyncio.shield(worker)
+            version = self.registry.commit(symbol, staging, result['metadata'], result['checksum'])
+        except BaseException:
+            if worker is not None and not worker.done():
+                # Worker process vẫn đang ghi file staging: chỉ xóa khi nó chạy xong
+                worker.add_done_callback(lambda future: self._discard_staging(future, staging))
+            else:
+                self.registry.discard(staging)
+            raise
+        
+        # Hot swap: model mới đã nằm trọn trong bộ nhớ
+        self.registry.activate(symbol, version)
+        self._install_model(symbol, result['model'], result['scaler'], self.registry.metadata(symbol, version))
+        
+        logger.info(f"Model {symbol} v{version} trained ({result['name']}, {result['train_seconds']:.1f}s) - "
+                    f"MAE: {result['mae']:.4f}, MAPE: {result['mape']:.2f}%")
+        for name, rounds in result['candidates'].items():
+            logger.debug(f"Ứng viên {name} ({symbol}): " + ", ".join(
+                f"{r['samples']} mẫu {r['fit_seconds']:.2f}s MSE {r['mse']:.4f}" for r in rounds))
+        return True
+    
+    def _discard_staging(self, worker, staging):
+        """Xóa file staging của job đã hủy sau khi worker chạy xong"""
+        if not worker.cancelled():
+            # Kết quả/lỗi của job đã hủy không còn ai đọc
+            worker.exception()
+        self.registry.discard(staging)
+    
+    def _install_model(self, symbol, model, scaler, metadata):
+        """Đổi model, scaler và metadata trong một bước đồng bộ: request nào cũng thấy trọn một phiên bản"""
+        self.model_cache.put(symbol, model, scaler, metadata, nbytes=metadata.get('bytes'))
+        self.model_versions[symbol] = metadata
+    
+    def _load_artifacts(self, symbol, version=None):
+        if version is None and self.registry.current_version(symbol) is None:
+            # Model lưu theo định dạng cũ (trước khi có registry)
+            model_path = os.path.join(self.model_dir, f'{symbol}_model.pkl')
+            scaler_path = os.path.join(self.model_dir, f'{symbol}_scaler.pkl')
+            if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
+                return None
+            model, scaler = joblib.load(model_path), joblib.load(scaler_path)
+            return model, scaler, {'version': None, 'features': FEATURE_COLUMNS, 'bytes': model_nbytes(model, scaler)}
+        
+        model, scaler, metadata = self.registry.load(symbol, version)
+        if metadata.get('features') != FEATURE_COLUMNS:
+            raise ValueError(f"feature schema của v{metadata['version']} khác với hiện tại")
+        return model, scaler, metadata
+    
+    async def load_model(self, symbol, version=None, activate=False):
+        """Load một phiên bản model (mặc định phiên bản active) ở thread riêng rồi hot swap vào bộ nhớ"""
+        try:
+            loaded = await asyncio.to_thread(self._load_artifacts, symbol, version)
+            if loaded is None:
+                return False
+            model, scaler, metadata = loaded
+            if activate:
+                self.registry.activate(symbol, metadata['version'])
+            self._install_model(symbol, model, scaler, metadata)
+            logger.info(f"Đã load model cho {symbol}" + (f" (v{metadata['version']})" if metadata['version'] else ""))
             return True
-            
         except Exception as e:
-            logger.error(f"Lỗi training model cho {symbol}: {e}")
+            logger.error(f"Lỗi load model cho {symbol}: {e}")
             return False
     
+    def discover_models(self):
+        """Đọc metadata các model active trong registry mà không load model (model được load ở lần dự đoán đầu tiên)"""
+        for symbol in self.registry.symbols():
+            if symbol not in self.model_versions:
+                self.model_versions[symbol] = self.registry.metadata(symbol, self.registry.current_version(symbol))
+        return sorted(self.model_versions)
+    
+    async def get_model(self, symbol):
+        """ModelEntry của symbol; cache miss thì load lại từ registry (hoặc training nếu chưa có model).
+
+        Nhiều request cùng miss một symbol chỉ load một lần.
+        """
+        entry = self.model_cache.get(symbol)
+        if entry is not None:
+            return entry
+        
+        if not await self.model_loads.do(symbol, self.train_model, symbol):
+            return None
+        return self.model_cache.peek(symbol)
+    
+    async def rollback_model(self, symbol):
+        """Quay lại phiên bản model trước đó của symbol"""
+        version = self.registry.previous_version(symbol)
+        if version is None:
+            logger.warning(f"Không có phiên bản model trước đó cho {symbol}")
+            return False
+        return await self.load_model(symbol, version, activate=True)
+    
+    def _build_prediction(self, symbol, predicted_price, current_price, features, hours_ahead):
+        """Kết quả dự đoán: % thay đổi, confidence theo volatility và recommendation (ngưỡng trong signals.py)"""
+        # Tính toán confidence và recommendation
+        price_change_percent = ((predicted_price - current_price) / current_price) * 100
+        
+        # Confidence dựa trên volatility gần đây
+        recent_volatility = features.frame['price_change'].tail(24).std() * 100
+        confidence = max(50, min(95, 90 - recent_volatility * 10))
+        
+        return {
+            'symbol': symbol,
+            'current_price': current_price,
+            'predicted_price': predicted_price,
+            'price_change_percent': price_change_percent,
+            'confidence': confidence,
+            'recommendation': recommendation(price_change_percent),
+            'prediction_time': datetime.now(),
+            'target_time': datetime.now() + timedelta(hours=hours_ahead)
+        }
+    
     async def predict_price(self, symbol, hours_ahead=24):
         """Dự đoán giá cho symbol"""
         try:
-            # Kiểm tra và load model
-            if symbol not in self.models:
-                success = await self.train_model(symbol)
-                if not success:
-                    return None
-            
-            # Lấy dữ liệu mới nhất
-            df = await self.binance_client.get_historical_data(symbol, interval='1h', limit=100)
-            
-            if df is None or len(df) < 50:
+            # Model và scaler lấy cùng lúc (một entry) để luôn thuộc cùng một phiên bản
+            entry = await self.get_model(symbol)
+            if entry is None:
                 return None
             
-            # Tính toán chỉ báo kỹ thuật
-            df = self.calculate_technical_indicators(df)
+            # Chỉ báo và features của nến đã đóng gần nhất (từ cache nếu chưa có nến mới)
+            features = await self.get_features(symbol, interval='1h', limit=100)
             
-            # Chuẩn bị features
-            X, _ = self.prepare_features(df)
-            
-            if X is None:
+            if features is None or features.latest is None:
                 return None
             
-            # Lấy dữ liệu mới nhất
-            latest_features = X.iloc[-1:]
+            latest_features = features.latest
             
             # Chuẩn hóa
-            latest_features_scaled = self.scalers[symbol].transform(latest_features)
+            latest_features_scaled = entry.scaler.transform(latest_features)
             
             # Dự đoán
-            predicted_price = self.models[symbol].predict(latest_features_scaled)[0]
-            current_price = df['close'].iloc[-1]
-            
-            # Tính toán confidence và recommendation
-            price_change_percent = ((predicted_price - current_price) / current_price) * 100
-            
-            # Confidence dựa trên volatility gần đây
-            recent_volatility = df['close'].pct_change().tail(24).std() * 100
-            confidence = max(50, min(95, 90 - recent_volatility * 10))
+            predicted_price = entry.model.predict(latest_features_scaled)[0]
+            current_price = await self.binance_client.get_current_price(symbol) or features.frame['close'].iloc[-1]
             
-            # Recommendation
-            if price_change_percent > 5:
-                recommendation = "STRONG BUY 🚀"
-            elif price_change_percent > 2:
-                recommendation = "BUY 📈"
-            elif price_change_percent > -2:
-                recommendation = "HOLD ⏸️"
-            elif price_change_percent > -5:
-                recommendation = "SELL 📉"
-            else:
-                recommendation = "STRONG SELL ⚠️"
-            
-            return {
-                'symbol': symbol,
-                'current_price': current_price,
-                'predicted_price': predicted_price,
-                'price_change_percent': price_change_percent,
-                'confidence': confidence,
-                'recommendation': recommendation,
-                'prediction_time': datetime.now(),
-                'target_time': datetime.now() + timedelta(hours=hours_ahead)
-            }
+            return self._build_prediction(symbol, predicted_price, current_price, features, hours_ahead)
             
         except Exception as e:
             logger.error(f"Lỗi dự đoán giá cho {symbol}: {e}")
             return None
     
+    async def predict_many(self, symbols, hours_ahead=24):
+        """Dự đoán giá cho nhiều symbol, trả về {symbol: prediction} gồm các symbol dự đoán được.
+        
+        Model, features và giá hiện tại được lấy đồng thời; features được xếp thành một ma trận,
+        chuẩn hóa và dự đoán theo nhóm loại model. Symbol lỗi bị bỏ qua, không làm hỏng cả batch.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        
+        entries, feature_sets, prices = await asyncio.gather(
+            asyncio.gather(*[self.get_model(symbol) for symbol in symbols], return_exceptions=True),
+            asyncio.gather(*[self.get_features(symbol, interval='1h', limit=100) for symbol in symbols],
+                           return_exceptions=True),
+            self.binance_client.get_current_prices(symbols)
+        )
+        
+        ready = []
+        for symbol, entry, features in zip(symbols, entries, feature_sets):
+            if isinstance(entry, BaseException) or isinstance(features, BaseException):
+                error = entry if isinstance(entry, BaseException) else features
+                logger.error(f"Lỗi dự đoán giá cho {symbol}: {error}")
+            elif entry is not None and features is not None and features.latest is not None:
+                ready.append((symbol, entry, features))
+        if not ready:
+            return {}
+        
+        try:
+            # Model và scaler của mỗi symbol lấy từ cùng một entry (cùng phiên bản)
+            X = np.vstack([features.latest.values for _, _, features in ready])
+            X_scaled = scale_rows([entry.scaler for _, entry, _ in ready], X)
+            predicted = predict_rows([entry.model for _, entry, _ in ready], X_scaled)
+        except Exception as e:
+            logger.error(f"Lỗi dự đoán batch {len(ready)} symbols: {e}")
+            return {}
+        
+        predictions = {}
+        for (symbol, _, features), predicted_price in zip(ready, predicted):
+            if not np.isfinite(predicted_price):
+                continue
+            current_price = prices.get(symbol) or features.frame['close'].iloc[-1]
+            predictions[symbol] = self._build_prediction(symbol, predicted_price, current_price, features, hours_ahead)
+        
+        if len(predictions) < len(symbols):
+            logger.warning(f"Dự đoán được {len(predictions)}/{len(symbols)} symbols")
+        return predictions
+    
     async def get_market_sentiment(self, symbols=['BTCUSDT', 'ETHUSDT', 'BNBUSDT']):
         """Phân tích sentiment thị trường"""
         try:
-            predictions = []
-            
-            for symbol in symbols:
-                prediction = await self.predict_price(symbol)
-                if prediction:
-                    predictions.append(prediction)
+            predictions = list((await self.predict_many(symbols)).values())
             
             if not predictions:
                 return None
@@ -296,17 +439,18 @@ class CryptoPredictor:
     async def get_technical_analysis(self, symbol):
         """Phân tích kỹ thuật chi tiết"""
         try:
-            df = await self.binance_client.get_historical_data(symbol, interval='1h', limit=100)
+            features = await self.get_features(symbol, interval='1h', limit=100)
             
-            if df is None:
+            if features is None:
                 return None
             
-            df = self.calculate_technical_indicators(df)
-            latest = df.iloc[-1]
+            # Chỉ báo của nến đã đóng gần nhất, giá hiện tại lấy real-time
+            latest = features.frame.iloc[-1]
+            current_price = await self.binance_client.get_current_price(symbol) or latest['close']
             
             analysis = {
                 'symbol': symbol,
-                'current_price': latest['close'],
+                'current_price': current_price,
                 'rsi': latest.get('rsi', 0),
                 'macd': latest.get('macd', 0),
                 'bb_position': 'N/A',
@@ -324,9 +468,9 @@ class CryptoPredictor:
             
             # Bollinger Bands position
             if 'bb_upper' in latest and 'bb_lower' in latest:
-                if latest['close'] > latest['bb_upper']:
+                if current_price > latest['bb_upper']:
                     analysis['bb_position'] = "Trên dải trên - quá mua"
-                elif latest['close'] < latest['bb_lower']:
+                elif current_price < latest['bb_lower']:
                     analysis['bb_position'] = "Dưới dải dưới - quá bán"
                 else:
                     analysis['bb_position'] = "Trong dải - bình thường"
@@ -348,4 +492,8 @@ class CryptoPredictor:
             
         except Exception as e:
             logger.error(f"Lỗi phân tích kỹ thuật cho {symbol}: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    async def close(self):
+        """Dừng các job training và tắt process pool"""
+        await self.training_queue.close()
\ No newline at end of file
@@ -26,41 +26,44 @@ async def test_binance_client():
     try:
         from binance_client import BinanceClient
         client = BinanceClient()
-        
-        # Test current price
-        print("📊 Lấy giá hiện tại...")
-        price = await client.get_current_price('BTCUSDT')
-        if price:
-            print(f"✅ BTC/USDT: ${price:,.2f}")
-        
-        # Test 24h ticker
-        print("\n📈 Lấy thông tin 24h...")
-        ticker = await client.get_24h_ticker('BTCUSDT')
-        if ticker:
-            print(f"✅ Giá: ${ticker['price']:,.2f}")
-            print(f"✅ Thay đổi: {ticker['change_percent']:+.2f}%")
-            print(f"✅ Volume: {ticker['volume']:,.0f}")
-        
-        # Test historical data
-        print("\n📊 Lấy dữ liệu lịch sử...")
-        df = await client.get_historical_data('BTCUSDT', limit=10)
-        if df is not None:
-            print(f"✅ Đã lấy {len(df)} data points")
-            print(f"✅ Giá gần nhất: ${df['close'].iloc[-1]:,.2f}")
-        
-        # Test top gainers/losers
-        print("\n🏆 Top gainers/losers...")
-        top_data = await client.get_top_gainers_losers(limit=3)
-        if top_data:
-            print("📈 Top Gainers:")
-            for coin in top_data['gainers'][:3]:
-                print(f"   {coin['symbol']}: +{coin['change_percent']:.2f}%")
+        await client.start()
+        try:
+            # Test current price
+            print("📊 Lấy giá hiện tại...")
+            price = await client.get_current_price('BTCUSDT')
+            if price:
+                print(f"✅ BTC/USDT: ${price:,.2f}")
             
-            print("📉 Top Losers:")
-            for coin in top_data['losers'][:3]:
-                print(f"   {coin['symbol']}: {coin['change_percent']:.2f}%")
-        
-        return True
+            # Test 24h ticker
+            print("\n📈 Lấy thông tin 24h...")
+            ticker = await client.get_24h_ticker('BTCUSDT')
+            if ticker:
+                print(f"✅ Giá: ${ticker['price']:,.2f}")
+                print(f"✅ Thay đổi: {ticker['change_percent']:+.2f}%")
+                print(f"✅ Volume: {ticker['volume']:,.0f}")
+            
+            # Test historical data
+            print("\n📊 Lấy dữ liệu lịch sử...")
+            df = await client.get_historical_data('BTCUSDT', limit=10)
+            if df is not None:
+                print(f"✅ Đã lấy {len(df)} data points")
+                print(f"✅ Giá gần nhất: ${df['close'].iloc[-1]:,.2f}")
+            
+            # Test top gainers/losers
+            print("\n🏆 Top gainers/losers...")
+            top_data = await client.get_top_gainers_losers(limit=3)
+            if top_data:
+                print("📈 Top Gainers:")
+                for coin in top_data['gainers'][:3]:
+                    print(f"   {coin['symbol']}: +{coin['change_percent']:.2f}%")
+                
+                print("📉 Top Losers:")
+                for coin in top_data['losers'][:3]:
+                    print(f"   {coin['symbol']}: {coin['change_percent']:.2f}%")
+            
+            return True
+        finally:
+            await client.close()
         
     except Exception as e:
         print(f"❌ Lỗi Binance Client: {e}")
@@ -74,39 +77,43 @@ async def test_crypto_predictor():
     try:
         from crypto_predictor import CryptoPredictor
         predictor = CryptoPredictor()
-        
-        # Test prediction
-        print("📈 Dự đoán giá BTC...")
-        prediction = await predictor.predict_price('BTCUSDT')
-        
-        if prediction:
-            print(f"✅ Giá hiện tại: ${prediction['current_price']:,.2f}")
-            print(f"✅ Giá dự đoán: ${prediction['predicted_price']:,.2f}")
-            print(f"✅ Thay đổi: {prediction['price_change_percent']:+.2f}%")
-            print(f"✅ Độ tin cậy: {prediction['confidence']:.1f}%")
-            print(f"✅ Khuyến nghị: {prediction['recommendation']}")
-        
-        # Test technical analysis
-        print("\n📊 Phân tích kỹ thuật...")
-        analysis = await predictor.get_technical_analysis('BTCUSDT')
-        
-        if analysis:
-            print(f"✅ RSI: {analysis['rsi']:.2f}")
-            print(f"✅ MACD: {analysis['macd']:.6f}")
-            print(f"✅ Trend: {analysis['trend']}")
-            print(f"✅ BB Position: {analysis['bb_position']}")
-            print(f"✅ Signals: {', '.join(analysis['signals'])}")
-        
-        # Test market sentiment
-        print("\n💭 Sentiment thị trường...")
-        sentiment = await predictor.get_market_sentiment()
-        
-        if sentiment:
-            print(f"✅ Sentiment: {sentiment['sentiment']}")
-            print(f"✅ Thay đổi TB: {sentiment['avg_change_percent']:+.2f}%")
-            print(f"✅ Số coins phân tích: {len(sentiment['predictions'])}")
-        
-        return True
+        await predictor.binance_client.start()
+        try:
+            # Test prediction
+            print("📈 Dự đoán giá BTC...")
+            prediction = await predictor.predict_price('BTCUSDT')
+            
+            if prediction:
+                print(f"✅ Giá hiện tại: ${prediction['current_price']:,.2f}")
+                print(f"✅ Giá dự đoán: ${prediction['predicted_price']:,.2f}")
+                print(f"✅ Thay đổi: {prediction['price_change_percent']:+.2f}%")
+                print(f"✅ Độ tin cậy: {prediction['confidence']:.1f}%")
+                print(f"✅ Khuyến nghị: {prediction['recommendation']}")
+            
+            # Test technical analysis
+            print("\n📊 Phân tích kỹ thuật...")
+            analysis = await predictor.get_technical_analysis('BTCUSDT')
+            
+            if analysis:
+                print(f"✅ RSI: {analysis['rsi']:.2f}")
+                print(f"✅ MACD: {analysis['macd']:.6f}")
+                print(f"✅ Trend: {analysis['trend']}")
+                print(f"✅ BB Position: {analysis['bb_position']}")
+                print(f"✅ Signals: {', '.join(analysis['signals'])}")
+            
+            # Test market sentiment
+            print("\n💭 Sentiment thị trường...")
+            sentiment = await predictor.get_market_sentiment()
+            
+            if sentiment:
+                print(f"✅ Sentiment: {sentiment['sentiment']}")
+                print(f"✅ Thay đổi TB: {sentiment['avg_change_percent']:+.2f}%")
+                print(f"✅ Số coins phân tích: {len(sentiment['predictions'])}")
+            
+            return True
+        finally:
+            await predictor.close()
+            await predictor.binance_client.close()
         
     except Exception as e:
         print(f"❌ Lỗi Crypto Predictor: {e}")
@@ -120,36 +127,38 @@ async def test_news_service():
     try:
         from news_service import NewsService
         news_service = NewsService()
-        
-        # Test general crypto news
-        print("📰 Lấy tin tức crypto...")
-        news = await news_service.get_crypto_news(limit=3)
-        
-        if news:
-            print(f"✅ Đã lấy {len(news)} bài báo")
-            for i, article in enumerate(news[:2], 1):
-                print(f"   {i}. {article['title'][:60]}...")
-                print(f"      Nguồn: {article['source']} | Sentiment: {article['sentiment']}")
-        
-        # Test coin-specific news
-        print("\n📰 Tin tức Bitcoin...")
-        btc_news = await news_service.get_coin_news('BTC', limit=2)
-        
-        if btc_news:
-            print(f"✅ Đã lấy {len(btc_news)} bài báo về Bitcoin")
-            for i, article in enumerate(btc_news, 1):
-                print(f"   {i}. {article['title'][:60]}...")
-        
-        # Test market news summary
-        print("\n📊 Tóm tắt tin tức thị trường...")
-        summary = await news_service.get_market_news_summary()
-        
-        if summary:
-            print(f"✅ Sentiment tổng thể: {summary['overall_sentiment']}")
-            print(f"✅ Tích cực: {summary['positive_count']} | Tiêu cực: {summary['negative_count']} | Trung tính: {summary['neutral_count']}")
-            print(f"✅ Tổng bài báo: {summary['total_articles']}")
-        
-        return True
+        try:
+            # Test general crypto news
+            print("📰 Lấy tin tức crypto...")
+            news = await news_service.get_crypto_news(limit=3)
+            
+            if news:
+                print(f"✅ Đã lấy {len(news)} bài báo")
+                for i, article in enumerate(news[:2], 1):
+                    print(f"   {i}. {article['title'][:60]}...")
+                    print(f"      Nguồn: {article['source']} | Sentiment: {article['sentiment']}")
+            
+            # Test coin-specific news
+            print("\n📰 Tin tức Bitcoin...")
+            btc_news = await news_service.get_coin_news('BTC', limit=2)
+            
+            if btc_news:
+                print(f"✅ Đã lấy {len(btc_news)} bài báo về Bitcoin")
+                for i, article in enumerate(btc_news, 1):
+                    print(f"   {i}. {article['title'][:60]}...")
+            
+            # Test market news summary
+            print("\n📊 Tóm tắt tin tức thị trường...")
+            summary = await news_service.get_market_news_summary()
+            
+            if summary:
+                print(f"✅ Sentiment tổng thể: {summary['overall_sentiment']}")
+                print(f"✅ Tích cực: {summary['positive_count']} | Tiêu cực: {summary['negative_count']} | Trung tính: {summary['neutral_count']}")
+                print(f"✅ Tổng bài báo: {summary['total_articles']}")
+            
+            return True
+        finally:
+            await news_service.close()
         
     except Exception as e:
         print(f"❌ Lỗi News Service: {e}")
@@ -202,46 +211,51 @@ async def run_comprehensive_demo():
         
         # Initialize services
         binance = BinanceClient()
-        predictor = CryptoPredictor()
+        predictor = CryptoPredictor(binance)
         news = NewsService()
-        
-        # Comprehensive analysis for BTC
-        print("📊 Phân tích tổng hợp BTC/USDT:")
-        print("-" * 30)
-        
-        # Current price
-        price = await binance.get_current_price('BTCUSDT')
-        ticker = await binance.get_24h_ticker('BTCUSDT')
-        
-        if price and ticker:
-            print(f"💰 Giá hiện tại: ${format_price(price)}")
-            print(f"📈 24h thay đổi: {format_percentage(ticker['change_percent'])}")
-            print(f"📊 Volume 24h: {ticker['volume']:,.0f} BTC")
-        
-        # Prediction
-        prediction = await predictor.predict_price('BTCUSDT')
-        if prediction:
-            print(f"🔮 Dự đoán 24h: ${format_price(prediction['predicted_price'])}")
-            print(f"🎯 Khuyến nghị: {prediction['recommendation']}")
-            print(f"📊 Độ tin cậy: {prediction['confidence']:.1f}%")
-        
-        # Technical analysis
-        analysis = await predictor.get_technical_analysis('BTCUSDT')
-        if analysis:
-            print(f"📈 RSI: {analysis['rsi']:.1f}")
-            print(f"📊 Trend: {analysis['trend']}")
-        
-        # News
-        btc_news = await news.get_coin_news('BTC', limit=1)
-        if btc_news:
-            print(f"📰 Tin mới nhất: {btc_news[0]['title'][:50]}...")
-        
-        # Market sentiment
-        sentiment = await predictor.get_market_sentiment()
-        if sentiment:
-            print(f"💭 Sentiment thị trường: {sentiment['sentiment']}")
-        
-        return True
+        await binance.start()
+        try:
+            # Comprehensive analysis for BTC
+            print("📊 Phân tích tổng hợp BTC/USDT:")
+            print("-" * 30)
+            
+            # Current price
+            price = await binance.get_current_price('BTCUSDT')
+            ticker = await binance.get_24h_ticker('BTCUSDT')
+            
+            if price and ticker:
+                print(f"💰 Giá hiện tại: ${format_price(price)}")
+                print(f"📈 24h thay đổi: {format_percentage(ticker['change_percent'])}")
+                print(f"📊 Volume 24h: {ticker['volume']:,.0f} BTC")
+            
+            # Prediction
+            prediction = await predictor.predict_price('BTCUSDT')
+            if prediction:
+                print(f"🔮 Dự đoán 24h: ${format_price(prediction['predicted_price'])}")
+                print(f"🎯 Khuyến nghị: {prediction['recommendation']}")
+                print(f"📊 Độ tin cậy: {prediction['confidence']:.1f}%")
+            
+            # Technical analysis
+            analysis = await predictor.get_technical_analysis('BTCUSDT')
+            if analysis:
+                print(f"📈 RSI: {analysis['rsi']:.1f}")
+                print(f"📊 Trend: {analysis['trend']}")
+            
+            # News
+            btc_news = await news.get_coin_news('BTC', limit=1)
+            if btc_news:
+                print(f"📰 Tin mới nhất: {btc_news[0]['title'][:50]}...")
+            
+            # Market sentiment
+            sentiment = await predictor.get_market_sentiment()
+            if sentiment:
+                print(f"💭 Sentiment thị trường: {sentiment['sentiment']}")
+            
+            return True
+        finally:
+            await predictor.close()
+            await binance.close()
+            await news.close()
         
     except Exception as e:
         print(f"❌ Lỗi comprehensive demo: {e}")
@@ -22,9 +22,19 @@ class DemoCryptoBot:
     """Demo bot để test chức năng"""
     
     def __init__(self):
-        self.predictor = CryptoPredictor()
         self.binance = BinanceClient()
+        self.predictor = CryptoPredictor(self.binance)
         self.news = NewsService()
+    
+    async def start(self):
+        """Mở connection pool và market stream như bot thật"""
+        await self.binance.start()
+    
+    async def close(self):
+        """Tắt process pool training, đóng session Binance và news"""
+        await self.predictor.close()
+        await self.binance.close()
+        await self.news.close()
         
     async def demo_price_analysis(self, symbol='BTCUSDT'):
         """Demo phân tích giá"""
@@ -168,7 +178,11 @@ class DemoCryptoBot:
 async def main():
     """Main function"""
     bot = DemoCryptoBot()
-    await bot.run_demo()
+    await bot.start()
+    try:
+        await bot.run_demo()
+    finally:
+        await bot.close()
 
 if __name__ == '__main__':
     try:
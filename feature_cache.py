@@ -0,0 +1,91 @@
+import os
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+def frame_nbytes(frame):
+    """Kích thước dữ liệu của DataFrame (cột kiểu số + index), không dựng Series cho từng cột như memory_usage"""
+    return len(frame) * sum(dtype.itemsize for dtype in frame.dtypes) + int(frame.index.nbytes)
+
+class FeatureSet:
+    """Chỉ báo kỹ thuật đã tính cho các nến đã đóng của một symbol"""
+
+    def __init__(self, symbol, interval, closed_time, frame, latest=None):
+        self.symbol = symbol
+        self.interval = interval
+        self.closed_time = closed_time  # open time (ms) của nến đã đóng gần nhất
+        self.frame = frame              # DataFrame OHLCV + cột chỉ báo, chỉ gồm nến đã đóng
+        self.latest = latest            # DataFrame một dòng feature cho model (None nếu chưa đủ dữ liệu)
+        self.fetched_at = None          # time.time() lúc tải dữ liệu
+        self.nbytes = frame_nbytes(frame)
+        if latest is not None:
+            self.nbytes += frame_nbytes(latest)
+
+class FeatureCache:
+    """Cache LRU theo (symbol, interval, open time nến đã đóng gần nhất), giới hạn theo bộ nhớ.
+
+    Khi có nến mới đóng, key đổi nên entry cũ của cùng (symbol, interval) bị bỏ ngay khi lưu entry mới.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = int(max_bytes or float(os.getenv('FEATURE_CACHE_MAX_MB', '64')) * 1024 * 1024)
+        self.entries = OrderedDict()    # (symbol, interval, closed_time) -> FeatureSet
+        self.latest_keys = {}           # (symbol, interval) -> key mới nhất
+        self.nbytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry
+
+    def put(self, key, entry):
+        symbol, interval, closed_time = key
+        previous = self.latest_keys.get((symbol, interval))
+        if previous is not None and previous != key:
+            if previous[2] > closed_time:
+                # Dữ liệu cũ hơn entry đang có: không ghi đè
+                return entry
+            self._remove(previous)
+            self.stats['invalidations'] += 1
+
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        self.latest_keys[(symbol, interval)] = key
+        self.nbytes += entry.nbytes
+
+        # Vượt giới hạn bộ nhớ: bỏ entry ít dùng gần đây nhất (giữ lại entry vừa thêm)
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.stats['evictions'] += 1
+        return entry
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.nbytes -= entry.nbytes
+        if self.latest_keys.get(key[:2]) == key:
+            del self.latest_keys[key[:2]]
+
+    def clear(self):
+        self.entries.clear()
+        self.latest_keys.clear()
+        self.nbytes = 0
+
+    def metrics(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self.entries),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+        }
@@ -0,0 +1,146 @@
+import os
+import time
+import asyncio
+import numpy as np
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Biên trên (ms) của các bucket histogram latency
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000]
+
+class UpstreamHealth:
+    """Kết quả probe gần đây của một upstream: latency, tỉ lệ lỗi, lần kiểm tra cuối"""
+
+    def __init__(self, name, window=100):
+        self.name = name
+        self.latencies = deque(maxlen=window)   # giây, chỉ các probe thành công
+        self.results = deque(maxlen=window)     # True/False theo từng probe
+        self.last_ok = None
+        self.last_error = None
+        self.checked_at = None                  # time.time() của probe gần nhất
+        self.checks = 0
+
+    def record(self, ok, latency=None, error=None):
+        self.checks += 1
+        self.results.append(ok)
+        self.last_ok = ok
+        self.checked_at = time.time()
+        if ok:
+            self.latencies.append(latency)
+            self.last_error = None
+        else:
+            self.last_error = error
+
+    def histogram(self):
+        """Số probe theo từng bucket latency (ms) trong cửa sổ gần nhất"""
+        counts = np.bincount(
+            np.searchsorted(LATENCY_BUCKETS_MS, np.fromiter(self.latencies, float) * 1000),
+            minlength=len(LATENCY_BUCKETS_MS) + 1
+        )
+        labels = [f"<{bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">={LATENCY_BUCKETS_MS[-1]}ms"]
+        return dict(zip(labels, counts.tolist()))
+
+    def status(self):
+        latencies_ms = np.fromiter(self.latencies, float) * 1000
+        return {
+            'name': self.name,
+            'up': bool(self.last_ok),
+            'checked_at': self.checked_at,
+            'latency_p50': float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None,
+            'latency_p95': float(np.percentile(latencies_ms, 95)) if len(latencies_ms) else None,
+            'error_rate': self.results.count(False) / len(self.results) if self.results else None,
+            'histogram': self.histogram(),
+            'last_error': self.last_error,
+            'checks': self.checks
+        }
+
+class HealthMonitor:
+    """Probe định kỳ các upstream ở background, trả về trạng thái đã cache ngay lập tức"""
+
+    def __init__(self, interval=None, timeout=None, window=None):
+        self.interval = float(interval or os.getenv('HEALTH_CHECK_INTERVAL', '30'))
+        self.timeout = float(timeout or os.getenv('HEALTH_CHECK_TIMEOUT', '5'))
+        self.window = int(window or os.getenv('HEALTH_CHECK_WINDOW', '100'))
+        # API bên thứ ba (CoinGecko, tin tức) có quota theo ngày/tháng: probe thưa hơn nhiều
+        self.third_party_interval = float(os.getenv('HEALTH_THIRD_PARTY_INTERVAL', '900'))
+        self.probes = {}      # name -> coroutine function, raise khi upstream lỗi
+        self.intervals = {}   # name -> chu kỳ probe (giây)
+        self.next_check = {}  # name -> time.monotonic() của lần probe tới
+        self.health = {}      # name -> UpstreamHealth
+        self._task = None
+        self._ready = asyncio.Event()
+
+    def add_probe(self, name, probe, interval=None):
+        """Đăng ký probe cho upstream, chạy mỗi `interval` giây (mặc định chu kỳ chung)"""
+        self.probes[name] = probe
+        self.intervals[name] = float(interval or self.interval)
+        self.next_check[name] = 0.0
+        self.health.setdefault(name, UpstreamHealth(name, self.window))
+
+    def start(self):
+        """Chạy vòng probe ở background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def wait_ready(self, timeout=None):
+        """Chờ vòng probe đầu tiên hoàn thành"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            await self.check_all([name for name in list(self.probes) if self.next_check[name] <= now])
+            # Ngủ tới probe đến hạn gần nhất (tối đa một chu kỳ chung để nhận probe mới đăng ký)
+            wake = min(self.next_check.values(), default=now + self.interval)
+            await asyncio.sleep(max(0.0, min(wake, time.monotonic() + self.interval) - time.monotonic()))
+
+    async def check_all(self, names=None):
+        """Probe các upstream (mặc định tất cả) song song, mỗi probe giới hạn bởi timeout"""
+        names = list(self.probes) if names is None else names
+        await asyncio.gather(*[self._check(name, self.probes[name]) for name in names])
+        self._ready.set()
+
+    async def _check(self, name, probe):
+        self.next_check[name] = time.monotonic() + self.intervals[name]
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), self.timeout)
+            self.health[name].record(True, time.perf_counter() - started)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if self.health[name].last_ok is not False:
+                logger.warning(f"Health check {name} lỗi: {error}")
+            self.health[name].record(False, error=error)
+
+    def is_up(self, name):
+        """Trạng thái đã cache của upstream (không gọi mạng); False nếu chưa probe hoặc kết quả quá cũ"""
+        health = self.health.get(name)
+        if health is None or not health.last_ok:
+            return False
+        return time.time() - health.checked_at <= self.intervals.get(name, self.interval) * 3 + self.timeout
+
+    def status(self, name):
+        health = self.health.get(name)
+        return health.status() if health else None
+
+    def snapshot(self):
+        """Trạng thái của mọi upstream"""
+        return {name: health.status() for name, health in self.health.items()}
@@ -0,0 +1,188 @@
+import os
+import time
+import asyncio
+import aiohttp
+import numpy as np
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URLS = [
+    'https://api.binance.com',
+    'https://api1.binance.com',
+    'https://api2.binance.com',
+    'https://api3.binance.com',
+    'https://data-api.binance.vision'
+]
+
+class CircuitOpenError(Exception):
+    """Mọi host đều đang mở circuit breaker"""
+
+class HostState:
+    """Latency gần đây và trạng thái circuit breaker của một host"""
+
+    def __init__(self, url, window=200):
+        self.url = url
+        self.latencies = deque(maxlen=window)
+        self.p50 = None
+        self.p95 = None
+        self.failures = 0           # Số lần lỗi liên tiếp
+        self.open_until = 0.0       # Circuit mở tới thời điểm này (time.monotonic())
+        self.requests = 0
+        self.errors = 0
+        self._since_update = 0
+
+    def is_open(self):
+        return time.monotonic() < self.open_until
+
+    def add_latency(self, latency):
+        """Thêm một mẫu latency; percentile được tính lại sau mỗi 10 mẫu thay vì mỗi request"""
+        self.latencies.append(latency)
+        self._since_update += 1
+        if self._since_update >= 10 or len(self.latencies) < 20:
+            self.p50, self.p95 = (float(v) for v in np.percentile(np.fromiter(self.latencies, float), [50, 95]))
+            self._since_update = 0
+
+class HostPool:
+    """Các base URL tương đương của Binance: hedged request theo p95 và circuit breaker theo host"""
+
+    def __init__(self, urls, hedge_min_delay=None, hedge_max_delay=None,
+                 failure_threshold=None, open_seconds=None):
+        self.hosts = [HostState(url.rstrip('/')) for url in urls]
+        # Giá trị truyền vào (kể cả 0) được ưu tiên hơn biến môi trường
+        self.hedge_min_delay = float(hedge_min_delay if hedge_min_delay is not None
+                                     else os.getenv('BINANCE_HEDGE_MIN_DELAY', '0.05'))
+        self.hedge_max_delay = float(hedge_max_delay if hedge_max_delay is not None
+                                     else os.getenv('BINANCE_HEDGE_MAX_DELAY', '1.0'))
+        self.failure_threshold = int(failure_threshold if failure_threshold is not None
+                                     else os.getenv('BINANCE_CIRCUIT_FAILURES', '5'))
+        self.open_seconds = float(open_seconds if open_seconds is not None
+                                  else os.getenv('BINANCE_CIRCUIT_OPEN_SECONDS', '30'))
+        # Cần đủ mẫu thì p95 mới đáng tin, trước đó dùng hedge_max_delay
+        self.min_samples = 20
+        self.stats = {'requests': 0, 'hedges': 0, 'hedge_wins': 0, 'failovers': 0, 'circuit_opens': 0}
+
+    def candidates(self, exclude=None):
+        """Host có circuit đóng (hoặc đã hết thời gian mở), host vừa lỗi xếp sau, rồi theo latency trung vị"""
+        hosts = [host for host in self.hosts
+                 if not host.is_open() and not (exclude and exclude(host.url))]
+        # Host chưa có mẫu latency được coi như chậm bằng hedge_max_delay, không xếp trước host đã đo
+        return sorted(hosts, key=lambda host: (host.failures, self.hedge_max_delay if host.p50 is None else host.p50))
+
+    def hedge_delay(self, host):
+        """Thời gian chờ trước khi gửi request dự phòng: p95 latency của host"""
+        if len(host.latencies) < self.min_samples:
+            return self.hedge_max_delay
+        return min(max(host.p95, self.hedge_min_delay), self.hedge_max_delay)
+
+    @staticmethod
+    def is_host_error(error):
+        """Lỗi do host (mạng, timeout, 5xx) thì thử host khác; lỗi request (4xx, 429) thì không"""
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status >= 500
+        return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+    def record_success(self, host, latency):
+        host.requests += 1
+        host.add_latency(latency)
+        host.failures = 0
+        host.open_until = 0.0
+
+    def record_failure(self, host):
+        host.requests += 1
+        host.errors += 1
+        host.failures += 1
+        if host.failures >= self.failure_threshold:
+            host.open_until = time.monotonic() + self.open_seconds
+            self.stats['circuit_opens'] += 1
+            logger.warning(f"Mở circuit breaker cho {host.url} trong {self.open_seconds:.0f}s "
+                           f"({host.failures} lỗi liên tiếp)")
+
+    async def _attempt(self, send, host, attempt):
+        started = time.monotonic()
+        try:
+            result = await send(host.url, attempt)
+        except asyncio.CancelledError:
+            # Request thua hedge vẫn là một mẫu latency (ít nhất bằng thời gian đã chờ)
+            host.add_latency(time.monotonic() - started)
+            raise
+        except Exception as e:
+            if self.is_host_error(e):
+                self.record_failure(host)
+            else:
+                self.record_success(host, time.monotonic() - started)
+            raise
+        self.record_success(host, time.monotonic() - started)
+        return result
+
+    async def request(self, send, hedge=True, exclude=None):
+        """Gọi send(base_url, attempt); sau hedge delay gửi thêm một bản sang host kế tiếp, lấy kết quả về trước"""
+        self.stats['requests'] += 1
+        hosts = iter(self.candidates(exclude))
+        pending = {}
+        attempts = 0
+        hedged = False
+        last_error = None
+
+        def launch():
+            nonlocal attempts
+            host = next(hosts, None)
+            if host is None:
+                return None
+            task = asyncio.ensure_future(self._attempt(send, host, attempts))
+            pending[task] = host
+            attempts += 1
+            return host
+
+        primary = launch()
+        if primary is None:
+            # Mọi host đều đang mở circuit: trả lỗi ngay thay vì chờ timeout
+            raise CircuitOpenError("Circuit breaker đang mở cho mọi host Binance")
+        try:
+            while pending:
+                timeout = self.hedge_delay(primary) if hedge and not hedged else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Request chính chậm hơn p95: gửi thêm một bản sang host khác
+                    hedged = True
+                    if launch() is not None:
+                        self.stats['hedges'] += 1
+                    continue
+
+                for task in done:
+                    host = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        if not self.is_host_error(e):
+                            raise
+                        last_error = e
+                        logger.warning(f"Lỗi host {host.url}: {e}")
+                        continue
+                    if hedged and host is not primary:
+                        self.stats['hedge_wins'] += 1
+                    return result
+
+                # Request lỗi do host: chuyển ngay sang host kế tiếp
+                if not pending and launch() is not None:
+                    self.stats['failovers'] += 1
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def metrics(self):
+        """Latency p50/p95, tỉ lệ lỗi và trạng thái circuit của từng host"""
+        return {
+            **self.stats,
+            'hosts': [{
+                'url': host.url,
+                'p50': host.p50,
+                'p95': host.p95,
+                'requests': host.requests,
+                'error_rate': host.errors / host.requests if host.requests else 0.0,
+                'circuit_open': host.is_open()
+            } for host in self.hosts]
+        }
@@ -0,0 +1,393 @@
+import math
+import pickle
+import numpy as np
+import pandas as pd
+import logging
+from collections import deque
+
+from indicators import FEATURE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+FEATURE_INDEX = pd.Index(FEATURE_COLUMNS)
+
+class RollingWindow:
+    """Cửa sổ trượt cố định: tổng, trung bình, độ lệch chuẩn cập nhật O(1) mỗi giá trị.
+
+    Tổng được lưu quanh một giá trị gốc (shift) để tránh mất chính xác với giá lớn,
+    và được tính lại chính xác sau mỗi `window` lần cập nhật (khấu hao O(1)).
+    Giá trị NaN trong cửa sổ làm kết quả là NaN giống rolling của pandas.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.shift = None
+        self.sum = 0.0          # tổng (x - shift) của các giá trị khác NaN
+        self.sum_sq = 0.0       # tổng (x - shift)^2
+        self.nans = 0
+        self._since_resync = 0
+
+    def push(self, x):
+        if len(self.values) == self.window:
+            self._remove(self.values[0])
+        self.values.append(x)
+        if x != x:
+            self.nans += 1
+        else:
+            if self.shift is None:
+                self.shift = x
+            d = x - self.shift
+            self.sum += d
+            self.sum_sq += d * d
+
+        self._since_resync += 1
+        if self._since_resync >= self.window:
+            self._resync()
+
+    def _remove(self, x):
+        if x != x:
+            self.nans -= 1
+        else:
+            d = x - self.shift
+            self.sum -= d
+            self.sum_sq -= d * d
+
+    def _resync(self):
+        """Tính lại tổng chính xác, gốc mới là trung bình hiện tại của cửa sổ"""
+        finite = [x for x in self.values if x == x]
+        self.shift = math.fsum(finite) / len(finite) if finite else None
+        self.sum = math.fsum(x - self.shift for x in finite) if finite else 0.0
+        self.sum_sq = math.fsum((x - self.shift) ** 2 for x in finite) if finite else 0.0
+        self._since_resync = 0
+
+    def ready(self):
+        return len(self.values) == self.window and self.nans == 0
+
+    def total(self):
+        return self.sum + self.window * self.shift if self.ready() else NAN
+
+    def mean(self):
+        return self.sum / self.window + self.shift if self.ready() else NAN
+
+    def std(self, ddof=0):
+        if not self.ready():
+            return NAN
+        mean = self.sum / self.window
+        return math.sqrt(max(self.sum_sq / self.window - mean * mean, 0.0) * self.window / (self.window - ddof))
+
+class RollingExtreme:
+    """Min hoặc max trượt bằng monotonic deque (khấu hao O(1)), NaN trong cửa sổ cho kết quả NaN"""
+
+    def __init__(self, window, mode='min'):
+        self.window = window
+        self.is_min = mode == 'min'
+        self.candidates = deque()   # (vị trí, giá trị) đơn điệu
+        self.count = 0
+        self.last_nan = -window
+
+    def push(self, x):
+        i = self.count
+        self.count += 1
+        if x != x:
+            self.last_nan = i
+        else:
+            candidates = self.candidates
+            if self.is_min:
+                while candidates and candidates[-1][1] >= x:
+                    candidates.pop()
+            else:
+                while candidates and candidates[-1][1] <= x:
+                    candidates.pop()
+            candidates.append((i, x))
+        while self.candidates and self.candidates[0][0] <= i - self.window:
+            self.candidates.popleft()
+
+    def value(self):
+        if self.count < self.window or self.last_nan > self.count - 1 - self.window:
+            return NAN
+        return self.candidates[0][1]
+
+class SMA:
+    def __init__(self, window):
+        self.window = RollingWindow(window)
+
+    def update(self, x):
+        self.window.push(x)
+        return self.window.mean()
+
+class EMA:
+    """EMA adjust=False như pandas ewm: bỏ qua NaN ở đầu, giá trị đầu tiên làm gốc"""
+
+    def __init__(self, span=None, alpha=None, min_periods=None):
+        self.alpha = 2.0 / (span + 1.0) if alpha is None else alpha
+        self.min_periods = (span or 1) if min_periods is None else min_periods
+        self.raw = NAN      # giá trị chưa che bởi min_periods
+        self.count = 0
+
+    def update(self, x):
+        if self.count == 0:
+            if x != x:
+                return NAN
+            self.raw = x
+        else:
+            self.raw = self.alpha * x + (1.0 - self.alpha) * self.raw
+        self.count += 1
+        return self.value()
+
+    def value(self):
+        return self.raw if self.count >= self.min_periods else NAN
+
+class MACD:
+    """MACD (fast, slow, signal); histogram = line - signal như ta.trend.macd_diff"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(span=fast)
+        self.slow = EMA(span=slow)
+        self.signal = EMA(span=signal)
+        self.line = NAN
+        self.histogram = NAN
+
+    def update(self, close):
+        self.line = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(self.line)
+        self.histogram = self.line - signal
+        return self.histogram
+
+class RSI:
+    """RSI với Wilder smoothing (alpha = 1 / window)"""
+
+    def __init__(self, window=14):
+        self.up = EMA(alpha=1.0 / window, min_periods=window)
+        self.down = EMA(alpha=1.0 / window, min_periods=window)
+        self.prev_close = None
+
+    def update(self, close):
+        diff = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        up = self.up.update(diff if diff > 0 else 0.0)
+        down = self.down.update(-diff if diff < 0 else 0.0)
+        if down == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + up / down)
+
+class BollingerBands:
+    """Bollinger Bands (window, k độ lệch chuẩn ddof=0)"""
+
+    def __init__(self, window=20, k=2):
+        self.window = RollingWindow(window)
+        self.k = k
+        self.middle = self.upper = self.lower = self.std = NAN
+
+    def update(self, close):
+        self.window.push(close)
+        self.middle = self.window.mean()
+        self.std = self.window.std(ddof=0)
+        self.upper = self.middle + self.k * self.std
+        self.lower = self.middle - self.k * self.std
+        return self.middle
+
+    def width(self):
+        return _divide(self.upper - self.lower, self.middle)
+
+class Stochastic:
+    """Stochastic %K/%D trên high/low của `window` nến gần nhất"""
+
+    def __init__(self, window=14, smooth=3):
+        self.lowest = RollingExtreme(window, 'min')
+        self.highest = RollingExtreme(window, 'max')
+        self.signal = SMA(smooth)
+        self.k = self.d = NAN
+
+    def update(self, high, low, close):
+        self.lowest.push(low)
+        self.highest.push(high)
+        self.k = _divide(100.0 * (close - self.lowest.value()), self.highest.value() - self.lowest.value())
+        self.d = self.signal.update(self.k)
+        return self.k
+
+class WilliamsR:
+    """Williams %R dùng chung cửa sổ high/low với Stochastic"""
+
+    def __init__(self, stochastic):
+        self.stochastic = stochastic
+
+    def value(self, close):
+        highest, lowest = self.stochastic.highest.value(), self.stochastic.lowest.value()
+        return _divide(-100.0 * (highest - close), highest - lowest)
+
+class VWAP:
+    """VWAP trượt: tổng(typical price * volume) / tổng(volume) trên `window` nến"""
+
+    def __init__(self, window=14):
+        self.price_volume = RollingWindow(window)
+        self.volume = RollingWindow(window)
+
+    def update(self, high, low, close, volume):
+        self.price_volume.push((high + low + close) / 3.0 * volume)
+        self.volume.push(volume)
+        return _divide(self.price_volume.total(), self.volume.total())
+
+def _divide(numerator, denominator):
+    """Phép chia kiểu NumPy: 0/0 = NaN, x/0 = ±inf"""
+    if denominator == 0:
+        if numerator == 0 or numerator != numerator:
+            return NAN
+        return math.copysign(math.inf, numerator)
+    return numerator / denominator
+
+class IndicatorState:
+    """Trạng thái chỉ báo của một symbol, cập nhật O(1) với mỗi nến đã đóng.
+
+    Sau khi nhận các nến t0..tn, `features()` bằng đúng dòng tn mà
+    calculate_technical_indicators + prepare_features tính trên cùng chuỗi nến đó.
+    """
+
+    def __init__(self):
+        self.open_time = None   # open time (ms) của nến gần nhất đã nhận
+        self.count = 0
+        self.prev_close = None
+        self.sma_7 = SMA(7)
+        self.sma_25 = SMA(25)
+        self.macd = MACD(12, 26, 9)
+        self.rsi = RSI(14)
+        self.bollinger = BollingerBands(20, 2)
+        self.stochastic = Stochastic(14, 3)
+        self.williams_r = WilliamsR(self.stochastic)
+        self.volume_sma = SMA(20)
+        self.vwap = VWAP(14)
+        self.support = RollingExtreme(20, 'min')
+        self.resistance = RollingExtreme(20, 'max')
+        self.row = dict.fromkeys(FEATURE_COLUMNS, NAN)
+
+    def update(self, open_time, open_, high, low, close, volume):
+        """Nạp một nến đã đóng, trả về dict các cột feature của nến đó"""
+        row = self.row
+        row['open'], row['high'], row['low'], row['volume'] = open_, high, low, volume
+
+        # Moving Averages + MACD
+        row['sma_7'] = self.sma_7.update(close)
+        row['sma_25'] = self.sma_25.update(close)
+        row['macd'] = self.macd.update(close)
+        row['ema_12'] = self.macd.fast.value()
+        row['ema_26'] = self.macd.slow.value()
+        row['macd_signal'] = self.macd.signal.value()
+
+        row['rsi'] = self.rsi.update(close)
+
+        # Bollinger Bands
+        self.bollinger.update(close)
+        row['bb_middle'] = self.bollinger.middle
+        row['bb_upper'] = self.bollinger.upper
+        row['bb_lower'] = self.bollinger.lower
+        row['bb_width'] = self.bollinger.width()
+
+        # Stochastic, Williams %R
+        row['stoch_k'] = self.stochastic.update(high, low, close)
+        row['stoch_d'] = self.stochastic.d
+        row['williams_r'] = self.williams_r.value(close)
+
+        # Volume
+        row['volume_sma'] = self.volume_sma.update(volume)
+        row['vwap'] = self.vwap.update(high, low, close, volume)
+
+        # Price features
+        row['price_change'] = _divide(close, self.prev_close) - 1 if self.prev_close is not None else NAN
+        row['high_low_ratio'] = _divide(high, low)
+        row['close_open_ratio'] = _divide(close, open_)
+
+        # Volatility (ddof=1), Support / Resistance
+        row['volatility'] = self.bollinger.window.std(ddof=1)
+        self.support.push(low)
+        self.resistance.push(high)
+        row['support'] = self.support.value()
+        row['resistance'] = self.resistance.value()
+
+        self.prev_close = close
+        self.open_time = open_time
+        self.count += 1
+        return row
+
+    def update_many(self, open_times, open_, high, low, close, volume):
+        """Nạp nhiều nến đã đóng theo thứ tự thời gian"""
+        for values in zip(open_times.tolist(), open_.tolist(), high.tolist(), low.tolist(),
+                          close.tolist(), volume.tolist()):
+            self.update(*values)
+        return self.row
+
+    def ready(self):
+        """Mọi feature của nến gần nhất đều có giá trị (đã qua giai đoạn warm-up)"""
+        return self.count > 0 and not any(value != value for value in self.row.values())
+
+    def features(self):
+        """Vector feature của nến gần nhất, cùng thứ tự FEATURE_COLUMNS"""
+        return np.array([self.row[col] for col in FEATURE_COLUMNS])
+
+    def features_frame(self, index=None):
+        """DataFrame một dòng các feature của nến gần nhất (đầu vào của scaler/model)"""
+        return pd.DataFrame(self.features()[None, :], columns=FEATURE_INDEX, index=index)
+
+    def snapshot(self):
+        """Lưu toàn bộ trạng thái thành bytes (khôi phục bằng IndicatorState.restore)"""
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def restore(data):
+        return pickle.loads(data)
+
+def open_times_ms(index):
+    """Open time (ms) từ index của DataFrame nến (DatetimeIndex hoặc số ms)"""
+    if isinstance(index, pd.DatetimeIndex):
+        return index.values.astype('datetime64[ms]').astype(np.int64)
+    return np.asarray(index, dtype=np.int64)
+
+class IndicatorStates:
+    """IndicatorState theo (symbol, interval): chỉ nạp các nến đã đóng mới, dựng lại khi có khoảng trống"""
+
+    def __init__(self):
+        self.states = {}
+        self.stats = {'updates': 0, 'candles': 0, 'rebuilds': 0}
+
+    def get(self, symbol, interval='1h'):
+        return self.states.get((symbol, interval))
+
+    def update(self, symbol, interval, df, end=None):
+        """Đồng bộ state với các nến đã đóng df[:end] (DataFrame OHLCV tăng dần theo thời gian)"""
+        times = open_times_ms(df.index)[:end]
+        state = self.states.get((symbol, interval))
+        start = 0
+
+        if state is not None and state.open_time is not None:
+            pos = int(np.searchsorted(times, state.open_time))
+            if pos < len(times) and times[pos] == state.open_time:
+                # Chỉ nạp các nến sau nến cuối cùng state đã nhận
+                start = pos + 1
+            elif not len(times) or state.open_time > times[-1]:
+                start = len(times)
+            else:
+                # Thiếu nến giữa state và dữ liệu mới: dựng lại từ đầu
+                state = None
+
+        if state is None:
+            state = IndicatorState()
+            self.states[(symbol, interval)] = state
+            self.stats['rebuilds'] += 1
+
+        if start < len(times):
+            state.update_many(times[start:], *(df[col].values[start:end] for col in OHLCV_COLUMNS))
+            self.stats['candles'] += len(times) - start
+        self.stats['updates'] += 1
+        return state
+
+    def snapshot(self):
+        """Snapshot bytes của state từng (symbol, interval)"""
+        return {key: state.snapshot() for key, state in self.states.items()}
+
+    def restore(self, snapshots):
+        for key, data in snapshots.items():
+            self.states[key] = IndicatorState.restore(data)
+
+    def discard(self, symbol, interval='1h'):
+        self.states.pop((symbol, interval), None)
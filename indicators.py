@@ -0,0 +1,160 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+from scipy.ndimage import minimum_filter1d, maximum_filter1d
+
+# 26 cột feature của model, cùng thứ tự với CryptoPredictor.prepare_features
+FEATURE_COLUMNS = [
+    'open', 'high', 'low', 'volume',
+    'sma_7', 'sma_25', 'ema_12', 'ema_26',
+    'macd', 'macd_signal', 'rsi',
+    'bb_upper', 'bb_lower', 'bb_middle', 'bb_width',
+    'stoch_k', 'stoch_d', 'williams_r',
+    'volume_sma', 'vwap',
+    'price_change', 'high_low_ratio', 'close_open_ratio',
+    'volatility', 'support', 'resistance'
+]
+
+# Các cột chỉ báo được tính thêm vào DataFrame OHLCV
+INDICATOR_COLUMNS = [col for col in FEATURE_COLUMNS if col not in ('open', 'high', 'low', 'volume')]
+
+def _pad(values, window):
+    """Thêm window - 1 giá trị NaN ở đầu trục thời gian (giống min_periods=window của pandas)"""
+    pad = np.full(values.shape[:-1] + (window - 1,), np.nan)
+    return np.concatenate([pad, values], axis=-1)
+
+def _shift(values, periods=1):
+    """Dịch sang phải theo trục thời gian, điền NaN"""
+    pad = np.full(values.shape[:-1] + (periods,), np.nan)
+    return np.concatenate([pad, values[..., :-periods]], axis=-1)
+
+def rolling_window(values, window):
+    """View (..., n - window + 1, window) trên trục thời gian, không copy dữ liệu; None nếu chuỗi ngắn hơn window"""
+    if values.shape[-1] < window:
+        return None
+    return sliding_window_view(values, window, axis=-1)
+
+def _rolling(values, window, reduce, view=None):
+    view = rolling_window(values, window) if view is None else view
+    if view is None:
+        return np.full(values.shape, np.nan)
+    return _pad(reduce(view), window)
+
+def rolling_sum(values, window):
+    """Tổng trượt O(n) bằng cumsum; chuỗi có NaN thì tính trên cửa sổ để NaN không lan ra cả chuỗi"""
+    if values.shape[-1] < window or np.isnan(values).any():
+        return _rolling(values, window, lambda v: v.sum(axis=-1))
+    # Trừ giá trị đầu tiên trước khi cộng dồn để giữ độ chính xác với giá lớn
+    ref = values[..., :1]
+    total = np.cumsum(values - ref, axis=-1)
+    sums = total[..., window - 1:].copy()
+    sums[..., 1:] -= total[..., :-window]
+    return _pad(sums + window * ref, window)
+
+def rolling_mean(values, window):
+    return rolling_sum(values, window) / window
+
+def rolling_std(values, window, ddof=0, mean=None):
+    """Độ lệch chuẩn trượt hai lượt trên cửa sổ (ổn định số), dùng lại rolling mean nếu đã có"""
+    view = rolling_window(values, window)
+    if view is None:
+        return np.full(values.shape, np.nan)
+    mean = rolling_mean(values, window) if mean is None else mean
+    deviation = view - mean[..., window - 1:, None]
+    return _pad(np.sqrt(np.einsum('...ij,...ij->...i', deviation, deviation) / (window - ddof)), window)
+
+def _rolling_extreme(values, window, filter1d, reduce):
+    if values.shape[-1] < window or np.isnan(values).any():
+        return _rolling(values, window, reduce)
+    # Bộ lọc min/max O(n) của scipy, origin dịch cửa sổ về cuối (trailing window)
+    result = filter1d(values, window, axis=-1, origin=(window - 1) // 2)
+    result[..., :window - 1] = np.nan
+    return result
+
+def rolling_min(values, window):
+    return _rolling_extreme(values, window, minimum_filter1d, lambda v: v.min(axis=-1))
+
+def rolling_max(values, window):
+    return _rolling_extreme(values, window, maximum_filter1d, lambda v: v.max(axis=-1))
+
+def ema(values, span=None, alpha=None, min_periods=None):
+    """EMA adjust=False như pandas ewm: bỏ qua các NaN ở đầu, y[0] = x[0]"""
+    alpha = 2.0 / (span + 1.0) if alpha is None else alpha
+    min_periods = (span or 1) if min_periods is None else min_periods
+
+    result = np.full(values.shape, np.nan)
+    # Vị trí đầu tiên mà mọi dòng đều có giá trị (NaN đầu chuỗi giống nhau giữa các symbol)
+    valid = ~np.isnan(values).any(axis=tuple(range(values.ndim - 1)))
+    if not valid.any():
+        return result
+    start = int(np.argmax(valid))
+
+    x = values[..., start:]
+    # y[t] = alpha * x[t] + (1 - alpha) * y[t - 1], trạng thái đầu chọn để y[0] = x[0]
+    zi = (1.0 - alpha) * x[..., :1]
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, axis=-1, zi=zi)
+    result[..., start:] = y
+    result[..., :start + min_periods - 1] = np.nan
+    return result
+
+def compute_indicators(open_, high, low, close, volume):
+    """Tính mọi cột chỉ báo trong một lượt, dùng chung các cửa sổ rolling.
+
+    Nhận mảng 1 chiều (một symbol) hoặc 2 chiều (symbols x nến, cùng số nến),
+    kết quả khớp với các hàm tương ứng của thư viện `ta` (fillna=False).
+    """
+    open_, high, low, close, volume = (np.asarray(a, dtype=np.float64) for a in (open_, high, low, close, volume))
+    out = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Moving Averages
+        out['sma_7'] = rolling_mean(close, 7)
+        out['sma_25'] = rolling_mean(close, 25)
+        out['ema_12'] = ema(close, span=12)
+        out['ema_26'] = ema(close, span=26)
+
+        # MACD (26, 12, 9): cột 'macd' là histogram như ta.trend.macd_diff
+        macd_line = out['ema_12'] - out['ema_26']
+        out['macd_signal'] = ema(macd_line, span=9)
+        out['macd'] = macd_line - out['macd_signal']
+
+        # RSI 14 (Wilder smoothing)
+        diff = np.diff(close, axis=-1, prepend=np.nan)
+        up = np.where(diff > 0, diff, 0.0)
+        down = np.where(diff < 0, -diff, 0.0)
+        ema_up = ema(up, alpha=1 / 14, min_periods=14)
+        ema_down = ema(down, alpha=1 / 14, min_periods=14)
+        out['rsi'] = np.where(ema_down == 0, 100.0, 100 - 100 / (1 + ema_up / ema_down))
+
+        # Rolling mean/std 20 của close dùng chung cho Bollinger Bands và volatility
+        out['bb_middle'] = rolling_mean(close, 20)
+        std_20 = rolling_std(close, 20, ddof=0, mean=out['bb_middle'])
+        out['bb_upper'] = out['bb_middle'] + 2 * std_20
+        out['bb_lower'] = out['bb_middle'] - 2 * std_20
+        out['bb_width'] = (out['bb_upper'] - out['bb_lower']) / out['bb_middle']
+
+        # Cửa sổ 14 của high/low dùng chung cho Stochastic và Williams %R
+        lowest_14 = rolling_min(low, 14)
+        highest_14 = rolling_max(high, 14)
+        out['stoch_k'] = 100 * (close - lowest_14) / (highest_14 - lowest_14)
+        out['stoch_d'] = rolling_mean(out['stoch_k'], 3)
+        out['williams_r'] = -100 * (highest_14 - close) / (highest_14 - lowest_14)
+
+        # Volume
+        out['volume_sma'] = rolling_mean(volume, 20)
+        typical_price = (high + low + close) / 3.0
+        out['vwap'] = rolling_sum(typical_price * volume, 14) / rolling_sum(volume, 14)
+
+        # Price features
+        out['price_change'] = close / _shift(close) - 1
+        out['high_low_ratio'] = high / low
+        out['close_open_ratio'] = close / open_
+
+        # Volatility (độ lệch chuẩn mẫu, ddof=1 như pandas rolling std)
+        out['volatility'] = std_20 * np.sqrt(20 / 19)
+
+        # Support and Resistance levels
+        out['support'] = rolling_min(low, 20)
+        out['resistance'] = rolling_max(high, 20)
+
+    return {col: out[col] for col in INDICATOR_COLUMNS}
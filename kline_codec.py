@@ -0,0 +1,67 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+# Mỗi nến /klines có 12 trường: open time, OHLCV, close time, quote volume, số lệnh, taker base/quote, ignore
+KLINE_FIELDS = 12
+DECODED_FIELDS = 7
+_BRACKETS_AND_QUOTES = b'[]"'
+
+class KlineArrays:
+    """Các cột nến dạng mảng NumPy liên tục; DataFrame chỉ được tạo khi cần"""
+
+    def __init__(self, open_time, open, high, low, close, volume, close_time=None):
+        self.open_time = open_time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.close_time = close_time
+        self._frame = None
+
+    def __len__(self):
+        return len(self.open_time)
+
+    @property
+    def frame(self):
+        """DataFrame OHLCV float64 (kèm close_time ms nếu có), index là open time (ms), tạo một lần rồi dùng lại"""
+        if self._frame is None:
+            columns = {'open': self.open, 'high': self.high, 'low': self.low,
+                       'close': self.close, 'volume': self.volume}
+            if self.close_time is not None:
+                columns['close_time'] = self.close_time
+            self._frame = pd.DataFrame(columns, index=pd.Index(self.open_time, name='timestamp'), copy=False)
+        return self._frame
+
+def decode_klines(raw):
+    """Giải mã body JSON của /klines (bytes) thẳng thành các cột float64/int64"""
+    if isinstance(raw, str):
+        raw = raw.encode()
+
+    # Payload chỉ gồm số và chuỗi số: bỏ ngoặc, dấu nháy rồi tách thành các trường
+    body = raw.translate(None, _BRACKETS_AND_QUOTES).strip()
+    fields = body.split(b',') if body else []
+    if len(fields) % KLINE_FIELDS:
+        raise ValueError(f"Payload /klines không hợp lệ ({len(fields)} trường)")
+
+    # Chỉ parse 7 cột cần dùng (open time, OHLCV, close time), xếp theo cột để mỗi cột là một đoạn liên tục
+    columns = b','.join([b','.join(fields[i::KLINE_FIELDS]) for i in range(DECODED_FIELDS)])
+    count = len(fields) // KLINE_FIELDS
+    if count:
+        with warnings.catch_warnings():
+            # numpy chỉ cảnh báo và trả về phần đã đọc được khi gặp giá trị không phải số
+            warnings.simplefilter('error', DeprecationWarning)
+            try:
+                values = np.fromstring(columns, dtype=np.float64, sep=',')
+            except (DeprecationWarning, ValueError):
+                raise ValueError("Payload /klines chứa giá trị không phải số")
+    else:
+        values = np.empty(0, dtype=np.float64)
+
+    if values.size != count * DECODED_FIELDS:
+        raise ValueError("Payload /klines chứa trường rỗng")
+
+    open_time, open_, high, low, close, volume, close_time = values.reshape(DECODED_FIELDS, count)
+    # Open/close time (ms) < 2^53 nên float64 giữ chính xác tuyệt đối
+    return KlineArrays(open_time.astype(np.int64), open_, high, low, close, volume, close_time.astype(np.int64))
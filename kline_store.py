@@ -0,0 +1,256 @@
+import os
+import time
+import asyncio
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Độ dài mỗi interval (ms). '1M' không cố định nên không được lưu trong store.
+INTERVAL_MS = {
+    '1s': 1000,
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000,
+    '1d': 86_400_000, '3d': 259_200_000, '1w': 604_800_000
+}
+
+# Nến tuần của Binance mở vào thứ Hai (epoch 1970-01-01 là thứ Năm)
+INTERVAL_OFFSET_MS = {'1w': 4 * 86_400_000}
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+def candle_open_time(timestamp_ms, interval):
+    """Open time của nến chứa timestamp_ms"""
+    step = INTERVAL_MS[interval]
+    offset = INTERVAL_OFFSET_MS.get(interval, 0)
+    return (timestamp_ms - offset) // step * step + offset
+
+def to_ohlcv_frame(df):
+    """Chuyển frame index open time (ms) thành format trả về của get_historical_data"""
+    df = df[OHLCV_COLUMNS].copy()
+    df.index = pd.to_datetime(df.index, unit='ms')
+    df.index.name = 'timestamp'
+    return df
+
+def to_milliseconds(value):
+    """Chuyển số hoặc chuỗi số (epoch ms), datetime, pd.Timestamp hoặc chuỗi ngày thành epoch ms (UTC)"""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    if isinstance(value, str) and value.strip().lstrip('-').replace('.', '', 1).isdigit():
+        return int(float(value))
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return int(ts.value // 1_000_000)
+
+def split_windows(start_time, end_time, interval, page_size=1000):
+    """Chia [start_time, end_time) thành các cửa sổ (startTime, endTime) tối đa page_size nến"""
+    step = INTERVAL_MS[interval]
+    # Nến đầu tiên có open time >= start_time
+    first = candle_open_time(start_time + step - 1, interval)
+    span = page_size * step
+    return [(window_start, min(window_start + span, end_time) - 1)
+            for window_start in range(first, end_time, span)]
+
+async def backfill(fetch, symbol, interval, start_time, end_time, semaphore=None, page_size=1000):
+    """Tải mọi nến có open time trong [start_time, end_time): các trang chạy song song, gộp và loại trùng"""
+    if interval not in INTERVAL_MS:
+        return await _backfill_serial(fetch, symbol, interval, start_time, end_time, page_size)
+
+    semaphore = semaphore or asyncio.Semaphore(5)
+
+    async def fetch_window(window_start, window_end):
+        async with semaphore:
+            return await fetch(symbol, interval, start_time=window_start, end_time=window_end, limit=page_size)
+
+    pages = await asyncio.gather(*[
+        fetch_window(window_start, window_end)
+        for window_start, window_end in split_windows(start_time, end_time, interval, page_size)
+    ])
+    return _merge_pages(pages, start_time, end_time)
+
+async def _backfill_serial(fetch, symbol, interval, start_time, end_time, page_size):
+    """Phân trang tuần tự cho interval không cố định độ dài ('1M')"""
+    pages = []
+    page_start = start_time
+    while page_start < end_time:
+        page = await fetch(symbol, interval, start_time=page_start, end_time=end_time - 1, limit=page_size)
+        if page is None or not len(page) or int(page.index[-1]) < page_start:
+            break
+        pages.append(page)
+        page_start = int(page.index[-1]) + 1
+    return _merge_pages(pages, start_time, end_time)
+
+def _merge_pages(pages, start_time, end_time):
+    """Gộp các trang theo open time, bỏ trùng lặp và nến nằm ngoài [start_time, end_time)"""
+    pages = [page for page in pages if page is not None and len(page)]
+    if not pages:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, dtype='float64', index=pd.Index([], dtype='int64'))
+    frame = pd.concat(pages)
+    frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+    return frame[(frame.index >= start_time) & (frame.index < end_time)]
+
+class KlineStore:
+    """Kho OHLCV cục bộ theo (symbol, interval): chỉ tải phần delta, tự vá gap, lưu xuống đĩa"""
+
+    def __init__(self, data_dir=None, refresh_seconds=None, max_rows=None):
+        self.data_dir = data_dir or os.getenv('KLINE_STORE_DIR', 'data/klines')
+        # Trong khoảng này dữ liệu trong bộ nhớ được dùng luôn, không gọi API
+        self.refresh_seconds = float(refresh_seconds if refresh_seconds is not None
+                                     else os.getenv('KLINE_REFRESH_SECONDS', '10'))
+        self.max_rows = int(max_rows or os.getenv('KLINE_STORE_MAX_ROWS', '5000'))
+        self.semaphore = None  # Giới hạn số request backfill song song (BinanceClient gán vào)
+
+        self._frames = {}     # key -> DataFrame các nến đã đóng (index open time ms)
+        self._live = {}       # key -> DataFrame nến đang chạy (tối đa 1 dòng)
+        self._synced_at = {}  # key -> time.monotonic() lần đồng bộ gần nhất
+        self._holes = {}      # key -> open time mà sàn không có dữ liệu (bảo trì, trước khi list)
+        self._locks = {}
+        self.stats = {'memory_hits': 0, 'syncs': 0, 'requests': 0, 'candles_fetched': 0}
+
+    @staticmethod
+    def supports(interval):
+        return interval in INTERVAL_MS
+
+    async def get(self, fetch, symbol, interval, limit):
+        """Lấy `limit` nến gần nhất (gồm nến đang chạy), fetch(symbol, interval, start_time, end_time, limit)"""
+        key = (symbol, interval)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            synced_at = self._synced_at.get(key)
+            fresh = synced_at is not None and time.monotonic() - synced_at < self.refresh_seconds
+            if fresh and self._row_count(key) >= limit:
+                self.stats['memory_hits'] += 1
+            else:
+                await self._sync(fetch, key, limit)
+            return self._view(key, limit)
+
+    def read(self, symbol, interval):
+        """Các nến đã đóng đang có trong store (bộ nhớ hoặc đĩa), không gọi API"""
+        key = (symbol, interval)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._load(key)
+        return to_ohlcv_frame(frame)
+
+    def stored_symbols(self, interval):
+        """Các symbol đã có file nến của interval trên đĩa"""
+        if not os.path.isdir(self.data_dir):
+            return []
+        suffix = f"_{interval}.pkl"
+        return sorted(name[:-len(suffix)] for name in os.listdir(self.data_dir) if name.endswith(suffix))
+
+    def _row_count(self, key):
+        frame = self._frames.get(key)
+        live = self._live.get(key)
+        return (0 if frame is None else len(frame)) + (0 if live is None else len(live))
+
+    def _view(self, key, limit):
+        frame = self._frames[key]
+        live = self._live.get(key)
+        if live is not None and len(live):
+            frame = pd.concat([frame, live])
+        return to_ohlcv_frame(frame.iloc[-limit:])
+
+    async def _sync(self, fetch, key, limit):
+        """Tải các nến đã đóng còn thiếu (delta + gap) và nến đang chạy"""
+        symbol, interval = key
+        step = INTERVAL_MS[interval]
+        current_open = candle_open_time(int(time.time() * 1000), interval)
+
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._load(key)
+
+        # Các open time nến đã đóng cần có nhưng chưa có trong store
+        expected = np.arange(current_open - (limit - 1) * step, current_open, step, dtype=np.int64)
+        holes = self._holes.setdefault(key, set())
+        missing = expected[~np.isin(expected, frame.index.values)]
+        if holes:
+            missing = missing[~np.isin(missing, np.fromiter(holes, dtype=np.int64))]
+
+        # Gom thành các đoạn liên tiếp, đoạn cuối nối luôn tới nến đang chạy
+        runs = np.split(missing, np.flatnonzero(np.diff(missing) != step) + 1) if len(missing) else []
+        ranges = [[int(run[0]), int(run[-1])] for run in runs]
+        if ranges and ranges[-1][1] == current_open - step:
+            ranges[-1][1] = current_open
+        else:
+            ranges.append([current_open, current_open])
+
+        server_times = []
+        results = await asyncio.gather(*[
+            self._fetch_range(fetch, symbol, interval, start, end, server_times) for start, end in ranges
+        ])
+        fetched = [page for pages in results for page in pages]
+
+        # Nến chỉ được coi là đã đóng khi close time trước server time của response (đồng hồ máy có thể lệch);
+        # lấy response sớm nhất để không lưu nhầm nến sàn còn đang cập nhật
+        server_now = min(server_times) if server_times else int(time.time() * 1000)
+        new = pd.concat(fetched) if fetched else frame.iloc[:0]
+        close_time = new['close_time'].values if 'close_time' in new else new.index.values + step - 1
+        is_closed = close_time < server_now
+        closed = new.loc[is_closed, OHLCV_COLUMNS]
+        self._live[key] = new.loc[~is_closed, OHLCV_COLUMNS].iloc[-1:]
+
+        if len(closed):
+            frame = pd.concat([frame, closed])
+            frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+            frame = frame.iloc[-max(self.max_rows, limit):]
+
+        # Open time sàn không trả về là lỗ thật của sàn, không tải lại nữa (nến chưa đóng thì tải lại lần sau)
+        still_missing = missing[~np.isin(missing, frame.index.values) & ~np.isin(missing, new.index.values)]
+        holes.update(int(t) for t in still_missing)
+
+        self._frames[key] = frame
+        self._synced_at[key] = time.monotonic()
+        self.stats['syncs'] += 1
+
+        if len(closed):
+            self._save(key, frame)
+
+    async def _fetch_range(self, fetch, symbol, interval, start, end, server_times):
+        """Tải các nến có open time trong [start, end], các trang 1000 nến chạy song song"""
+        async def counted_fetch(*args, **kwargs):
+            page = await fetch(*args, **kwargs)
+            self.stats['requests'] += 1
+            self.stats['candles_fetched'] += 0 if page is None else len(page)
+            # Server time của từng response (fetch gắn vào attrs), dùng để tách nến đã đóng
+            if page is not None and page.attrs.get('server_time') is not None:
+                server_times.append(page.attrs['server_time'])
+            return page
+
+        step = INTERVAL_MS[interval]
+        page_size = min(1000, (end - start) // step + 1)
+        frame = await backfill(counted_fetch, symbol, interval, start, end + step,
+                               semaphore=self.semaphore, page_size=page_size)
+        return [frame] if len(frame) else []
+
+    def _path(self, key):
+        symbol, interval = key
+        return os.path.join(self.data_dir, f"{symbol}_{interval}.pkl")
+
+    def _load(self, key):
+        """Đọc nến đã lưu trên đĩa, trả về frame rỗng nếu chưa có"""
+        path = self._path(key)
+        if os.path.exists(path):
+            try:
+                return pd.read_pickle(path)
+            except Exception as e:
+                logger.error(f"Lỗi đọc kline store {path}: {e}")
+        empty = pd.DataFrame({col: pd.Series(dtype='float64') for col in OHLCV_COLUMNS})
+        empty.index = pd.Index([], dtype='int64')
+        return empty
+
+    def _save(self, key, frame):
+        """Ghi nến đã đóng xuống đĩa (atomic)"""
+        path = self._path(key)
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            frame.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Lỗi ghi kline store {path}: {e}")
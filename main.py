@@ -8,6 +8,7 @@ import asyncio
 from crypto_predictor import CryptoPredictor
 from binance_client import BinanceClient
 from news_service import NewsService
+from retrain_scheduler import RetrainScheduler
 from utils import format_price, format_percentage
 
 # Load environment variables
@@ -20,13 +21,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Các cặp coin hiển thị trong menu
+WATCHLIST = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'ADAUSDT', 'SOLUSDT']
+
 class CryptoBotTelegram:
     def __init__(self):
         self.token = os.getenv('TELEGRAM_BOT_TOKEN')
-        self.predictor = CryptoPredictor()
+        # Dùng chung một BinanceClient (một connection pool cho cả process)
         self.binance_client = BinanceClient()
+        self.predictor = CryptoPredictor(self.binance_client)
         self.news_service = NewsService()
         
+        # Health monitor dùng chung: probe Binance, CoinGecko và các nguồn tin ở background
+        self.health_monitor = self.binance_client.health_monitor
+        self.health_monitor.add_probe('cryptopanic', self.news_service.ping_cryptopanic,
+                                      interval=self.health_monitor.third_party_interval)
+        if self.news_service.news_api_key:
+            self.health_monitor.add_probe('newsapi', self.news_service.ping_newsapi,
+                                          interval=self.health_monitor.third_party_interval)
+        
+        # Retrain model của watchlist vào giờ thấp điểm, model mới được hot swap
+        self.retrain_enabled = os.getenv('RETRAIN_ENABLED', 'True').lower() == 'true'
+        self.retrain_scheduler = RetrainScheduler(self.predictor)
+        
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Khởi động bot và hiển thị menu chính"""
         keyboard = [
@@ -188,14 +205,16 @@ class CryptoBotTelegram:
 
     async def show_price_menu(self, query):
         """Hiển thị menu giá hiện tại"""
-        keyboard = [
-            [InlineKeyboardButton("BTC/USDT", callback_data='price_BTCUSDT')],
-            [InlineKeyboardButton("ETH/USDT", callback_data='price_ETHUSDT')],
-            [InlineKeyboardButton("BNB/USDT", callback_data='price_BNBUSDT')],
-            [InlineKeyboardButton("ADA/USDT", callback_data='price_ADAUSDT')],
-            [InlineKeyboardButton("SOL/USDT", callback_data='price_SOLUSDT')],
-            [InlineKeyboardButton("🔙 Quay lại", callback_data='back_to_main')]
-        ]
+        # Chỉ dùng giá đã có trong bộ nhớ: menu không chờ Binance, thiếu giá thì hiện nút tĩnh
+        prices = self.binance_client.get_cached_prices(WATCHLIST)
+        
+        keyboard = []
+        for symbol in WATCHLIST:
+            label = f"{symbol.replace('USDT', '')}/USDT"
+            if symbol in prices:
+                label += f" - ${format_price(prices[symbol])}"
+            keyboard.append([InlineKeyboardButton(label, callback_data=f'price_{symbol}')])
+        keyboard.append([InlineKeyboardButton("🔙 Quay lại", callback_data='back_to_main')])
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         text = "💰 *Chọn cặp coin để xem giá hiện tại:*\n\nTôi sẽ cung cấp thông tin giá real-time và thống kê 24h."
@@ -293,6 +312,15 @@ class CryptoBotTelegram:
             # Khởi tạo và chạy bot
             logger.info("Bot đang khởi động...")
             
+            # Mở connection pool tới Binance
+            await self.binance_client.start()
+            
+            # Chỉ đọc metadata, model được load khi có yêu cầu dự đoán đầu tiên
+            logger.info(f"Registry có {len(self.predictor.discover_models())} model")
+            
+            if self.retrain_enabled:
+                self.retrain_scheduler.start()
+            
             # Khởi tạo application
             await application.initialize()
             await application.start()
@@ -334,6 +362,22 @@ class CryptoBotTelegram:
                     await application.shutdown()
                 except Exception as e:
                     logger.error(f"Lỗi cleanup: {e}")
+            
+            try:
+                await self.retrain_scheduler.stop()
+                await self.predictor.close()
+            except Exception as e:
+                logger.error(f"Lỗi dừng training queue: {e}")
+            
+            try:
+                await self.binance_client.close()
+            except Exception as e:
+                logger.error(f"Lỗi đóng Binance session: {e}")
+            
+            try:
+                await self.news_service.close()
+            except Exception as e:
+                logger.error(f"Lỗi đóng news session: {e}")
     
     def run(self):
         """Khởi động bot (deprecated - sử dụng run_async thay thế)"""
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Symbol trùng nhau rất nhiều trên CoinGecko (hàng chục token "btc"), các coin lớn được chỉ định sẵn
+KNOWN_COIN_IDS = {
+    'BTC': 'bitcoin', 'ETH': 'ethereum', 'BNB': 'binancecoin', 'ADA': 'cardano',
+    'SOL': 'solana', 'XRP': 'ripple', 'DOGE': 'dogecoin', 'DOT': 'polkadot',
+    'AVAX': 'avalanche-2', 'MATIC': 'matic-network', 'LINK': 'chainlink',
+    'LTC': 'litecoin', 'TRX': 'tron', 'USDT': 'tether', 'USDC': 'usd-coin'
+}
+
+class MarketCapCache:
+    """Index symbol -> CoinGecko id và cache market cap theo TTL, tải cả watchlist trong một request"""
+
+    def __init__(self, fetch_json, base_url=None, ttl=None, index_path=None, index_ttl=None, watchlist=None,
+                 track_ttl=None):
+        # fetch_json(url, params) -> JSON
+        self.fetch_json = fetch_json
+        self.base_url = (base_url or os.getenv('COINGECKO_BASE_URL', 'https://api.coingecko.com/api/v3')).rstrip('/')
+        self.ttl = float(ttl or os.getenv('COINGECKO_MARKET_CAP_TTL', '300'))
+        self.index_path = index_path or os.getenv('COINGECKO_COINS_CACHE', 'cache/coingecko_coins.json')
+        self.index_ttl = float(index_ttl or os.getenv('COINGECKO_COINS_TTL', '86400'))
+        self.page_size = 250  # per_page tối đa của /coins/markets
+        # Asset ngoài watchlist không được hỏi tới trong khoảng này thì thôi làm mới
+        self.track_ttl = float(track_ttl or os.getenv('COINGECKO_TRACK_TTL', '3600'))
+
+        if watchlist is None:
+            watchlist = [s.strip().upper() for s in os.getenv('COINGECKO_WATCHLIST', 'BTC,ETH,BNB,ADA,SOL').split(',') if s.strip()]
+        self.watchlist = set(watchlist)
+        # Các asset được làm mới cùng nhau trong một request: watchlist và asset được hỏi gần đây
+        self.tracked = set(watchlist)
+        self.requested_at = {}  # asset ngoài watchlist -> time.monotonic() lần hỏi gần nhất
+
+        self.coin_ids = {}      # asset -> list id ứng viên từ /coins/list
+        self.resolved = dict(KNOWN_COIN_IDS)  # asset -> id đã chọn (market cap lớn nhất)
+        self.index_updated_at = None
+        self.entries = {}       # asset -> dict market cap
+        self.fetched_at = {}    # asset -> time.monotonic()
+        self._lock = asyncio.Lock()
+        self.stats = {'hits': 0, 'refreshes': 0}
+
+    def _fresh(self, asset):
+        fetched_at = self.fetched_at.get(asset)
+        return fetched_at is not None and time.monotonic() - fetched_at < self.ttl
+
+    async def get(self, asset):
+        """Thông tin market cap của asset (VD: 'BTC') từ bộ nhớ, tải lại cả watchlist khi hết hạn"""
+        asset = asset.upper()
+        if asset not in self.watchlist:
+            self.requested_at[asset] = time.monotonic()
+        if self._fresh(asset):
+            self.stats['hits'] += 1
+            return self.entries.get(asset)
+
+        async with self._lock:
+            # Request khác có thể vừa làm mới xong trong lúc chờ lock
+            if not self._fresh(asset):
+                self._expire()
+                self.tracked.add(asset)
+                await self.refresh(self.tracked)
+            else:
+                self.stats['hits'] += 1
+        return self.entries.get(asset)
+
+    async def refresh(self, assets):
+        """Tải market cap cho các asset bằng /coins/markets?ids=... (một request mỗi 250 id)"""
+        await self._ensure_index(assets)
+
+        candidates = {asset: self._candidates(asset) for asset in assets}
+        ids = sorted({coin_id for coin_ids in candidates.values() for coin_id in coin_ids})
+
+        markets = {}
+        for i in range(0, len(ids), self.page_size):
+            page = await self.fetch_json(f"{self.base_url}/coins/markets", {
+                'vs_currency': 'usd',
+                'ids': ','.join(ids[i:i + self.page_size]),
+                'per_page': self.page_size
+            })
+            markets.update({item['id']: item for item in page})
+
+        fetched_at = time.monotonic()
+        for asset, coin_ids in candidates.items():
+            found = [markets[coin_id] for coin_id in coin_ids if coin_id in markets]
+            if not found:
+                self.entries.pop(asset, None)
+            else:
+                # Nhiều coin cùng symbol: lấy coin có market cap lớn nhất
+                best = max(found, key=lambda item: item.get('market_cap') or 0)
+                self.resolved[asset] = best['id']
+                self.entries[asset] = {
+                    'id': best['id'],
+                    'market_cap': best.get('market_cap'),
+                    'total_supply': best.get('total_supply'),
+                    'circulating_supply': best.get('circulating_supply'),
+                    'max_supply': best.get('max_supply')
+                }
+            self.fetched_at[asset] = fetched_at
+        self.stats['refreshes'] += 1
+
+    def _expire(self):
+        """Bỏ các asset ngoài watchlist không được hỏi tới trong track_ttl giây khỏi danh sách làm mới và bộ nhớ"""
+        cutoff = time.monotonic() - self.track_ttl
+        for asset in [asset for asset, requested_at in self.requested_at.items() if requested_at < cutoff]:
+            del self.requested_at[asset]
+            self.tracked.discard(asset)
+            self.entries.pop(asset, None)
+            self.fetched_at.pop(asset, None)
+
+    def _candidates(self, asset):
+        """Các CoinGecko id có thể ứng với asset"""
+        if asset in self.resolved:
+            return [self.resolved[asset]]
+        coin_ids = self.coin_ids.get(asset)
+        if coin_ids:
+            # /coins/list không xếp theo market cap: lấy mọi ứng viên, refresh chọn coin lớn nhất
+            return coin_ids
+        # Chưa có index: đoán id như trước đây
+        return [asset.lower()]
+
+    async def _ensure_index(self, assets):
+        """Nạp index /coins/list (từ đĩa hoặc API) nếu có asset chưa biết id"""
+        if all(asset in self.resolved for asset in assets):
+            return
+        if self.index_updated_at is None:
+            self._load_index()
+        if self.index_updated_at is not None and time.time() - self.index_updated_at < self.index_ttl:
+            return
+        try:
+            coins = await self.fetch_json(f"{self.base_url}/coins/list")
+            self._set_index(coins, time.time())
+            self._save_index(coins)
+        except Exception as e:
+            logger.error(f"Lỗi tải danh sách coin CoinGecko: {e}")
+
+    def _set_index(self, coins, updated_at):
+        coin_ids = {}
+        for coin in coins:
+            coin_ids.setdefault(coin['symbol'].upper(), []).append(coin['id'])
+        self.coin_ids = coin_ids
+        self.index_updated_at = updated_at
+
+    def _load_index(self):
+        """Đọc index /coins/list đã lưu trên đĩa"""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._set_index(data['coins'], data['updated_at'])
+        except Exception as e:
+            logger.error(f"Lỗi load danh sách coin CoinGecko: {e}")
+
+    def _save_index(self, coins):
+        """Ghi index /coins/list xuống đĩa (atomic)"""
+        if not self.index_path:
+            return
+        try:
+            directory = os.path.dirname(self.index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'updated_at': self.index_updated_at,
+                    'coins': [{'id': c['id'], 'symbol': c['symbol']} for c in coins]
+                }, f, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"Lỗi lưu danh sách coin CoinGecko: {e}")
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import random
+import asyncio
+import aiohttp
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MarketStream:
+    """Bảng ticker trong bộ nhớ, cập nhật từ WebSocket !ticker@arr / !miniTicker@arr của Binance"""
+
+    def __init__(self, url=None, max_age=None):
+        self.url = url or os.getenv(
+            'BINANCE_STREAM_URL',
+            'wss://stream.binance.com:9443/stream?streams=!ticker@arr'
+        )
+        # Ticker cũ hơn max_age giây bị coi là stale và phải fallback về REST
+        self.max_age = float(max_age or os.getenv('BINANCE_STREAM_MAX_AGE', '5'))
+        self.min_backoff = 1.0
+        self.max_backoff = 60.0
+
+        # symbol -> dict ticker (không bao giờ sửa tại chỗ, chỉ thay thế cả entry)
+        self.tickers = {}
+        self.received_at = {}
+        self.connected = False
+        self.last_message_at = None
+        self.reconnects = 0
+        self._task = None
+
+    def start(self, session):
+        """Chạy vòng lặp nhận dữ liệu ở background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(session))
+        return self._task
+
+    async def stop(self):
+        """Dừng stream"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self.connected = False
+
+    def get_ticker(self, symbol):
+        """Lấy ticker còn mới của symbol, None nếu chưa có hoặc đã stale"""
+        received_at = self.received_at.get(symbol)
+        if received_at is None or time.monotonic() - received_at > self.max_age:
+            return None
+        return self.tickers.get(symbol)
+
+    def is_stale(self):
+        """Stream không nhận được message nào trong max_age giây"""
+        return self.last_message_at is None or time.monotonic() - self.last_message_at > self.max_age
+
+    async def _run(self, session):
+        """Kết nối, nhận message và tự reconnect với exponential backoff"""
+        backoff = self.min_backoff
+        while True:
+            try:
+                async with session.ws_connect(self.url, heartbeat=30) as ws:
+                    self.connected = True
+                    backoff = self.min_backoff
+                    logger.info(f"Đã kết nối market stream: {self.url}")
+
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self.handle_message(msg.data)
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Lỗi market stream: {e}")
+
+            self.connected = False
+            self.reconnects += 1
+            delay = backoff + random.uniform(0, backoff / 2)
+            logger.info(f"Market stream mất kết nối, thử lại sau {delay:.1f}s")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def handle_message(self, raw):
+        """Xử lý một frame (combined stream hoặc raw stream)"""
+        try:
+            payload = json.loads(raw)
+            data = payload.get('data', payload) if isinstance(payload, dict) else payload
+            events = data if isinstance(data, list) else [data]
+
+            received_at = time.monotonic()
+            for event in events:
+                ticker = self._parse_event(event)
+                if ticker is not None:
+                    self.tickers[ticker['symbol']] = ticker
+                    self.received_at[ticker['symbol']] = received_at
+            self.last_message_at = received_at
+
+        except Exception as e:
+            logger.error(f"Lỗi xử lý message market stream: {e}")
+
+    def _parse_event(self, event):
+        """Chuyển event 24hrTicker / 24hrMiniTicker thành dict cùng format get_24h_ticker"""
+        event_type = event.get('e')
+        if event_type == '24hrTicker':
+            change = float(event['p'])
+            change_percent = float(event['P'])
+        elif event_type == '24hrMiniTicker':
+            open_price = float(event['o'])
+            change = float(event['c']) - open_price
+            change_percent = change / open_price * 100 if open_price else 0.0
+        else:
+            return None
+
+        return {
+            'symbol': event['s'],
+            'price': float(event['c']),
+            'change': change,
+            'change_percent': change_percent,
+            'high': float(event['h']),
+            'low': float(event['l']),
+            'volume': float(event['v']),
+            'quote_volume': float(event['q'])
+        }
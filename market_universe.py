@@ -0,0 +1,59 @@
+import time
+import numpy as np
+
+class UniverseSnapshot:
+    """Snapshot /ticker/24hr của toàn thị trường, lưu dưới dạng các mảng số song song"""
+
+    def __init__(self, tickers, quote_asset='USDT'):
+        # Parse mỗi cột đúng một lần
+        self.symbols = np.array([t['symbol'] for t in tickers], dtype=object)
+        self.last_price = np.array([t['lastPrice'] for t in tickers], dtype=np.float64)
+        self.change_percent = np.array([t['priceChangePercent'] for t in tickers], dtype=np.float64)
+        self.quote_volume = np.array([t['quoteVolume'] for t in tickers], dtype=np.float64)
+        self.quote_mask = np.array([s.endswith(quote_asset) for s in self.symbols], dtype=bool)
+        self.positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.fetched_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def age(self):
+        """Tuổi của snapshot (giây)"""
+        return time.monotonic() - self.fetched_at
+
+    def price(self, symbol):
+        """Giá cuối của symbol trong snapshot, None nếu không có"""
+        i = self.positions.get(symbol)
+        return None if i is None else float(self.last_price[i])
+
+    def _rows(self, idx):
+        """Chuyển chỉ số thành list dict cùng format get_top_gainers_losers"""
+        return [{
+            'symbol': self.symbols[i],
+            'price': float(self.last_price[i]),
+            'change_percent': float(self.change_percent[i])
+        } for i in idx]
+
+    def top_movers(self, limit=10, min_quote_volume=1000000):
+        """Top tăng/giảm bằng partial selection (argpartition) thay vì sort toàn bộ"""
+        candidates = np.flatnonzero(self.quote_mask & (self.quote_volume > min_quote_volume))
+        k = min(limit, len(candidates))
+        if k == 0:
+            return {'gainers': [], 'losers': []}
+
+        change = self.change_percent[candidates]
+
+        # Tìm giá trị thứ k trong O(n), chỉ sort các phần tử vượt ngưỡng đó.
+        # Giữ cả các phần tử bằng ngưỡng để thứ tự tie giống sort ổn định.
+        kth_high = change[np.argpartition(-change, k - 1)[k - 1]]
+        top = np.flatnonzero(change >= kth_high)
+        top = top[np.lexsort((top, -change[top]))][:k]
+
+        kth_low = change[np.argpartition(change, k - 1)[k - 1]]
+        bottom = np.flatnonzero(change <= kth_low)
+        bottom = bottom[np.lexsort((bottom, change[bottom]))][:k]
+
+        return {
+            'gainers': self._rows(candidates[top]),
+            'losers': self._rows(candidates[bottom])
+        }
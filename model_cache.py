@@ -0,0 +1,131 @@
+import os
+import pickle
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class _ByteCounter:
+    def __init__(self):
+        self.nbytes = 0
+
+    def write(self, data):
+        self.nbytes += len(data)
+
+def model_nbytes(*objects):
+    """Kích thước (byte) của model/scaler, đo bằng pickle mà không giữ bản pickle trong bộ nhớ"""
+    counter = _ByteCounter()
+    pickle.dump(objects, counter, protocol=pickle.HIGHEST_PROTOCOL)
+    return counter.nbytes
+
+class ModelEntry:
+    """Model + scaler + metadata của phiên bản đang dùng cho một symbol"""
+
+    def __init__(self, symbol, model, scaler, metadata, nbytes):
+        self.symbol = symbol
+        self.model = model
+        self.scaler = scaler
+        self.metadata = metadata
+        self.nbytes = nbytes
+        self.hits = 0
+
+class ModelCache:
+    """Cache model theo symbol, giới hạn theo bộ nhớ, bỏ model theo LRU hoặc LFU.
+
+    Model của các symbol được pin (watchlist chính) không bao giờ bị bỏ; model bị bỏ
+    sẽ được load lại từ registry ở lần dự đoán sau.
+    """
+
+    def __init__(self, max_bytes=None, policy=None, pinned=None):
+        self.max_bytes = int(max_bytes or float(os.getenv('MODEL_CACHE_MAX_MB', '512')) * 1024 * 1024)
+        self.policy = (policy or os.getenv('MODEL_CACHE_POLICY', 'lru')).lower()
+        if self.policy not in ('lru', 'lfu'):
+            raise ValueError(f"MODEL_CACHE_POLICY không hợp lệ: {self.policy}")
+        if pinned is None:
+            pinned = [s.strip().upper() for s in os.getenv(
+                'MODEL_CACHE_PINNED', os.getenv('RETRAIN_WATCHLIST', 'BTCUSDT,ETHUSDT,BNBUSDT,ADAUSDT,SOLUSDT')
+            ).split(',') if s.strip()]
+        self.pinned = set(pinned)
+        self.entries = OrderedDict()    # symbol -> ModelEntry, dùng gần đây nhất ở cuối
+        self.nbytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'loads': 0}
+
+    def __contains__(self, symbol):
+        return symbol in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, symbol):
+        entry = self.entries.get(symbol)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self.entries.move_to_end(symbol)
+        entry.hits += 1
+        self.stats['hits'] += 1
+        return entry
+
+    def peek(self, symbol):
+        """Lấy entry mà không tính vào thống kê và thứ tự LRU"""
+        return self.entries.get(symbol)
+
+    def put(self, symbol, model, scaler, metadata, nbytes=None):
+        """Thêm hoặc thay model của symbol trong một bước (hot swap), rồi bỏ bớt model nếu vượt giới hạn"""
+        if nbytes is None:
+            nbytes = model_nbytes(model, scaler)
+        entry = ModelEntry(symbol, model, scaler, metadata, int(nbytes))
+        previous = self.entries.pop(symbol, None)
+        if previous is not None:
+            self.nbytes -= previous.nbytes
+            entry.hits = previous.hits
+        self.entries[symbol] = entry
+        self.nbytes += entry.nbytes
+        self.stats['loads'] += 1
+        self._evict(keep=symbol)
+        return entry
+
+    def _evict(self, keep):
+        while self.nbytes > self.max_bytes:
+            candidates = [symbol for symbol in self.entries if symbol != keep and symbol not in self.pinned]
+            if not candidates:
+                logger.warning(f"Model cache vượt giới hạn ({self.nbytes / 1024 / 1024:.1f}MB) "
+                               f"nhưng chỉ còn model được pin")
+                return
+            if self.policy == 'lfu':
+                # Ít lượt dùng nhất, cùng số lượt thì bỏ model dùng lâu nhất (thứ tự LRU)
+                victim = min(candidates, key=lambda symbol: self.entries[symbol].hits)
+            else:
+                victim = candidates[0]
+            self.discard(victim)
+            self.stats['evictions'] += 1
+            logger.debug(f"Bỏ model {victim} khỏi cache")
+
+    def discard(self, symbol):
+        entry = self.entries.pop(symbol, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
+        return entry is not None
+
+    def pin(self, symbol):
+        self.pinned.add(symbol)
+
+    def unpin(self, symbol):
+        self.pinned.discard(symbol)
+        self._evict(keep=None)
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def metrics(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self.entries),
+            'pinned': sum(1 for symbol in self.entries if symbol in self.pinned),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'policy': self.policy,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+        }
@@ -0,0 +1,211 @@
+import io
+import os
+import json
+import pickle
+import time
+import hashlib
+import tempfile
+import joblib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 2: pickle thuần (đọc một lần, checksum trên buffer đã đọc); 1: joblib, vẫn đọc được
+BUNDLE_FORMAT = 2
+
+def file_checksum(path):
+    """SHA-256 của file, đọc theo từng khối 1MB"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_bundle(path, model, scaler, metadata):
+    """Ghi model + scaler + metadata vào một file (qua file tạm rồi đổi tên), trả về (checksum, số byte)"""
+    data = pickle.dumps({'format': BUNDLE_FORMAT, 'metadata': metadata, 'model': model, 'scaler': scaler},
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return hashlib.sha256(data).hexdigest(), len(data)
+
+def read_bundle(path, checksum=None):
+    """Đọc bundle, kiểm tra checksum nếu có; trả về (model, scaler, metadata).
+
+    File chỉ được đọc một lần: checksum tính trên chính buffer được unpickle.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if checksum is not None and hashlib.sha256(data).hexdigest() != checksum:
+        raise ValueError(f"Checksum của {path} không khớp, bundle bị hỏng")
+    try:
+        bundle = pickle.loads(data)
+    except pickle.UnpicklingError:
+        # Bundle format 1 do joblib ghi (mảng NumPy nằm ngoài luồng pickle)
+        bundle = joblib.load(io.BytesIO(data))
+    if not isinstance(bundle, dict) or bundle.get('format') not in (1, BUNDLE_FORMAT):
+        raise ValueError(f"{path} không phải model bundle hợp lệ")
+    return bundle['model'], bundle['scaler'], bundle['metadata']
+
+class ModelRegistry:
+    """Lưu các phiên bản model theo symbol: mỗi phiên bản là một file {root}/{symbol}/v{n}.bundle.
+
+    {root}/{symbol}/index.json (ghi atomic) chứa metadata, checksum của từng phiên bản
+    và phiên bản đang active; phiên bản trước đó được giữ để rollback. Đọc metadata
+    không cần load model.
+    """
+
+    def __init__(self, root=None, keep=None, verify=None):
+        self.root = root or os.getenv('MODEL_REGISTRY_DIR', 'models/registry')
+        self.keep = int(keep or os.getenv('MODEL_REGISTRY_KEEP', '5'))
+        if verify is None:
+            verify = os.getenv('MODEL_VERIFY_CHECKSUM', 'True').lower() == 'true'
+        self.verify = verify
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.root, symbol)
+
+    def bundle_path(self, symbol, version):
+        return os.path.join(self._symbol_dir(symbol), f"v{version}.bundle")
+
+    def _read_index(self, symbol):
+        path = os.path.join(self._symbol_dir(symbol), 'index.json')
+        if not os.path.exists(path):
+            return {'versions': {}, 'current': None, 'previous': None}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_index(self, symbol, index):
+        path = os.path.join(self._symbol_dir(symbol), 'index.json')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def symbols(self):
+        """Các symbol có phiên bản active"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(symbol for symbol in os.listdir(self.root) if self.current_version(symbol) is not None)
+
+    def staging_path(self, symbol):
+        """File tạm để worker ghi bundle, chỉ thành phiên bản khi commit"""
+        directory = self._symbol_dir(symbol)
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix='.staging-', suffix='.bundle', dir=directory)
+        os.close(fd)
+        return path
+
+    def discard(self, staging):
+        for path in (staging, f"{staging}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def sweep_staging(self, max_age=3600):
+        """Xóa file staging bị bỏ lại (bot dừng khi worker đang ghi) cũ hơn max_age giây"""
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        cutoff = time.time() - max_age
+        for symbol in os.listdir(self.root):
+            directory = self._symbol_dir(symbol)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name.startswith('.staging-') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+        if removed:
+            logger.info(f"Đã xóa {removed} file staging bị bỏ lại trong {self.root}")
+        return removed
+
+    def versions(self, symbol):
+        """Các phiên bản đã commit, tăng dần"""
+        return sorted(int(version) for version in self._read_index(symbol)['versions'])
+
+    def metadata(self, symbol, version):
+        return self._read_index(symbol)['versions'][str(version)]
+
+    def commit(self, symbol, staging, metadata, checksum=None):
+        """Đổi tên bundle staging thành phiên bản mới và ghi vào index, trả về số phiên bản"""
+        index = self._read_index(symbol)
+        versions = [int(version) for version in index['versions']]
+        version = max(versions) + 1 if versions else 1
+        record = {
+            **metadata,
+            'symbol': symbol,
+            'version': version,
+            'created_at': time.time(),
+            'checksum': checksum or file_checksum(staging),
+            'bytes': os.path.getsize(staging)
+        }
+        os.replace(staging, self.bundle_path(symbol, version))
+        index['versions'][str(version)] = record
+        self._write_index(symbol, index)
+        return version
+
+    def current(self, symbol):
+        """{'version': n, 'previous': m} hoặc None nếu symbol chưa có phiên bản active"""
+        try:
+            index = self._read_index(symbol)
+        except Exception as e:
+            logger.error(f"Lỗi đọc index model của {symbol}: {e}")
+            return None
+        if index['current'] is None:
+            return None
+        return {'version': index['current'], 'previous': index['previous']}
+
+    def current_version(self, symbol):
+        current = self.current(symbol)
+        return current['version'] if current else None
+
+    def activate(self, symbol, version):
+        """Chuyển phiên bản active sang version (index ghi atomic)"""
+        index = self._read_index(symbol)
+        if str(version) not in index['versions']:
+            raise ValueError(f"{symbol} không có phiên bản v{version}")
+        if index['current'] != version:
+            index['previous'] = index['current']
+        index['current'] = version
+        index['activated_at'] = time.time()
+        self._write_index(symbol, index)
+        self.prune(symbol)
+
+    def previous_version(self, symbol):
+        """Phiên bản để rollback: phiên bản active trước đó, hoặc phiên bản gần nhất cũ hơn"""
+        current = self.current(symbol)
+        if current is None:
+            return None
+        versions = self.versions(symbol)
+        if current.get('previous') in versions:
+            return current['previous']
+        older = [v for v in versions if v < current['version']]
+        return older[-1] if older else None
+
+    def load(self, symbol, version=None):
+        """(model, scaler, metadata) của một phiên bản (mặc định phiên bản active)"""
+        version = version or self.current_version(symbol)
+        if version is None:
+            return None
+        record = self.metadata(symbol, version)
+        model, scaler, _ = read_bundle(self.bundle_path(symbol, version), checksum=record['checksum'] if self.verify else None)
+        return model, scaler, record
+
+    def prune(self, symbol):
+        """Giữ `keep` phiên bản mới nhất, không bao giờ xóa phiên bản active và phiên bản trước nó"""
+        index = self._read_index(symbol)
+        protected = {index['current'], index['previous']}
+        versions = sorted(int(version) for version in index['versions'])
+        removed = [version for version in versions[:max(0, len(versions) - self.keep)] if version not in protected]
+        if not removed:
+            return
+        for version in removed:
+            del index['versions'][str(version)]
+        self._write_index(symbol, index)
+        for version in removed:
+            path = self.bundle_path(symbol, version)
+            if os.path.exists(path):
+                os.remove(path)
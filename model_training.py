@@ -0,0 +1,120 @@
+import math
+import time
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+from model_registry import write_bundle
+
+def make_candidates():
+    """Các model ứng viên (chưa fit)"""
+    return {
+        'rf': RandomForestRegressor(n_estimators=100, random_state=42),
+        'gb': GradientBoostingRegressor(n_estimators=100, random_state=42),
+        'lr': LinearRegression()
+    }
+
+def _fit_candidate(name, model, X_train, y_train, X_test, y_test):
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+    return name, model, fit_seconds, mean_squared_error(y_test, model.predict(X_test))
+
+def select_model(candidates, X_train, y_train, X_test, y_test, n_jobs=1, eta=3, min_samples=100):
+    """Successive halving theo kích thước dữ liệu: mọi ứng viên fit trên một phần tập train,
+    chỉ 1/eta ứng viên tốt nhất được fit tiếp trên phần lớn hơn, vòng cuối dùng toàn bộ tập train.
+
+    Các ứng viên trong một vòng được fit song song (thread, sklearn nhả GIL khi fit),
+    tổng số thread không vượt quá n_jobs. Trả về (tên, model, báo cáo từng vòng của từng ứng viên).
+    """
+    alive = list(candidates)
+    rounds = math.ceil(math.log(len(alive), eta)) if eta > 1 and len(alive) > 1 else 0
+    report = {name: [] for name in alive}
+    n = len(X_train)
+
+    for r in range(rounds + 1):
+        # X_train đã được xáo trộn khi chia nên n dòng đầu là một mẫu ngẫu nhiên
+        size = n if r == rounds else min(n, max(min_samples, n // eta ** (rounds - r)))
+        final = size == n
+        workers = max(1, min(n_jobs, len(alive)))
+        threads = max(1, n_jobs // workers)
+
+        results = Parallel(n_jobs=workers, backend='threading')(
+            delayed(_fit_candidate)(name, _limit_threads(clone(candidates[name]), threads),
+                                    X_train[:size], y_train[:size], X_test, y_test)
+            for name in alive
+        )
+        results.sort(key=lambda result: result[3])
+        for name, _, fit_seconds, mse in results:
+            report[name].append({'samples': size, 'fit_seconds': fit_seconds, 'mse': mse})
+
+        # Đã fit trên toàn bộ tập train (dữ liệu ít): không cần vòng sau
+        if final:
+            break
+
+        # Giữ 1/eta ứng viên có MSE thấp nhất cho vòng sau
+        alive = [result[0] for result in results[:max(1, math.ceil(len(alive) / eta))]]
+
+    best_name, best_model, _, _ = results[0]
+    return best_name, best_model, report
+
+def _limit_threads(model, threads):
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=threads)
+    return model
+
+def train_candidates(X, y, bundle_path=None, metadata=None, n_jobs=1, eta=3):
+    """Fit các model ứng viên, chọn model có MSE thấp nhất trên tập test.
+
+    Chạy trong worker process của TrainingQueue nên chỉ dùng dữ liệu truyền vào
+    và trả về kết quả picklable. n_jobs là số core job được dùng, eta <= 1 thì fit mọi ứng viên trên toàn bộ dữ liệu.
+    Nếu có bundle_path, model + scaler + metadata (kèm metrics) được ghi thành một bundle.
+    """
+    started = time.perf_counter()
+
+    # Chia dữ liệu
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Chuẩn hóa dữ liệu
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    # Chọn model: fit song song + loại sớm ứng viên kém
+    best_name, best_model, report = select_model(
+        make_candidates(), X_train_scaled, np.asarray(y_train), X_test_scaled, np.asarray(y_test),
+        n_jobs=n_jobs, eta=eta
+    )
+    # Model dùng để dự đoán chạy một thread
+    _limit_threads(best_model, 1)
+
+    # Tính accuracy
+    y_pred = best_model.predict(X_test_scaled)
+    metrics = {
+        'name': best_name,
+        'mse': float(report[best_name][-1]['mse']),
+        'mae': float(mean_absolute_error(y_test, y_pred)),
+        'mape': float(np.mean(np.abs((y_test - y_pred) / y_test)) * 100),
+        'candidates': report,
+        'train_seconds': time.perf_counter() - started
+    }
+    metadata = {**(metadata or {}), 'metrics': metrics}
+
+    # Ghi bundle ngay trong worker để không chặn event loop
+    checksum = size = None
+    if bundle_path:
+        checksum, size = write_bundle(bundle_path, best_model, scaler, metadata)
+
+    return {
+        **metrics,
+        'model': best_model,
+        'scaler': scaler,
+        'metadata': metadata,
+        'checksum': checksum,
+        'bytes': size
+    }
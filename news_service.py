@@ -6,14 +6,21 @@ import logging
 from newsapi import NewsApiClient
 from bs4 import BeautifulSoup
 import re
+from single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 class NewsService:
     def __init__(self):
         self.news_api_key = os.getenv('NEWS_API_KEY')
+        # Nhiều người dùng cùng xem tin một lúc chỉ gọi các nguồn tin một lần
+        self.single_flight = SingleFlight()
         self.newsapi = None
         
+        # Session aiohttp dùng chung cho các nguồn tin và health probe
+        self.request_timeout = float(os.getenv('NEWS_REQUEST_TIMEOUT', '10'))
+        self.session = None
+        
         if self.news_api_key:
             try:
                 self.newsapi = NewsApiClient(api_key=self.news_api_key)
@@ -42,8 +49,24 @@ class NewsService:
             'MATIC': ['polygon', 'matic', 'Polygon']
         }
     
+    async def _get_session(self):
+        """Khởi tạo session aiohttp dùng chung (keep-alive giữa các lần lấy tin)"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.request_timeout))
+        return self.session
+    
+    async def close(self):
+        """Đóng session dùng chung"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+    
     async def get_crypto_news(self, limit=10):
         """Lấy tin tức crypto tổng quát"""
+        articles = await self.single_flight.do(('crypto_news', limit), self._get_crypto_news, limit)
+        return list(articles)
+    
+    async def _get_crypto_news(self, limit):
         try:
             news_articles = []
             
@@ -71,41 +94,41 @@ class NewsService:
             
             # Lấy từ CoinGecko API (miễn phí)
             try:
-                async with aiohttp.ClientSession() as session:
-                    url = "https://api.coingecko.com/api/v3/news"
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            
-                            for item in data.get('data', [])[:limit]:
-                                news_articles.append({
-                                    'title': item.get('title', ''),
-                                    'description': item.get('description', ''),
-                                    'url': item.get('url', ''),
-                                    'source': item.get('news_site', 'CoinGecko'),
-                                    'published_at': item.get('published_at', ''),
-                                    'sentiment': self.analyze_sentiment(item.get('title', '') + ' ' + item.get('description', ''))
-                                })
+                session = await self._get_session()
+                url = "https://api.coingecko.com/api/v3/news"
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        
+                        for item in data.get('data', [])[:limit]:
+                            news_articles.append({
+                                'title': item.get('title', ''),
+                                'description': item.get('description', ''),
+                                'url': item.get('url', ''),
+                                'source': item.get('news_site', 'CoinGecko'),
+                                'published_at': item.get('published_at', ''),
+                                'sentiment': self.analyze_sentiment(item.get('title', '') + ' ' + item.get('description', ''))
+                            })
             except Exception as e:
                 logger.error(f"Lỗi CoinGecko News: {e}")
             
             # Lấy từ CryptoPanic API (miễn phí)
             try:
-                async with aiohttp.ClientSession() as session:
-                    url = "https://cryptopanic.com/api/v1/posts/?auth_token=free&kind=news"
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            
-                            for item in data.get('results', [])[:limit]:
-                                news_articles.append({
-                                    'title': item.get('title', ''),
-                                    'description': '',
-                                    'url': item.get('url', ''),
-                                    'source': item.get('source', {}).get('title', 'CryptoPanic'),
-                                    'published_at': item.get('published_at', ''),
-                                    'sentiment': self.analyze_sentiment(item.get('title', ''))
-                                })
+                session = await self._get_session()
+                url = "https://cryptopanic.com/api/v1/posts/?auth_token=free&kind=news"
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        
+                        for item in data.get('results', [])[:limit]:
+                            news_articles.append({
+                                'title': item.get('title', ''),
+                                'description': '',
+                                'url': item.get('url', ''),
+                                'source': item.get('source', {}).get('title', 'CryptoPanic'),
+                                'published_at': item.get('published_at', ''),
+                                'sentiment': self.analyze_sentiment(item.get('title', ''))
+                            })
             except Exception as e:
                 logger.error(f"Lỗi CryptoPanic: {e}")
             
@@ -123,6 +146,11 @@ class NewsService:
     
     async def get_coin_news(self, coin_symbol, limit=5):
         """Lấy tin tức cho một coin cụ thể"""
+        articles = await self.single_flight.do(('coin_news', coin_symbol.upper(), limit),
+                                               self._get_coin_news, coin_symbol, limit)
+        return list(articles)
+    
+    async def _get_coin_news(self, coin_symbol, limit):
         try:
             coin_symbol = coin_symbol.upper().replace('USDT', '')
             keywords = self.coin_keywords.get(coin_symbol, [coin_symbol.lower()])
@@ -157,31 +185,31 @@ class NewsService:
             
             # Lấy từ CryptoPanic với filter coin
             try:
-                async with aiohttp.ClientSession() as session:
-                    # Tìm currency ID
-                    currency_map = {
-                        'BTC': 'BTC', 'ETH': 'ETH', 'BNB': 'BNB',
-                        'ADA': 'ADA', 'SOL': 'SOL', 'DOGE': 'DOGE',
-                        'XRP': 'XRP', 'DOT': 'DOT', 'AVAX': 'AVAX', 'MATIC': 'MATIC'
-                    }
-                    
-                    currency_id = currency_map.get(coin_symbol, coin_symbol)
-                    url = f"https://cryptopanic.com/api/v1/posts/?auth_token=free&currencies={currency_id}&kind=news"
-                    
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            
-                            for item in data.get('results', [])[:limit]:
-                                news_articles.append({
-                                    'title': item.get('title', ''),
-                                    'description': '',
-                                    'url': item.get('url', ''),
-                                    'source': item.get('source', {}).get('title', 'CryptoPanic'),
-                                    'published_at': item.get('published_at', ''),
-                                    'sentiment': self.analyze_sentiment(item.get('title', '')),
-                                    'relevance': 0.9  # High relevance vì đã filter theo coin
-                                })
+                session = await self._get_session()
+                # Tìm currency ID
+                currency_map = {
+                    'BTC': 'BTC', 'ETH': 'ETH', 'BNB': 'BNB',
+                    'ADA': 'ADA', 'SOL': 'SOL', 'DOGE': 'DOGE',
+                    'XRP': 'XRP', 'DOT': 'DOT', 'AVAX': 'AVAX', 'MATIC': 'MATIC'
+                }
+                
+                currency_id = currency_map.get(coin_symbol, coin_symbol)
+                url = f"https://cryptopanic.com/api/v1/posts/?auth_token=free&currencies={currency_id}&kind=news"
+                
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        
+                        for item in data.get('results', [])[:limit]:
+                            news_articles.append({
+                                'title': item.get('title', ''),
+                                'description': '',
+                                'url': item.get('url', ''),
+                                'source': item.get('source', {}).get('title', 'CryptoPanic'),
+                                'published_at': item.get('published_at', ''),
+                                'sentiment': self.analyze_sentiment(item.get('title', '')),
+                                'relevance': 0.9  # High relevance vì đã filter theo coin
+                            })
             except Exception as e:
                 logger.error(f"Lỗi CryptoPanic cho {coin_symbol}: {e}")
             
@@ -195,6 +223,22 @@ class NewsService:
             logger.error(f"Lỗi lấy tin tức cho {coin_symbol}: {e}")
             return []
     
+    async def ping_cryptopanic(self):
+        """Probe CryptoPanic bằng HEAD (không tải feed tin); lỗi 5xx hoặc mạng mới là down"""
+        session = await self._get_session()
+        async with session.head("https://cryptopanic.com/api/v1/posts/") as response:
+            if response.status >= 500:
+                response.raise_for_status()
+    
+    async def ping_newsapi(self):
+        """Probe NewsAPI (cần NEWS_API_KEY): một bài duy nhất, mỗi probe tốn một request quota"""
+        if not self.news_api_key:
+            raise ValueError("Chưa cấu hình NEWS_API_KEY")
+        session = await self._get_session()
+        url = "https://newsapi.org/v2/top-headlines?category=business&pageSize=1"
+        async with session.get(url, headers={'X-Api-Key': self.news_api_key}) as response:
+            response.raise_for_status()
+    
     def analyze_sentiment(self, text):
         """Phân tích sentiment đơn giản dựa trên keywords"""
         if not text:
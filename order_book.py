@@ -0,0 +1,359 @@
+import os
+import json
+import time
+import random
+import asyncio
+import aiohttp
+import logging
+from bisect import bisect_left
+from collections import deque, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class BookSide:
+    """Một phía của order book: các mức giá lưu trong list đã sắp xếp, mức tốt nhất ở đầu"""
+
+    def __init__(self, descending=False, max_levels=5000):
+        # Bid lưu giá âm để cả hai phía đều sắp tăng dần theo key
+        self.sign = -1.0 if descending else 1.0
+        self.max_levels = max_levels
+        self.keys = []
+        self.quantities = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def clear(self):
+        self.keys = []
+        self.quantities = []
+
+    def load(self, levels):
+        """Nạp các mức [price, qty] từ snapshot REST"""
+        pairs = sorted((self.sign * float(price), float(qty)) for price, qty in levels if float(qty) != 0.0)
+        self.keys = [key for key, _ in pairs]
+        self.quantities = [qty for _, qty in pairs]
+
+    def update(self, levels):
+        """Áp dụng các mức từ diff: qty = 0 là xóa mức giá, ngược lại thay thế số lượng"""
+        keys = self.keys
+        quantities = self.quantities
+        for price, qty in levels:
+            key = self.sign * float(price)
+            qty = float(qty)
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                if qty == 0.0:
+                    del keys[i]
+                    del quantities[i]
+                else:
+                    quantities[i] = qty
+            elif qty != 0.0:
+                keys.insert(i, key)
+                quantities.insert(i, qty)
+
+        # Bỏ các mức xa nhất để giới hạn bộ nhớ
+        if len(keys) > self.max_levels:
+            del keys[self.max_levels:]
+            del quantities[self.max_levels:]
+
+    def top(self, limit):
+        """limit mức tốt nhất dạng [[price, qty], ...]"""
+        sign = self.sign
+        return [[sign * key, qty] for key, qty in zip(self.keys[:limit], self.quantities[:limit])]
+
+class LocalOrderBook:
+    """Order book cục bộ của một symbol, đồng bộ theo snapshot REST + diff @depth của Binance"""
+
+    def __init__(self, symbol, max_levels=5000, buffer_size=1000):
+        self.symbol = symbol
+        self.bids = BookSide(descending=True, max_levels=max_levels)
+        self.asks = BookSide(descending=False, max_levels=max_levels)
+        self.last_update_id = None
+        self.synced = False
+        self.updated_at = None
+        # Diff nhận được trong lúc chờ snapshot
+        self.buffer = deque(maxlen=buffer_size)
+        self.stats = {'diffs': 0, 'resyncs': 0}
+
+    def reset(self):
+        """Bỏ trạng thái hiện tại, chờ đồng bộ lại từ snapshot mới"""
+        self.bids.clear()
+        self.asks.clear()
+        self.last_update_id = None
+        self.synced = False
+
+    def load_snapshot(self, snapshot):
+        """Nạp snapshot /api/v3/depth"""
+        self.bids.load(snapshot['bids'])
+        self.asks.load(snapshot['asks'])
+        self.last_update_id = int(snapshot['lastUpdateId'])
+        self.updated_at = time.monotonic()
+
+    def apply_diff(self, event):
+        """Áp dụng một event depthUpdate; trả về False nếu bị hụt sequence (cần resync)"""
+        first_id = event['U']
+        final_id = event['u']
+
+        # Event đã nằm trong snapshot/diff trước đó
+        if final_id <= self.last_update_id:
+            return True
+        # Thiếu event ở giữa: event đầu sau snapshot phải có U <= lastUpdateId + 1 <= u,
+        # các event sau phải có U == u của event trước + 1
+        if first_id > self.last_update_id + 1:
+            return False
+
+        self.bids.update(event['b'])
+        self.asks.update(event['a'])
+        self.last_update_id = final_id
+        self.updated_at = time.monotonic()
+        self.stats['diffs'] += 1
+        return True
+
+    def sync(self, snapshot):
+        """Nạp snapshot rồi áp dụng các diff đang chờ; False nếu snapshot không khớp buffer"""
+        self.load_snapshot(snapshot)
+        pending = list(self.buffer)
+        for event in pending:
+            if not self.apply_diff(event):
+                # Giữ buffer để thử lại với snapshot mới hơn
+                self.reset()
+                return False
+
+        self.buffer.clear()
+        self.synced = True
+        return True
+
+    def top(self, limit=10):
+        """limit mức tốt nhất mỗi phía, cùng format get_order_book"""
+        return {'bids': self.bids.top(limit), 'asks': self.asks.top(limit)}
+
+class DepthStream:
+    """Duy trì order book cục bộ cho các symbol đã đăng ký qua stream <symbol>@depth@100ms"""
+
+    def __init__(self, fetch_snapshot, symbols=None, url=None, snapshot_limit=None, max_age=None, max_symbols=None,
+                 idle_seconds=None):
+        # fetch_snapshot(symbol, limit) -> payload /api/v3/depth
+        self.fetch_snapshot = fetch_snapshot
+        self.url = url or os.getenv('BINANCE_DEPTH_STREAM_URL', 'wss://stream.binance.com:9443/stream')
+        self.snapshot_limit = int(snapshot_limit or os.getenv('BINANCE_DEPTH_SNAPSHOT_LIMIT', '1000'))
+        # Book không nhận được diff trong max_age giây bị coi là stale
+        self.max_age = float(max_age or os.getenv('BINANCE_DEPTH_MAX_AGE', '5'))
+        self.max_symbols = int(max_symbols or os.getenv('BINANCE_DEPTH_MAX_SYMBOLS', '50'))
+        # Book đăng ký động không được đọc trong khoảng này bị bỏ (unsubscribe) để nhường chỗ
+        self.idle_seconds = float(idle_seconds or os.getenv('BINANCE_DEPTH_IDLE_SECONDS', '300'))
+        self.max_sync_attempts = 5
+        self.min_backoff = 1.0
+        self.max_backoff = 60.0
+
+        if symbols is None:
+            symbols = [s.strip().upper() for s in os.getenv('BINANCE_DEPTH_SYMBOLS', '').split(',') if s.strip()]
+        # Symbol cấu hình sẵn luôn được giữ; các book còn lại xếp theo lần đọc gần nhất (LRU)
+        self.pinned = set(symbols)
+        self.books = OrderedDict((symbol, LocalOrderBook(symbol)) for symbol in symbols)
+        self.used_at = {}  # symbol -> time.monotonic() lần subscribe/đọc gần nhất
+        self._swept_at = time.monotonic()
+
+        self.connected = False
+        self.reconnects = 0
+        self._session = None
+        self._ws = None
+        self._task = None
+        self._sync_tasks = {}
+        self._request_id = 0
+
+    def start(self, session):
+        """Chạy stream ở background nếu đã có symbol đăng ký"""
+        self._session = session
+        if self.books and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(session))
+        return self._task
+
+    async def stop(self):
+        """Dừng stream và các task đồng bộ snapshot"""
+        tasks = list(self._sync_tasks.values())
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._sync_tasks = {}
+        self._ws = None
+        self.connected = False
+
+    async def subscribe(self, symbol):
+        """Đăng ký order book cục bộ cho symbol; False nếu đã đủ số symbol tối đa và không có book nào rảnh"""
+        if symbol in self.books:
+            self._touch(symbol)
+            return True
+        await self.evict_idle()
+        if len(self.books) >= self.max_symbols:
+            return False
+
+        self.books[symbol] = LocalOrderBook(symbol)
+        self._touch(symbol)
+        if self._ws is not None and not self._ws.closed:
+            await self._send_request('SUBSCRIBE', [symbol])
+        elif self._session is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(self._session))
+        return True
+
+    def get_book(self, symbol):
+        """Order book đã đồng bộ và còn mới của symbol, None nếu chưa sẵn sàng"""
+        book = self.books.get(symbol)
+        if book is None:
+            return None
+        self._touch(symbol)
+        if not book.synced or time.monotonic() - book.updated_at > self.max_age:
+            return None
+        return book
+
+    def _touch(self, symbol):
+        self.used_at[symbol] = time.monotonic()
+        self.books.move_to_end(symbol)
+
+    async def evict_idle(self):
+        """Bỏ các book đăng ký động không được đọc trong idle_seconds (từ book ít dùng nhất), trả về số book bị bỏ"""
+        self._swept_at = time.monotonic()
+        cutoff = self._swept_at - self.idle_seconds
+        idle = []
+        for symbol in self.books:
+            if symbol in self.pinned:
+                continue
+            if self.used_at.get(symbol, 0.0) >= cutoff:
+                # Thứ tự LRU: các book phía sau đều được dùng gần đây hơn
+                break
+            idle.append(symbol)
+
+        for symbol in idle:
+            del self.books[symbol]
+            self.used_at.pop(symbol, None)
+            task = self._sync_tasks.pop(symbol, None)
+            if task is not None:
+                task.cancel()
+        if idle:
+            logger.info(f"Bỏ order book không dùng tới: {', '.join(idle)}")
+            if self._ws is not None and not self._ws.closed:
+                await self._send_request('UNSUBSCRIBE', idle)
+        return len(idle)
+
+    @staticmethod
+    def _stream_name(symbol):
+        return f"{symbol.lower()}@depth@100ms"
+
+    async def _send_request(self, method, symbols):
+        """Gửi SUBSCRIBE/UNSUBSCRIBE qua kết nối đang mở"""
+        self._request_id += 1
+        await self._ws.send_json({
+            'method': method,
+            'params': [self._stream_name(symbol) for symbol in symbols],
+            'id': self._request_id
+        })
+
+    async def _run(self, session):
+        """Kết nối, nhận diff và tự reconnect với exponential backoff"""
+        backoff = self.min_backoff
+        while True:
+            try:
+                symbols = list(self.books)
+                url = f"{self.url}?streams={'/'.join(self._stream_name(s) for s in symbols)}"
+                async with session.ws_connect(url, heartbeat=30) as ws:
+                    self._ws = ws
+                    self.connected = True
+                    backoff = self.min_backoff
+                    logger.info(f"Đã kết nối depth stream ({len(symbols)} symbols)")
+
+                    # Symbol đăng ký trong lúc đang kết nối
+                    added = [symbol for symbol in self.books if symbol not in symbols]
+                    if added:
+                        await self._send_request('SUBSCRIBE', added)
+
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self.handle_message(msg.data)
+                            if time.monotonic() - self._swept_at > self.idle_seconds / 4:
+                                await self.evict_idle()
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Lỗi depth stream: {e}")
+
+            # Mất kết nối là mất sequence: mọi book phải đồng bộ lại
+            self._ws = None
+            self.connected = False
+            for task in self._sync_tasks.values():
+                task.cancel()
+            self._sync_tasks = {}
+            for book in self.books.values():
+                book.reset()
+                book.buffer.clear()
+
+            self.reconnects += 1
+            delay = backoff + random.uniform(0, backoff / 2)
+            logger.info(f"Depth stream mất kết nối, thử lại sau {delay:.1f}s")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def handle_message(self, raw):
+        """Xử lý một frame depthUpdate (combined stream hoặc raw stream)"""
+        try:
+            payload = json.loads(raw)
+            event = payload.get('data', payload)
+            if event.get('e') != 'depthUpdate':
+                return
+
+            book = self.books.get(event['s'])
+            if book is None:
+                return
+
+            if book.synced:
+                if book.apply_diff(event):
+                    return
+                logger.warning(f"Order book {book.symbol} hụt sequence, đồng bộ lại")
+                book.stats['resyncs'] += 1
+                book.reset()
+
+            book.buffer.append(event)
+            self._schedule_sync(book.symbol)
+
+        except Exception as e:
+            logger.error(f"Lỗi xử lý message depth stream: {e}")
+
+    def _schedule_sync(self, symbol):
+        # Mỗi symbol tối đa một task đồng bộ; task chỉ kết thúc khi đã khớp (hoặc book bị bỏ)
+        task = self._sync_tasks.get(symbol)
+        if task is None or task.done():
+            self._sync_tasks[symbol] = asyncio.create_task(self._sync(symbol))
+
+    async def _sync(self, symbol):
+        """Lấy snapshot REST tới khi khớp với các diff đang chờ; thất bại liên tục thì giãn dần (snapshot tốn weight 50)"""
+        book = self.books[symbol]
+        backoff = self.min_backoff
+        attempt = 0
+        while True:
+            try:
+                snapshot = await self.fetch_snapshot(symbol, self.snapshot_limit)
+                if book.sync(snapshot):
+                    logger.info(f"Đã đồng bộ order book {symbol} (lastUpdateId {book.last_update_id})")
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Lỗi lấy snapshot order book {symbol}: {e}")
+
+            attempt += 1
+            if attempt < self.max_sync_attempts:
+                # Snapshot cũ hơn diff đầu tiên trong buffer: chờ một chút rồi lấy lại
+                delay = 0.1 * attempt
+            else:
+                if attempt == self.max_sync_attempts:
+                    logger.error(f"Không đồng bộ được order book {symbol} sau {attempt} lần thử, thử lại giãn dần")
+                delay = backoff + random.uniform(0, backoff / 2)
+                backoff = min(backoff * 2, self.max_backoff)
+            await asyncio.sleep(delay)
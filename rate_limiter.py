@@ -0,0 +1,156 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Request của người dùng luôn được phục vụ trước job nền (training, backfill, refresh)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+def request_weight(path, params=None):
+    """Weight của một request REST Binance theo tài liệu /api/v3"""
+    params = params or {}
+
+    if path == '/api/v3/ticker/24hr':
+        if 'symbol' in params:
+            return 2
+        if 'symbols' in params:
+            count = params['symbols'].count(',') + 1
+            return 2 if count <= 20 else 40 if count <= 100 else 80
+        return 80
+    if path == '/api/v3/ticker/price':
+        return 2 if 'symbol' in params else 4
+    if path == '/api/v3/depth':
+        limit = int(params.get('limit', 100))
+        return 5 if limit <= 100 else 25 if limit <= 500 else 50 if limit <= 1000 else 250
+    if path == '/api/v3/exchangeInfo':
+        return 20
+    if path == '/api/v3/klines':
+        return 2
+    return 1
+
+class RequestScheduler:
+    """Token bucket theo request weight/phút, đồng bộ với header X-MBX-USED-WEIGHT-* và ưu tiên request tương tác"""
+
+    def __init__(self, weight_limit=None, background_reserve=None):
+        self.capacity = float(weight_limit or os.getenv('BINANCE_WEIGHT_LIMIT', '6000'))
+        self.refill_rate = self.capacity / 60.0
+        # Phần budget chỉ dành cho request tương tác, job nền không được dùng tới
+        self.background_reserve = self.capacity * float(
+            background_reserve if background_reserve is not None
+            else os.getenv('BINANCE_BACKGROUND_RESERVE', '0.2')
+        )
+
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.used_weight = {}  # '1m' -> weight đã dùng theo header của server
+
+        self._queue = []
+        self._counter = itertools.count()
+        self._dispatcher = None
+        self._wakeup = asyncio.Event()
+        self.stats = {'requests': 0, 'queued': 0, 'throttled': 0, 'weight_spent': 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def _can_run(self, weight, priority):
+        reserve = self.background_reserve if priority >= PRIORITY_BACKGROUND else 0.0
+        return time.monotonic() >= self.paused_until and self.tokens - weight >= reserve
+
+    def _consume(self, weight):
+        self.tokens -= weight
+        self.stats['requests'] += 1
+        self.stats['weight_spent'] += weight
+
+    async def acquire(self, weight, priority=PRIORITY_INTERACTIVE):
+        """Chờ tới khi đủ weight để gửi request"""
+        self._refill()
+        # Chỉ đi thẳng khi không có request cùng hoặc cao hơn mức ưu tiên đang chờ
+        if (not self._queue or self._queue[0][0] > priority) and self._can_run(weight, priority):
+            self._consume(weight)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), weight, future))
+        self.stats['queued'] += 1
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    def charge(self, weight):
+        """Trừ weight cho request gửi thêm (hedge, failover) mà không phải chờ"""
+        self._refill()
+        self._consume(weight)
+
+    async def _dispatch(self):
+        """Cấp budget cho hàng đợi theo thứ tự ưu tiên"""
+        while self._queue:
+            priority, _, weight, future = self._queue[0]
+            if future.cancelled():
+                heapq.heappop(self._queue)
+                continue
+
+            self._refill()
+            if self._can_run(weight, priority):
+                heapq.heappop(self._queue)
+                self._consume(weight)
+                future.set_result(None)
+                continue
+
+            # Chờ tới khi bucket đủ weight, hết thời gian bị ban hoặc có request mới vào hàng đợi
+            reserve = self.background_reserve if priority >= PRIORITY_BACKGROUND else 0.0
+            wait = max(
+                self.paused_until - time.monotonic(),
+                (weight + reserve - self.tokens) / self.refill_rate,
+                0.001
+            )
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def update_from_response(self, status, headers):
+        """Đồng bộ bucket với weight server báo về; tạm dừng khi bị 429/418"""
+        for name, value in headers.items():
+            name = name.lower()
+            if name.startswith('x-mbx-used-weight-'):
+                try:
+                    self.used_weight[name[len('x-mbx-used-weight-'):]] = int(value)
+                except ValueError:
+                    pass
+
+        used = self.used_weight.get('1m')
+        if used is not None:
+            self._refill()
+            self.tokens = min(self.tokens, self.capacity - used)
+
+        if status in (418, 429):
+            retry_after = float(headers.get('Retry-After', 60))
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.stats['throttled'] += 1
+            logger.warning(f"Binance trả về {status}, tạm dừng gửi request {retry_after:.0f}s")
+
+    def metrics(self):
+        """Độ sâu hàng đợi và budget weight hiện tại"""
+        self._refill()
+        pending = [item for item in self._queue if not item[3].cancelled()]
+        return {
+            'queue_depth': len(pending),
+            'queue_interactive': sum(1 for item in pending if item[0] < PRIORITY_BACKGROUND),
+            'queue_background': sum(1 for item in pending if item[0] >= PRIORITY_BACKGROUND),
+            'tokens': self.tokens,
+            'capacity': self.capacity,
+            'used_weight': dict(self.used_weight),
+            'paused_for': max(0.0, self.paused_until - time.monotonic()),
+            **self.stats
+        }
@@ -0,0 +1,89 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+class RetrainScheduler:
+    """Retrain model của watchlist trong khung giờ thấp điểm, tối đa `concurrency` job cùng lúc"""
+
+    def __init__(self, predictor, watchlist=None, hour=None, window_hours=None,
+                 max_age_hours=None, concurrency=None, check_interval=None):
+        self.predictor = predictor
+        if watchlist is None:
+            watchlist = [s.strip().upper() for s in os.getenv(
+                'RETRAIN_WATCHLIST', 'BTCUSDT,ETHUSDT,BNBUSDT,ADAUSDT,SOLUSDT').split(',') if s.strip()]
+        self.watchlist = watchlist
+        # Khung giờ thấp điểm (UTC): [hour, hour + window_hours)
+        self.hour = int(hour if hour is not None else os.getenv('RETRAIN_HOUR_UTC', '3'))
+        self.window_hours = int(window_hours or os.getenv('RETRAIN_WINDOW_HOURS', '2'))
+        self.max_age = float(max_age_hours or os.getenv('RETRAIN_MAX_AGE_HOURS', '24')) * 3600
+        # Số job training song song; mỗi job dùng job_cpus core của training queue
+        self.concurrency = int(concurrency or os.getenv('RETRAIN_CONCURRENCY', '1'))
+        self.check_interval = float(check_interval or os.getenv('RETRAIN_CHECK_INTERVAL', '600'))
+        self._task = None
+        self.stats = {'runs': 0, 'retrained': 0, 'failed': 0, 'last_run': None}
+
+    def start(self):
+        """Chạy vòng kiểm tra ở background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def in_window(self, now=None):
+        """Thời điểm now (datetime UTC) có nằm trong khung giờ thấp điểm không"""
+        now = now or datetime.now(timezone.utc)
+        return (now.hour - self.hour) % 24 < self.window_hours
+
+    def due(self, symbol):
+        """Symbol chưa có model trong registry hoặc model đã cũ hơn max_age"""
+        version = self.predictor.registry.current_version(symbol)
+        if version is None:
+            return True
+        try:
+            created_at = self.predictor.registry.metadata(symbol, version)['created_at']
+        except Exception:
+            return True
+        return time.time() - created_at >= self.max_age
+
+    async def _run(self):
+        while True:
+            try:
+                if self.in_window():
+                    await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Lỗi lịch retrain: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    async def run_once(self, force=False):
+        """Retrain các symbol đến hạn (hoặc mọi symbol nếu force), trả về {symbol: True/False}"""
+        symbols = [symbol for symbol in self.watchlist if force or self.due(symbol)]
+        if not symbols:
+            return {}
+
+        logger.info(f"Retrain {len(symbols)} model: {', '.join(symbols)}")
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def retrain(symbol):
+            async with slots:
+                return await self.predictor.train_model(symbol, retrain=True)
+
+        results = dict(zip(symbols, await asyncio.gather(*[retrain(symbol) for symbol in symbols])))
+        self.stats['runs'] += 1
+        self.stats['retrained'] += sum(1 for ok in results.values() if ok)
+        self.stats['failed'] += sum(1 for ok in results.values() if not ok)
+        self.stats['last_run'] = time.time()
+        return results
@@ -0,0 +1,21 @@
+import numpy as np
+
+# Ngưỡng % thay đổi giá dự đoán: > 5 STRONG BUY, > 2 BUY, > -2 HOLD, > -5 SELL, còn lại STRONG SELL
+SIGNAL_THRESHOLDS = np.array([-5.0, -2.0, 2.0, 5.0])
+SIGNAL_LABELS = ["STRONG SELL ⚠️", "SELL 📉", "HOLD ⏸️", "BUY 📈", "STRONG BUY 🚀"]
+HOLD = 2
+
+# Vị thế khi backtest theo từng tín hiệu: mua (1), đứng ngoài (0), bán khống (-1)
+SIGNAL_POSITIONS = np.array([-1, -1, 0, 1, 1], dtype=np.int8)
+
+def signal_codes(change_percent):
+    """Mã tín hiệu (chỉ số trong SIGNAL_LABELS) cho mảng % thay đổi bất kỳ shape; NaN là HOLD"""
+    change_percent = np.asarray(change_percent, dtype=np.float64)
+    # side='left': đúng bằng ngưỡng thì thuộc mức thấp hơn (giống so sánh '>')
+    codes = np.searchsorted(SIGNAL_THRESHOLDS, change_percent, side='left').astype(np.int8)
+    codes[np.isnan(change_percent)] = HOLD
+    return codes
+
+def recommendation(change_percent):
+    """Recommendation cho một giá trị % thay đổi"""
+    return SIGNAL_LABELS[int(signal_codes([change_percent])[0])]
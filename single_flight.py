@@ -0,0 +1,47 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Gộp các lời gọi giống hệt nhau đang chạy thành một future upstream dùng chung"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.stats = {'calls': 0, 'upstream': 0, 'coalesced': 0}
+
+    async def do(self, key, func, *args, **kwargs):
+        """Chạy func(*args, **kwargs) một lần cho mỗi key đang bay; các caller khác chờ cùng kết quả"""
+        self.stats['calls'] += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.stats['upstream'] += 1
+        else:
+            self.stats['coalesced'] += 1
+
+        # shield: một caller bị hủy không làm hủy request dùng chung của các caller khác
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Đánh dấu exception đã được xử lý khi mọi caller đều đã hủy
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self):
+        """Số request upstream đang chạy"""
+        return len(self._inflight)
+
+    def metrics(self):
+        """Thống kê số lời gọi, số request upstream thật và số lời gọi được gộp"""
+        calls = self.stats['calls']
+        return {
+            **self.stats,
+            'in_flight': len(self._inflight),
+            'coalesce_ratio': self.stats['coalesced'] / calls if calls else 0.0
+        }
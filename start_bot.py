@@ -110,36 +110,43 @@ def create_directories():
         Path(directory).mkdir(exist_ok=True)
         logger.info(f"✅ Thư mục {directory}: OK")
 
-async def test_connections():
-    """Test kết nối các API"""
+async def test_connections(health_monitor=None):
+    """Test kết nối các API (đọc trạng thái từ health monitor, không gọi mạng riêng)"""
     logger.info("🌐 Kiểm tra kết nối API...")
     
-    # Test Binance connection
+    binance_client = None
+    news_service = None
     try:
-        from binance_client import BinanceClient
-        binance_client = BinanceClient()
-        
-        # Test public API
-        price = await binance_client.get_current_price('BTCUSDT')
-        if price:
-            logger.info(f"✅ Binance API: OK (BTC price: ${price:,.2f})")
+        if health_monitor is None:
+            # Chưa có bot đang chạy: tạo monitor tạm và chạy một vòng probe
+            from binance_client import BinanceClient
+            from news_service import NewsService
+            binance_client = BinanceClient()
+            news_service = NewsService()
+            health_monitor = binance_client.health_monitor
+            health_monitor.add_probe('cryptopanic', news_service.ping_cryptopanic,
+                                     interval=health_monitor.third_party_interval)
+            if news_service.news_api_key:
+                health_monitor.add_probe('newsapi', news_service.ping_newsapi,
+                                         interval=health_monitor.third_party_interval)
+            await health_monitor.check_all()
         else:
-            logger.warning("⚠️ Binance API: Có vấn đề")
-    except Exception as e:
-        logger.error(f"❌ Binance API: {e}")
-    
-    # Test News API
-    try:
-        from news_service import NewsService
-        news_service = NewsService()
-        news = await news_service.get_crypto_news(limit=1)
+            await health_monitor.wait_ready(health_monitor.timeout + 1)
         
-        if news:
-            logger.info(f"✅ News Service: OK ({len(news)} articles)")
-        else:
-            logger.warning("⚠️ News Service: Không có dữ liệu")
+        for name, status in health_monitor.snapshot().items():
+            if status['up']:
+                logger.info(f"✅ {name}: OK ({status['latency_p50']:.0f} ms)")
+            elif status['checks']:
+                logger.warning(f"⚠️ {name}: Có vấn đề ({status['last_error']})")
+            else:
+                logger.warning(f"⚠️ {name}: Chưa có kết quả kiểm tra")
     except Exception as e:
-        logger.error(f"❌ News Service: {e}")
+        logger.error(f"❌ Lỗi kiểm tra kết nối: {e}")
+    finally:
+        if binance_client is not None:
+            await binance_client.close()
+        if news_service is not None:
+            await news_service.close()
 
 def print_startup_info():
     """In thông tin khởi động"""
@@ -232,14 +239,16 @@ async def run_bot():
             
         create_directories()
         
-        # Test connections
-        await test_connections()
+        # Import bot, mở kết nối và bắt đầu health check ở background
+        from main import CryptoBotTelegram
+        bot = CryptoBotTelegram()
+        await bot.binance_client.start()
+        
+        # Test connections (đọc kết quả vòng health check đầu tiên)
+        await test_connections(bot.health_monitor)
         
         print_startup_info()
         
-        # Import và chạy bot
-        from main import CryptoBotTelegram
-        bot = CryptoBotTelegram()
         await bot.run_async()
         
     except Exception as e:
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SymbolIndex:
+    """Index symbol từ /exchangeInfo: tra cứu prefix O(len(query)), tìm kiếm có xếp hạng, lưu xuống đĩa"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.symbols = {}
+        self.updated_at = None  # epoch (giây) của lần tải exchangeInfo gần nhất
+        self._prefixes = {}
+        self._by_quote = {}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def age(self):
+        """Tuổi của index (giây), vô cùng nếu chưa có dữ liệu"""
+        if self.updated_at is None:
+            return float('inf')
+        return time.time() - self.updated_at
+
+    def load_exchange_info(self, exchange_info):
+        """Xây index từ payload /exchangeInfo, chỉ giữ các trường cần thiết"""
+        symbols = {}
+        for s in exchange_info['symbols']:
+            symbols[s['symbol']] = {
+                'symbol': s['symbol'],
+                'status': s['status'],
+                'base_asset': s['baseAsset'],
+                'quote_asset': s['quoteAsset'],
+                'filters': {f['filterType']: f for f in s.get('filters', [])}
+            }
+        self._set_symbols(symbols, time.time())
+
+    def _set_symbols(self, symbols, updated_at):
+        """Dựng bảng prefix rồi thay thế index cũ trong một lần gán"""
+        prefixes = {}
+        by_quote = {None: []}
+        for symbol in sorted(symbols, key=lambda s: (len(s), s)):
+            for i in range(1, len(symbol) + 1):
+                prefixes.setdefault(symbol[:i], []).append(symbol)
+
+            # Danh sách (symbol, base, status) theo quote asset cho tìm kiếm substring
+            info = symbols[symbol]
+            entry = (symbol, info['base_asset'], info['status'])
+            by_quote[None].append(entry)
+            by_quote.setdefault(info['quote_asset'], []).append(entry)
+
+        self.symbols = symbols
+        self._prefixes = prefixes
+        self._by_quote = by_quote
+        self.updated_at = updated_at
+
+    def save(self):
+        """Ghi index xuống đĩa (atomic) để khởi động lại không phải tải exchangeInfo"""
+        if not self.path or not self.symbols:
+            return False
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'updated_at': self.updated_at, 'symbols': self.symbols}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi lưu symbol index: {e}")
+            return False
+
+    def load(self):
+        """Đọc index đã lưu trên đĩa"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._set_symbols(data['symbols'], data['updated_at'])
+            logger.info(f"Đã load symbol index ({len(self.symbols)} symbols) từ {self.path}")
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi load symbol index: {e}")
+            return False
+
+    def get(self, symbol):
+        """Thông tin symbol (status, base/quote asset, filters) hoặc None"""
+        return self.symbols.get(symbol)
+
+    def is_trading(self, symbol):
+        """Symbol có đang được giao dịch không"""
+        info = self.symbols.get(symbol)
+        return info is not None and info['status'] == 'TRADING'
+
+    def get_filters(self, symbol):
+        """Các filter (PRICE_FILTER, LOT_SIZE, ...) của symbol"""
+        info = self.symbols.get(symbol)
+        return info['filters'] if info else {}
+
+    def prefix(self, query):
+        """Các symbol bắt đầu bằng query, sắp theo độ dài"""
+        return self._prefixes.get(query.upper(), [])
+
+    def search(self, query, quote_asset=None, status='TRADING', limit=20):
+        """Tìm kiếm có xếp hạng: khớp chính xác > base asset > prefix > substring base > substring symbol"""
+        query = query.upper().replace('/', '').strip()
+        if not query:
+            return []
+
+        def accept(symbol):
+            info = self.symbols[symbol]
+            return ((status is None or info['status'] == status) and
+                    (quote_asset is None or info['quote_asset'] == quote_asset))
+
+        results = []
+        seen = set()
+
+        def add(symbol):
+            if symbol not in seen and accept(symbol):
+                seen.add(symbol)
+                results.append(symbol)
+            return len(results) >= limit
+
+        # 1. Khớp chính xác symbol
+        if query in self.symbols and add(query):
+            return results
+
+        # 2. Base asset khớp chính xác (VD: "BTC" -> BTCUSDT)
+        for symbol in self.prefix(query):
+            if self.symbols[symbol]['base_asset'] == query and add(symbol):
+                return results
+
+        # 3. Prefix của symbol
+        for symbol in self.prefix(query):
+            if add(symbol):
+                return results
+
+        # 4. Substring trong base asset, 5. substring trong symbol (bao gồm quote asset)
+        entries = [e for e in self._by_quote.get(quote_asset, []) if status is None or e[2] == status]
+        for symbol, base_asset, _ in entries:
+            if query in base_asset and add(symbol):
+                return results
+        for symbol, _, _ in entries:
+            if query in symbol and add(symbol):
+                return results
+
+        return results
@@ -0,0 +1,11 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def isolated_dirs(tmp_path, monkeypatch):
+    """Kline store, cache exchangeInfo/CoinGecko, models/ và model registry của test nằm trong thư mục tạm"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('KLINE_STORE_DIR', str(tmp_path / 'klines'))
+    monkeypatch.setenv('BINANCE_EXCHANGE_INFO_CACHE', str(tmp_path / 'exchange_info.json'))
+    monkeypatch.setenv('COINGECKO_COINS_CACHE', str(tmp_path / 'coingecko_coins.json'))
+    monkeypatch.setenv('MODEL_REGISTRY_DIR', str(tmp_path / 'registry'))
+    return tmp_path
@@ -0,0 +1,267 @@
+"""
+Dữ liệu và server giả lập dùng chung cho test và benchmark (chạy hoàn toàn offline)
+"""
+
+import json
+import asyncio
+
+import aiohttp
+import numpy as np
+import pandas as pd
+import ta
+from aiohttp import web
+
+from binance_client import BinanceClient
+from rate_limiter import RequestScheduler
+from host_pool import HostPool
+from health_monitor import HealthMonitor
+from kline_store import candle_open_time
+from model_registry import write_bundle
+from indicators import FEATURE_COLUMNS
+from signals import SIGNAL_LABELS, SIGNAL_POSITIONS, recommendation
+
+def make_client(base_url, market_stream=None):
+    """BinanceClient trỏ tới server giả lập, không giới hạn weight"""
+    client = BinanceClient()
+    client.base_url = base_url
+    client.host_pool = HostPool([base_url])
+    client.market_stream = market_stream
+    client.scheduler = RequestScheduler(weight_limit=10 ** 9)
+    # Không probe Binance/CoinGecko thật; cần probe thì tự đăng ký với server giả lập
+    client.health_monitor = HealthMonitor()
+    return client
+
+async def start_stub_server(routes):
+    """Khởi động server HTTP/WebSocket giả lập, trả về (runner, base_url)"""
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+async def hold_open(ws):
+    """Giữ kết nối WebSocket phía server tới khi client đóng (server dọn dẹp được ngay)"""
+    async for _ in ws:
+        pass
+
+def make_klines_payload(candles=100, start=1700000000000):
+    """Payload /klines 1h dạng Binance"""
+    return [
+        [start + i * 3600000, '1.0', '2.0', '0.5', '1.5', '100.0',
+         start + 3599999 + i * 3600000, '150.0', 10, '50.0', '75.0', '0']
+        for i in range(candles)
+    ]
+
+def make_ticker_frame(symbols, event_time, event_type='24hrTicker'):
+    """Tạo frame combined stream !ticker@arr giống dữ liệu thật của Binance"""
+    events = []
+    for i, symbol in enumerate(symbols):
+        price = 100.0 + i + (event_time % 1000) / 1000
+        events.append({
+            'e': event_type, 'E': event_time, 's': symbol,
+            'p': '1.5', 'P': '1.52', 'o': f"{price - 1.5:.4f}", 'c': f"{price:.4f}",
+            'h': f"{price + 2:.4f}", 'l': f"{price - 3:.4f}", 'v': '12345.6', 'q': '987654.3'
+        })
+    return json.dumps({'stream': '!ticker@arr', 'data': events})
+
+def make_exchange_info(extra=(), coins=1000, quotes=('USDT', 'BTC', 'BUSD')):
+    """Payload /exchangeInfo: `coins` base asset x `quotes`, cộng thêm các (symbol, base, quote, status) trong extra"""
+    rows = [(f"COIN{i}{quote}", f"COIN{i}", quote, 'TRADING') for i in range(coins) for quote in quotes]
+    rows += list(extra)
+    return {'symbols': [{
+        'symbol': symbol, 'status': status, 'baseAsset': base, 'quoteAsset': quote,
+        'filters': [{'filterType': 'PRICE_FILTER', 'tickSize': '0.01'}]
+    } for symbol, base, quote, status in rows]}
+
+def make_24hr_tickers(count=500, seed=11):
+    """Payload /ticker/24hr: nhiều quote asset, % thay đổi làm tròn (có tie), volume quanh ngưỡng 1M"""
+    rng = np.random.default_rng(seed)
+    quotes = ['USDT', 'BTC', 'BUSD']
+    volumes = [1_000_000, 999_999.99, 1_000_000.01, 5e6, 2e5]
+    return [{
+        'symbol': f"COIN{i}{quotes[i % len(quotes)]}",
+        'lastPrice': f"{rng.uniform(0.01, 1000):.4f}",
+        'priceChangePercent': f"{rng.integers(-20, 21) / 2:.2f}",
+        'quoteVolume': f"{volumes[i % len(volumes)] if i % 7 else rng.uniform(1e6, 1e9):.2f}"
+    } for i in range(count)]
+
+def legacy_top_movers(tickers, limit=10, min_quote_volume=1000000):
+    """Top gainers/losers cách cũ (sort toàn bộ list dict) làm chuẩn so sánh"""
+    usdt_pairs = [t for t in tickers if t['symbol'].endswith('USDT') and float(t['quoteVolume']) > min_quote_volume]
+    gainers = sorted(usdt_pairs, key=lambda x: float(x['priceChangePercent']), reverse=True)[:limit]
+    losers = sorted(usdt_pairs, key=lambda x: float(x['priceChangePercent']))[:limit]
+    rows = lambda items: [{
+        'symbol': t['symbol'],
+        'price': float(t['lastPrice']),
+        'change_percent': float(t['priceChangePercent'])
+    } for t in items]
+    return {'gainers': rows(gainers), 'losers': rows(losers)}
+
+def record_depth_diffs(events=2000, seed=7):
+    """Sinh chuỗi depthUpdate cố định (seed) cùng trạng thái book tham chiếu sau mỗi event"""
+    rng = np.random.default_rng(seed)
+    reference = {'bids': {}, 'asks': {}}
+    diffs, states = [], []
+    update_id = 1000
+
+    for _ in range(events):
+        event = {'e': 'depthUpdate', 'E': 0, 's': 'BTCUSDT', 'U': update_id + 1, 'u': update_id + 3, 'b': [], 'a': []}
+        update_id += 3
+        for side, key, low in (('bids', 'b', 9000), ('asks', 'a', 10001)):
+            for tick in rng.integers(low, low + 1000, rng.integers(1, 10)):
+                price = f"{tick / 100:.2f}"
+                qty = '0.00000000' if rng.random() < 0.3 else f"{rng.random() * 5:.8f}"
+                event[key].append([price, qty])
+                if float(qty) == 0.0:
+                    reference[side].pop(price, None)
+                else:
+                    reference[side][price] = float(qty)
+        diffs.append(event)
+        states.append({side: dict(levels) for side, levels in reference.items()})
+    return diffs, states
+
+def reference_top(state, limit):
+    """Top-N của book tham chiếu cùng format get_order_book"""
+    bids = sorted(((float(p), q) for p, q in state['bids'].items()), reverse=True)[:limit]
+    asks = sorted((float(p), q) for p, q in state['asks'].items())[:limit]
+    return {'bids': [list(level) for level in bids], 'asks': [list(level) for level in asks]}
+
+def make_depth_snapshot(state, last_update_id):
+    return {
+        'lastUpdateId': last_update_id,
+        'bids': [[p, f"{q:.8f}"] for p, q in state['bids'].items()],
+        'asks': [[p, f"{q:.8f}"] for p, q in state['asks'].items()]
+    }
+
+def make_klines_body(candles=1000, seed=3):
+    """Payload /klines 1m (bytes) với giá random walk"""
+    rng = np.random.default_rng(seed)
+    prices = 65000 + rng.standard_normal(candles).cumsum() * 50
+    return json.dumps([
+        [1700000000000 + i * 60000, f"{p:.2f}", f"{p + 20:.2f}", f"{p - 20:.2f}", f"{p + 5:.2f}",
+         f"{rng.random() * 100:.5f}", 1700000059999 + i * 60000, f"{rng.random() * 1e6:.8f}",
+         int(rng.integers(100, 5000)), f"{rng.random() * 50:.5f}", f"{rng.random() * 5e5:.8f}", "0"]
+        for i, p in enumerate(prices)
+    ], separators=(',', ':')).encode()
+
+def legacy_parse_klines(raw):
+    """Cách parse cũ: DataFrame object 12 cột, pd.to_numeric từng cột rồi bỏ 7 cột"""
+    df = pd.DataFrame(json.loads(raw), columns=[
+        'timestamp', 'open', 'high', 'low', 'close', 'volume',
+        'close_time', 'quote_asset_volume', 'number_of_trades',
+        'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
+    ])
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = pd.to_numeric(df[col]).astype('float64')
+    df['timestamp'] = df['timestamp'].astype('int64')
+    df.set_index('timestamp', inplace=True)
+    return df[['open', 'high', 'low', 'close', 'volume']]
+
+def legacy_indicators(df):
+    """Các chỉ báo tính bằng thư viện ta như CryptoPredictor trước đây (tham chiếu cho parity)"""
+    df = df.copy()
+    df['sma_7'] = ta.trend.sma_indicator(df['close'], window=7)
+    df['sma_25'] = ta.trend.sma_indicator(df['close'], window=25)
+    df['ema_12'] = ta.trend.ema_indicator(df['close'], window=12)
+    df['ema_26'] = ta.trend.ema_indicator(df['close'], window=26)
+    df['macd'] = ta.trend.macd_diff(df['close'])
+    df['macd_signal'] = ta.trend.macd_signal(df['close'])
+    df['rsi'] = ta.momentum.rsi(df['close'], window=14)
+    bb = ta.volatility.BollingerBands(df['close'])
+    df['bb_upper'] = bb.bollinger_hband()
+    df['bb_lower'] = bb.bollinger_lband()
+    df['bb_middle'] = bb.bollinger_mavg()
+    df['bb_width'] = (df['bb_upper'] - df['bb_lower']) / df['bb_middle']
+    df['stoch_k'] = ta.momentum.stoch(df['high'], df['low'], df['close'])
+    df['stoch_d'] = ta.momentum.stoch_signal(df['high'], df['low'], df['close'])
+    df['williams_r'] = ta.momentum.williams_r(df['high'], df['low'], df['close'])
+    df['volume_sma'] = df['volume'].rolling(window=20).mean()
+    df['vwap'] = ta.volume.volume_weighted_average_price(df['high'], df['low'], df['close'], df['volume'])
+    df['price_change'] = df['close'].pct_change()
+    df['high_low_ratio'] = df['high'] / df['low']
+    df['close_open_ratio'] = df['close'] / df['open']
+    df['volatility'] = df['close'].rolling(window=20).std()
+    df['support'] = df['low'].rolling(window=20).min()
+    df['resistance'] = df['high'].rolling(window=20).max()
+    return df
+
+def make_ohlcv(candles, seed=0):
+    """Chuỗi nến giả lập dạng random walk"""
+    rng = np.random.default_rng(seed)
+    close = 65000 * np.exp(np.cumsum(rng.standard_normal(candles) * 0.005))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.random(candles) * 0.003),
+        'low': np.minimum(open_, close) * (1 - rng.random(candles) * 0.003),
+        'close': close,
+        'volume': rng.random(candles) * 100
+    })
+
+class FakeKlineClient:
+    """Client giả: nến 1h theo đồng hồ (nến cuối đang chạy), đếm số lần tải; latency giả lập độ trễ mạng"""
+
+    def __init__(self, clock, latency=0):
+        self.clock = clock
+        self.latency = latency
+        self.fetches = 0
+        self.failing = set()
+
+    async def get_historical_data(self, symbol, interval='1h', limit=100):
+        self.fetches += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if symbol in self.failing:
+            raise aiohttp.ClientError(f"{symbol} lỗi")
+        current_open = candle_open_time(int(self.clock.time() * 1000), interval)
+        df = make_ohlcv(limit, seed=current_open // 3_600_000 + sum(map(ord, symbol)))
+        df.index = pd.to_datetime(current_open - np.arange(limit)[::-1] * 3_600_000, unit='ms')
+        return df
+
+    async def get_current_price(self, symbol):
+        return (await self.get_current_prices([symbol])).get(symbol)
+
+    async def get_current_prices(self, symbols):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return {symbol: 65000.0 for symbol in symbols if symbol not in self.failing}
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+def publish_models(registry, trained, symbols):
+    """Ghi model đã train (xoay vòng danh sách (model, scaler)) thành phiên bản active v1 của từng symbol"""
+    for i, symbol in enumerate(symbols):
+        model, scaler = trained[i % len(trained)]
+        staging = registry.staging_path(symbol)
+        metadata = {'features': FEATURE_COLUMNS}
+        checksum, _ = write_bundle(staging, model, scaler, metadata)
+        registry.activate(symbol, registry.commit(symbol, staging, metadata, checksum))
+
+def loop_backtest(predicted, close, fee=0.001):
+    """Cách làm từng nến bằng vòng lặp Python (tham chiếu cho evaluate_signals), horizon 1"""
+    equity, position, hits, active = 1.0, 0, 0, 0
+    for t in range(len(close) - 1):
+        if np.isnan(predicted[t]):
+            continue
+        label = recommendation((predicted[t] - close[t]) / close[t] * 100)
+        new_position = int(SIGNAL_POSITIONS[SIGNAL_LABELS.index(label)])
+        change = close[t + 1] / close[t] - 1
+        equity *= 1 + new_position * change - fee * abs(new_position - position)
+        position = new_position
+        if new_position:
+            active += 1
+            hits += np.sign(change) == new_position
+    # Nến cuối không còn tín hiệu: đóng vị thế (trả phí) như evaluate_signals
+    equity *= 1 - fee * abs(position)
+    return equity - 1, hits / active
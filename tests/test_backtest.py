@@ -0,0 +1,54 @@
+import numpy as np
+
+from backtest import WalkForwardBacktest, evaluate_signals
+from kline_store import KlineStore
+from signals import SIGNAL_LABELS, signal_codes, recommendation
+from tests.support import make_ohlcv, loop_backtest
+
+def make_store(path, symbols, candles, start=1_700_000_000_000):
+    store = KlineStore(data_dir=str(path))
+    for i in range(symbols):
+        df = make_ohlcv(candles, seed=100 + i)
+        df.index = start + np.arange(candles) * 3_600_000
+        store._save((f"COIN{i}USDT", '1h'), df)
+    return store
+
+def test_walk_forward_runs_offline_without_lookahead(tmp_path, symbols=3, candles=1200):
+    """Backtest chạy trên KlineStore không gọi API; đổi dữ liệu sau nến k không làm đổi dự đoán tới nến k"""
+    store = make_store(tmp_path / 'klines', symbols, candles)
+    backtest = WalkForwardBacktest(model='lr', train_window=300, retrain_every=24)
+    frames = backtest.load(interval='1h', store=store)
+    report = backtest.run(frames)
+
+    assert store.stats['requests'] == 0
+    assert len(report['symbols']) == symbols
+    assert all(row['bars'] > 0 for row in report['symbols'].values())
+    assert report['total']['mape'] is not None and report['total']['pnl'] is not None
+
+    k = candles * 2 // 3
+    df = frames['COIN0USDT']
+    predicted, _ = backtest.predict(df)
+    changed = df.copy()
+    changed.iloc[k + 1:, :4] *= 1.5
+    predicted_changed, _ = backtest.predict(changed)
+    assert np.array_equal(predicted[:k + 1], predicted_changed[:k + 1], equal_nan=True)
+    assert not np.allclose(predicted[k + 1:], predicted_changed[k + 1:], equal_nan=True)
+
+def test_evaluate_signals_matches_per_bar_loop(bars=3000):
+    """PnL và hit rate vectorized khớp vòng lặp từng nến dùng recommendation của predict_price"""
+    rng = np.random.default_rng(11)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (3, bars)), axis=1))
+    noisy = close * (1 + rng.normal(0, 0.04, close.shape))
+    noisy[:, :50] = np.nan
+    result = evaluate_signals(noisy, close)
+    for i in range(3):
+        pnl, hit_rate = loop_backtest(noisy[i], close[i])
+        assert np.isclose(result['pnl'][i], pnl)
+        assert np.isclose(result['hit_rate'][i], hit_rate)
+    assert all(row['count'] for row in result['signals'].values())
+
+def test_signal_codes_match_recommendation():
+    """Ngưỡng vectorized giống so sánh '>' của recommendation, kể cả đúng bằng ngưỡng và NaN"""
+    changes = np.concatenate([np.random.default_rng(3).normal(0, 4, 2000), [5, 2, -2, -5, 0]])
+    assert all(SIGNAL_LABELS[code] == recommendation(change) for code, change in zip(signal_codes(changes), changes))
+    assert SIGNAL_LABELS[signal_codes([np.nan])[0]] == recommendation(0)
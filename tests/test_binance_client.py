@@ -0,0 +1,212 @@
+import time
+import json
+import asyncio
+
+from aiohttp import web
+
+from market_stream import MarketStream
+from market_universe import UniverseSnapshot
+from order_book import DepthStream
+from tests.support import (
+    make_client, start_stub_server, hold_open, make_klines_payload, make_ticker_frame,
+    record_depth_diffs, make_depth_snapshot
+)
+
+def test_concurrent_handlers_overlap(handlers=10, delay=0.2):
+    """Các handler đồng thời chạy chồng lên nhau khi upstream chậm, event loop không bị chặn"""
+
+    async def klines(request):
+        await asyncio.sleep(delay)
+        return web.json_response(make_klines_payload())
+
+    async def scenario():
+        runner, base_url = await start_stub_server({'/api/v3/klines': klines})
+        client = make_client(base_url)
+        # Đi thẳng REST: kline store giới hạn backfill song song bằng semaphore riêng
+        client.kline_store = None
+        await client.start()
+        try:
+            started = time.perf_counter()
+            results = await asyncio.gather(*[
+                client.get_historical_data(f"COIN{i}USDT", '1h', 100) for i in range(handlers)
+            ])
+            elapsed = time.perf_counter() - started
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+        assert all(df is not None and len(df) == 100 for df in results)
+        assert elapsed < delay * 2
+
+    asyncio.run(scenario())
+
+def test_single_flight_coalesces_identical_requests(callers=50, delay=0.2):
+    """Request giống hệt nhau đang chạy chỉ gọi upstream một lần, hủy một caller không ảnh hưởng caller khác"""
+    upstream_calls = 0
+
+    async def klines(request):
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(delay)
+        return web.json_response(make_klines_payload())
+
+    async def scenario():
+        runner, base_url = await start_stub_server({'/api/v3/klines': klines})
+        client = make_client(base_url)
+        client.kline_store = None
+        await client.start()
+        try:
+            tasks = [asyncio.create_task(client.get_historical_data('BTCUSDT', '1h', 100))
+                     for _ in range(callers)]
+            await asyncio.sleep(delay / 4)
+            tasks[0].cancel()
+            results = await asyncio.gather(*tasks[1:])
+
+            assert upstream_calls == 1
+            assert all(df is not None and len(df) == 100 for df in results)
+            # Mỗi caller nhận một bản copy riêng
+            assert results[0] is not results[1]
+
+            # Sau khi xong, request mới phải gọi upstream lại
+            await client.get_historical_data('BTCUSDT', '1h', 100)
+            assert upstream_calls == 2
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+def test_market_stream_serves_tickers_and_falls_back_to_rest():
+    """Ticker đọc từ WebSocket cache, dữ liệu stale thì fallback về REST"""
+    symbols = [f"COIN{i}USDT" for i in range(50)] + ['BTCUSDT']
+    rest_calls = 0
+
+    async def ticker_stream(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(make_ticker_frame(symbols, 1700000000000))
+        await hold_open(ws)
+        return ws
+
+    async def ticker_24hr(request):
+        nonlocal rest_calls
+        rest_calls += 1
+        return web.json_response([{
+            'symbol': symbol, 'lastPrice': '65000', 'priceChange': '100',
+            'priceChangePercent': '0.15', 'highPrice': '66000', 'lowPrice': '64000',
+            'volume': '1000', 'quoteVolume': '65000000'
+        } for symbol in json.loads(request.query['symbols'])])
+
+    async def scenario():
+        runner, base_url = await start_stub_server({'/stream': ticker_stream, '/api/v3/ticker/24hr': ticker_24hr})
+        client = make_client(base_url, MarketStream(url=base_url.replace('http', 'ws') + '/stream', max_age=0.3))
+        await client.start()
+        try:
+            for _ in range(100):
+                if len(client.market_stream.tickers) == len(symbols):
+                    break
+                await asyncio.sleep(0.01)
+
+            streamed = await client.get_24h_ticker('BTCUSDT')
+            assert rest_calls == 0 and streamed['price'] != 65000.0
+
+            await asyncio.sleep(0.4)
+            ticker = await client.get_24h_ticker('BTCUSDT')
+            assert rest_calls == 1 and ticker['price'] == 65000.0
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+def test_get_order_book_reads_local_book_after_sync():
+    """get_order_book đọc từ book cục bộ, không gọi REST /depth sau khi đồng bộ"""
+    diffs, states = record_depth_diffs(400)
+    depth_calls = 0
+
+    async def depth(request):
+        nonlocal depth_calls
+        depth_calls += 1
+        return web.json_response(make_depth_snapshot(states[49], diffs[50]['U']))
+
+    async def depth_stream(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        if 'btcusdt@depth@100ms' not in request.query.get('streams', ''):
+            await ws.receive_json()
+        for event in diffs[:200]:
+            await ws.send_json({'stream': 'btcusdt@depth@100ms', 'data': event})
+        await hold_open(ws)
+        return ws
+
+    async def scenario():
+        runner, base_url = await start_stub_server({'/api/v3/depth': depth, '/stream': depth_stream})
+        client = make_client(base_url)
+        client.depth_stream = DepthStream(client._fetch_depth_snapshot, symbols=[],
+                                          url=base_url.replace('http', 'ws') + '/stream')
+        await client.start()
+        try:
+            first = await client.get_order_book('BTCUSDT', 5)
+            for _ in range(200):
+                if client.depth_stream.get_book('BTCUSDT') is not None:
+                    break
+                await asyncio.sleep(0.01)
+
+            calls_before = depth_calls
+            local = [await client.get_order_book('BTCUSDT', 5) for _ in range(100)]
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+        # Lần REST đầu tiên và một snapshot để đồng bộ, sau đó không gọi /depth nữa
+        assert first is not None
+        assert depth_calls == calls_before == 2
+        assert all(len(book['bids']) == 5 and len(book['asks']) == 5 for book in local)
+
+    asyncio.run(scenario())
+
+def test_batch_with_invalid_symbol_keeps_valid_symbols(caplog):
+    """Một symbol không hợp lệ làm request batch lỗi 400: nhóm được chia nhỏ, các symbol hợp lệ vẫn có giá"""
+    symbols = [f"COIN{i}USDT" for i in range(20)] + ['NOTACOIN']
+    requests = 0
+
+    async def ticker_price(request):
+        nonlocal requests
+        requests += 1
+        chunk = json.loads(request.query['symbols'])
+        if 'NOTACOIN' in chunk:
+            return web.json_response({'code': -1121, 'msg': 'Invalid symbol.'}, status=400)
+        return web.json_response([{'symbol': symbol, 'price': '1.5'} for symbol in chunk])
+
+    async def scenario():
+        runner, base_url = await start_stub_server({'/api/v3/ticker/price': ticker_price})
+        client = make_client(base_url)
+        try:
+            return await client.get_current_prices(symbols)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    prices = asyncio.run(scenario())
+    assert set(prices) == set(symbols) - {'NOTACOIN'}
+    # Chia đôi: số request tăng theo log2 kích thước nhóm, không phải một request mỗi symbol
+    assert requests <= 2 * 5 + 1
+    assert 'NOTACOIN' in caplog.text
+
+def test_cached_prices_never_touch_the_network():
+    """Menu giá đọc ticker stream rồi snapshot 24h còn hạn; thiếu thì bỏ qua, không gọi REST"""
+    stream = MarketStream()
+    stream.handle_message(make_ticker_frame(['BTCUSDT'], 1700000000000))
+    client = make_client('http://127.0.0.1:9', market_stream=stream)
+    client.universe = UniverseSnapshot([
+        {'symbol': symbol, 'lastPrice': price, 'priceChangePercent': '1.0', 'quoteVolume': '2000000'}
+        for symbol, price in [('BTCUSDT', '1.0'), ('ETHUSDT', '3500.5')]
+    ])
+
+    prices = client.get_cached_prices(['BTCUSDT', 'ETHUSDT', 'SOLUSDT'])
+    assert prices == {'BTCUSDT': stream.get_ticker('BTCUSDT')['price'], 'ETHUSDT': 3500.5}
+
+    # Snapshot hết hạn và stream stale: không có giá nào, menu dùng nút tĩnh
+    client.universe.fetched_at -= client.universe_ttl
+    stream.received_at['BTCUSDT'] -= stream.max_age + 1
+    assert client.get_cached_prices(['BTCUSDT', 'ETHUSDT']) == {}
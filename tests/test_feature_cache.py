@@ -0,0 +1,99 @@
+import asyncio
+
+import crypto_predictor
+from crypto_predictor import CryptoPredictor
+from feature_cache import FeatureCache
+from indicator_state import open_times_ms
+from tests.support import FakeKlineClient, FakeClock
+
+def test_features_shared_per_closed_candle(monkeypatch, lookups=20, symbols=60):
+    """Chỉ báo của nến đã đóng tính một lần, dùng chung; nến mới đóng thì tính lại; LRU theo bộ nhớ"""
+    clock = FakeClock(1_700_000_000 + 1800)
+    monkeypatch.setattr(crypto_predictor, 'time', clock)
+    client = FakeKlineClient(clock)
+    predictor = CryptoPredictor(client)
+
+    async def scenario():
+        first = await predictor.get_features('BTCUSDT')
+        for _ in range(lookups):
+            await predictor.get_features('BTCUSDT')
+            await predictor.get_technical_analysis('BTCUSDT')
+        assert client.fetches == 1
+        assert predictor.feature_cache.stats['hits'] == lookups * 2
+
+        # Frame cache gồm đúng các nến đã đóng
+        expected = predictor.calculate_technical_indicators(
+            (await client.get_historical_data('BTCUSDT')).iloc[:-1])
+        assert first.frame.equals(expected)
+        assert first.closed_time == open_times_ms(expected.index)[-1]
+
+        # Nến mới đóng: key đổi, entry cũ bị bỏ
+        fetches = client.fetches
+        clock.now += 3600
+        second = await predictor.get_features('BTCUSDT')
+        assert client.fetches == fetches + 1
+        assert second.closed_time == first.closed_time + 3_600_000
+        assert predictor.feature_cache.stats['invalidations'] == 1
+        assert len(predictor.feature_cache.entries) == 1
+
+        # Giới hạn bộ nhớ: LRU bỏ các symbol ít dùng
+        predictor.feature_cache = FeatureCache(max_bytes=second.nbytes * 20)
+        for i in range(symbols):
+            await predictor.get_features(f"COIN{i}USDT")
+        cache = predictor.feature_cache.metrics()
+        assert cache['bytes'] <= cache['max_bytes']
+        assert cache['evictions'] == symbols - cache['entries'] > 0
+
+    asyncio.run(scenario())
+
+def test_lagging_data_is_cached_under_lookup_key(monkeypatch, lookups=20):
+    """Dữ liệu chưa có nến vừa đóng: entry được lưu theo key tra cứu, chỉ tải lại sau feature_retry_seconds"""
+    clock = FakeClock(1_700_000_000 + 1800)
+    monkeypatch.setattr(crypto_predictor, 'time', clock)
+
+    class LaggingClient(FakeKlineClient):
+        lag = True
+
+        async def get_historical_data(self, symbol, interval='1h', limit=100):
+            df = await super().get_historical_data(symbol, interval, limit)
+            return df.iloc[:-1] if self.lag else df
+
+    client = LaggingClient(clock)
+    predictor = CryptoPredictor(client)
+    predictor.feature_retry_seconds = 10
+
+    async def scenario():
+        stale = await predictor.get_features('BTCUSDT')
+        for _ in range(lookups):
+            assert await predictor.get_features('BTCUSDT') is stale
+        assert client.fetches == 1
+
+        # Hết thời gian chờ: tải lại, dữ liệu đã có nến vừa đóng thì entry được dùng tới nến sau
+        client.lag = False
+        clock.now += 11
+        fresh = await predictor.get_features('BTCUSDT')
+        assert fresh.closed_time == stale.closed_time + 3_600_000
+        clock.now += 600
+        for _ in range(lookups):
+            assert await predictor.get_features('BTCUSDT') is fresh
+        assert client.fetches == 2
+        assert len(predictor.feature_cache.entries) == 1
+
+    asyncio.run(scenario())
+
+def test_clock_behind_data_falls_back_to_dropping_running_candle(monkeypatch):
+    """Đồng hồ máy chậm hơn sàn cả một nến: không IndexError, vẫn trả về chỉ báo của các nến đã đóng"""
+    data_clock = FakeClock(1_700_000_000 + 1800)
+    client = FakeKlineClient(data_clock)
+    # Mọi nến tải về đều mới hơn key suy ra từ đồng hồ máy
+    monkeypatch.setattr(crypto_predictor, 'time', FakeClock(data_clock.now - 200 * 3600))
+    predictor = CryptoPredictor(client)
+
+    async def scenario():
+        features = await predictor.get_features('BTCUSDT')
+        df = await client.get_historical_data('BTCUSDT')
+        assert features is not None
+        assert features.closed_time == open_times_ms(df.index)[-2]
+        assert len(features.frame) == len(df) - 1
+
+    asyncio.run(scenario())
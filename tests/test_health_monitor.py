@@ -0,0 +1,65 @@
+import asyncio
+
+from aiohttp import web
+
+from health_monitor import HealthMonitor
+from tests.support import make_client, start_stub_server
+
+def test_is_connected_reads_cached_state_and_detects_outage():
+    """is_connected đọc trạng thái đã cache, upstream lỗi được phát hiện ở background"""
+    state = {'up': True}
+
+    async def ping(request):
+        if not state['up']:
+            return web.json_response({}, status=503)
+        return web.json_response({})
+
+    async def scenario():
+        runner, base_url = await start_stub_server({'/api/v3/ping': ping, '/ping': ping})
+        client = make_client(base_url)
+        client.market_caps.base_url = base_url
+        client.health_monitor = HealthMonitor(interval=0.05, timeout=1)
+        client.health_monitor.add_probe('binance', client.ping)
+        client.health_monitor.add_probe('coingecko', client.ping_coingecko)
+        await client.start()
+        try:
+            assert await client.health_monitor.wait_ready(2)
+            status = client.health_monitor.status('binance')
+            assert client.is_connected() and status['error_rate'] == 0.0
+            assert client.health_monitor.is_up('coingecko')
+
+            state['up'] = False
+            await asyncio.sleep(0.2)
+            assert not client.is_connected()
+            assert client.health_monitor.status('binance')['error_rate'] > 0
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+def test_third_party_probe_runs_on_its_own_interval():
+    """Probe có quota chạy theo chu kỳ riêng (dài), probe Binance vẫn chạy mỗi chu kỳ chung"""
+    calls = {'binance': 0, 'newsapi': 0}
+
+    def counting(name):
+        async def probe():
+            calls[name] += 1
+        return probe
+
+    async def scenario():
+        monitor = HealthMonitor(interval=0.05, timeout=1)
+        monitor.add_probe('binance', counting('binance'))
+        monitor.add_probe('newsapi', counting('newsapi'), interval=60)
+        monitor.start()
+        try:
+            assert await monitor.wait_ready(2)
+            await asyncio.sleep(0.3)
+        finally:
+            await monitor.stop()
+
+        assert calls['binance'] >= 4
+        assert calls['newsapi'] == 1
+        assert monitor.is_up('binance') and monitor.is_up('newsapi')
+
+    asyncio.run(scenario())
@@ -0,0 +1,97 @@
+import asyncio
+
+from aiohttp import web
+
+from host_pool import HostPool
+from tests.support import make_client, start_stub_server
+
+def test_circuit_opens_after_consecutive_failures_and_recovers():
+    """Cả hai host lỗi liên tục: circuit mở, request sau trả lỗi ngay; host hồi phục thì circuit đóng"""
+    failing = {'on': True}
+    sent = {'requests': 0}
+
+    async def ticker_price(request):
+        sent['requests'] += 1
+        if failing['on']:
+            return web.json_response({'code': -1000}, status=503)
+        return web.json_response({'symbol': request.query['symbol'], 'price': '65000.00'})
+
+    async def scenario():
+        servers = [await start_stub_server({'/api/v3/ticker/price': ticker_price}) for _ in range(2)]
+        client = make_client(servers[0][1])
+        client.host_pool = HostPool([url for _, url in servers], failure_threshold=3, open_seconds=0.3)
+        # Không gọi start(): request nền (exchangeInfo) không được làm lệch số lỗi liên tiếp
+        try:
+            errors = []
+            for i in range(20):
+                try:
+                    await client._request('/api/v3/ticker/price', {'symbol': f"COIN{i}USDT"})
+                except Exception as e:
+                    errors.append(type(e).__name__)
+            assert sent['requests'] == 6
+            assert len(errors) == 20 and errors.count('CircuitOpenError') == 17
+
+            failing['on'] = False
+            await asyncio.sleep(0.35)
+            price = await client._request('/api/v3/ticker/price', {'symbol': 'BTCUSDT'})
+            assert price['price'] == '65000.00'
+            assert not any(host['circuit_open'] for host in client.host_pool.metrics()['hosts'])
+        finally:
+            await client.close()
+            for runner, _ in servers:
+                await runner.cleanup()
+
+    asyncio.run(scenario())
+
+def test_unsampled_hosts_rank_after_measured_hosts():
+    """Host chưa có mẫu latency không được xếp trước host đã đo là nhanh"""
+    pool = HostPool(['https://a', 'https://b', 'https://c'], hedge_max_delay=1.0)
+    pool.record_success(pool.hosts[1], 0.2)
+    pool.record_success(pool.hosts[2], 1.5)
+    assert [host.url for host in pool.candidates()] == ['https://b', 'https://a', 'https://c']
+
+def test_heavy_requests_are_not_hedged(delay=0.3):
+    """Request nhẹ bị chậm được hedge sang host khác; ticker toàn thị trường (weight 80) thì không"""
+    hits = {'slow': 0, 'fast': 0}
+
+    def handler(name, wait):
+        async def respond(request):
+            hits[name] += 1
+            await asyncio.sleep(wait)
+            return web.json_response([] if request.path.endswith('24hr') else {'price': '1'})
+        return respond
+
+    async def scenario():
+        servers = [await start_stub_server({'/api/v3/ticker/price': handler(name, wait),
+                                            '/api/v3/ticker/24hr': handler(name, wait)})
+                   for name, wait in (('slow', delay), ('fast', 0))]
+        client = make_client(servers[0][1])
+        urls = [url for _, url in servers]
+        try:
+            for path, params, hedged in (('/api/v3/ticker/price', {'symbol': 'BTCUSDT'}, True),
+                                         ('/api/v3/ticker/24hr', None, False)):
+                # Pool mới mỗi lần: host chậm (chưa có mẫu) luôn là host chính
+                client.host_pool = HostPool(urls, hedge_max_delay=0.05)
+                hits.update(slow=0, fast=0)
+                await client._request(path, params)
+                assert client.host_pool.stats['hedges'] == int(hedged)
+                assert hits == {'slow': 1, 'fast': int(hedged)}
+        finally:
+            await client.close()
+            for runner, _ in servers:
+                await runner.cleanup()
+
+    asyncio.run(scenario())
+
+def test_explicit_zero_overrides_environment(monkeypatch):
+    """0 truyền vào là giá trị hợp lệ, không bị thay bằng mặc định hay biến môi trường"""
+    monkeypatch.setenv('BINANCE_HEDGE_MIN_DELAY', '0.2')
+    monkeypatch.setenv('BINANCE_CIRCUIT_OPEN_SECONDS', '60')
+    pool = HostPool(['http://a'], hedge_min_delay=0, open_seconds=0.0)
+    assert pool.hedge_min_delay == 0.0
+    assert pool.open_seconds == 0.0
+    assert pool.hedge_max_delay == 1.0
+
+    pool = HostPool(['http://a'])
+    assert pool.hedge_min_delay == 0.2
+    assert pool.open_seconds == 60.0
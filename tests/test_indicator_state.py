@@ -0,0 +1,76 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from crypto_predictor import CryptoPredictor
+from indicators import compute_indicators, FEATURE_COLUMNS
+from indicator_state import IndicatorState, IndicatorStates
+from tests.support import make_ohlcv
+
+OHLCV = ('open', 'high', 'low', 'close', 'volume')
+
+def test_incremental_features_match_engine(candles=600):
+    """State sau nến t bằng dòng t của engine tính trên cả chuỗi"""
+    df = make_ohlcv(candles, seed=11)
+    columns = [df[col].values for col in OHLCV]
+    full = compute_indicators(*columns)
+    full.update({col: df[col].values for col in ('open', 'high', 'low', 'volume')})
+    expected = np.column_stack([full[col] for col in FEATURE_COLUMNS])
+
+    state = IndicatorState()
+    actual = []
+    for i, values in enumerate(zip(*(c.tolist() for c in columns))):
+        state.update(i, *values)
+        actual.append(state.features())
+    actual = np.array(actual)
+
+    assert np.array_equal(np.isnan(expected), np.isnan(actual))
+    np.testing.assert_allclose(actual[~np.isnan(actual)], expected[~np.isnan(expected)], rtol=1e-9, atol=1e-9)
+
+def test_latest_features_match_prepare_features(candles=200, window=100):
+    """latest_features (nến cuối chưa đóng) khớp dòng cuối của prepare_features trên mọi nến đã thấy"""
+    df = make_ohlcv(candles, seed=11)
+    predictor = CryptoPredictor.__new__(CryptoPredictor)
+    predictor.indicator_state_enabled = True
+    predictor.indicator_states = IndicatorStates()
+    predictor.latest_features('BTCUSDT', df.iloc[:window])
+    for end in range(window + 1, candles + 1):
+        latest = predictor.latest_features('BTCUSDT', df.iloc[end - window:end])
+        X_full, _ = predictor.prepare_features(predictor.calculate_technical_indicators(df.iloc[:end].copy()))
+        np.testing.assert_allclose(latest.values, X_full.iloc[-1:].values, rtol=1e-9)
+
+def test_snapshot_restore_continues_identically():
+    df = make_ohlcv(100, seed=3)
+    state = IndicatorState()
+    for i, values in enumerate(zip(*(df[col].tolist() for col in OHLCV))):
+        state.update(i, *values)
+
+    restored = IndicatorState.restore(state.snapshot())
+    state.update(100, 1.0, 1.1, 0.9, 1.05, 10.0)
+    restored.update(100, 1.0, 1.1, 0.9, 1.05, 10.0)
+    assert np.array_equal(state.features(), restored.features(), equal_nan=True)
+
+def test_streaming_features_stay_close_to_training_window(candles=800, window=100, tolerance=0.02):
+    """Train/serve skew: state EMA/RSI seed từ cả lịch sử, prepare_features chỉ từ cửa sổ 100 nến.
+
+    Sai khác tính theo đơn vị của StandardScaler fit trên dữ liệu train (500 nến như train_model)
+    phải nhỏ hơn tolerance độ lệch chuẩn ở mọi cột, và dự đoán của model gần như không đổi.
+    """
+    df = make_ohlcv(candles, seed=11)
+    streaming = CryptoPredictor.__new__(CryptoPredictor)
+    streaming.indicator_state_enabled = True
+    streaming.indicator_states = IndicatorStates()
+    windowed = CryptoPredictor.__new__(CryptoPredictor)
+    windowed.indicator_state_enabled = False
+
+    X, y = windowed.prepare_features(windowed.calculate_technical_indicators(df.iloc[:500].copy()))
+    scaler = StandardScaler().fit(X)
+    model = LinearRegression().fit(scaler.transform(X), y)
+
+    streaming.latest_features('BTCUSDT', df.iloc[:window])
+    for end in range(window + 1, candles + 1):
+        frame = df.iloc[end - window:end]
+        live = scaler.transform(streaming.latest_features('BTCUSDT', frame))
+        trained = scaler.transform(windowed.latest_features('BTCUSDT', frame.copy()))
+        assert np.abs(live - trained).max() < tolerance
+        np.testing.assert_allclose(model.predict(live), model.predict(trained), rtol=1e-4)
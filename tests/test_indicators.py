@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from indicators import compute_indicators, INDICATOR_COLUMNS
+from tests.support import make_ohlcv, legacy_indicators
+
+OHLCV = ('open', 'high', 'low', 'close', 'volume')
+
+@pytest.mark.parametrize('candles', [10, 30, 500, 5000])
+def test_matches_ta_library(candles):
+    """Cùng giá trị (rtol 1e-9) và cùng vị trí NaN với thư viện ta, kể cả chuỗi ngắn hơn các cửa sổ"""
+    df = make_ohlcv(candles, seed=candles)
+    expected = legacy_indicators(df)
+    actual = compute_indicators(*(df[col].values for col in OHLCV))
+    for col in INDICATOR_COLUMNS:
+        a, b = expected[col].values, actual[col]
+        assert np.array_equal(np.isnan(a), np.isnan(b)), col
+        np.testing.assert_allclose(b[~np.isnan(b)], a[~np.isnan(a)], rtol=1e-9, atol=1e-9, err_msg=col)
+
+def test_batch_rows_match_single_symbol(symbols=20, candles=300):
+    """Mỗi dòng của batch giống khi tính riêng symbol đó"""
+    frames = [make_ohlcv(candles, seed=i) for i in range(symbols)]
+    batch = [np.stack([df[col].values for df in frames]) for col in OHLCV]
+    result = compute_indicators(*batch)
+    single = compute_indicators(*(frames[7][col].values for col in OHLCV))
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(result[col][7], single[col], equal_nan=True, err_msg=col)
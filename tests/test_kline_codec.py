@@ -0,0 +1,13 @@
+import numpy as np
+import pandas as pd
+
+from kline_codec import decode_klines
+from tests.support import make_klines_body, legacy_parse_klines
+
+def test_decode_matches_legacy_parser():
+    """Kết quả decoder NumPy giống hệt cách parse cũ (giá trị, dtype, index), kèm close time của từng nến"""
+    raw = make_klines_body(1000)
+    frame = decode_klines(raw).frame
+    pd.testing.assert_frame_equal(legacy_parse_klines(raw), frame.drop(columns='close_time'))
+    assert frame['close_time'].dtype == np.int64
+    assert (frame['close_time'].values == frame.index.values + 59999).all()
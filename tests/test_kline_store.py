@@ -0,0 +1,164 @@
+import asyncio
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import kline_store
+from kline_store import KlineStore, INTERVAL_MS
+from tests.support import FakeClock
+
+HOUR = INTERVAL_MS['1h']
+
+class ServerKlines:
+    """/klines giả lập theo đồng hồ của sàn: nến đang chạy có close = server time, gắn server time vào attrs"""
+
+    def __init__(self, now_ms):
+        self.now = now_ms
+
+    async def fetch(self, symbol, interval, start_time=None, end_time=None, limit=500):
+        running = kline_store.candle_open_time(self.now, interval)
+        opens = np.arange(start_time, min(end_time, running) + 1, HOUR, dtype=np.int64)
+        close = np.where(opens == running, float(self.now), opens.astype(float))
+        frame = pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close,
+                              'volume': np.ones(len(opens)), 'close_time': opens + HOUR - 1},
+                             index=pd.Index(opens, name='timestamp'))
+        frame.attrs['server_time'] = self.now
+        return frame
+
+def test_running_candle_is_not_persisted_when_local_clock_is_ahead(monkeypatch):
+    """Đồng hồ máy chạy trước sàn qua mốc giờ: nến sàn còn đang chạy không bị lưu như nến đã đóng"""
+    boundary = 1_700_002_800_000  # mốc giờ tròn
+    clock = FakeClock((boundary + 2_000) / 1000)
+    monkeypatch.setattr(kline_store, 'time', clock)
+    clock.monotonic = lambda: 0.0
+    server = ServerKlines(boundary - 3_000)
+    store = KlineStore(refresh_seconds=0)
+
+    async def scenario():
+        df = await store.get(server.fetch, 'BTCUSDT', '1h', 10)
+        # Nến cuối là nến đang chạy của sàn, không có trên đĩa
+        assert df.index[-1] == pd.to_datetime(boundary - HOUR, unit='ms')
+        assert df['close'].iloc[-1] == boundary - 3_000
+        assert boundary - HOUR not in store._load(('BTCUSDT', '1h')).index
+
+        # Sàn qua mốc giờ: nến được tải lại với giá trị cuối cùng rồi mới lưu
+        server.now = boundary + 10_000
+        clock.now = (boundary + 15_000) / 1000
+        await store.get(server.fetch, 'BTCUSDT', '1h', 10)
+        stored = store._load(('BTCUSDT', '1h'))
+        assert stored.loc[boundary - HOUR, 'close'] == boundary - HOUR
+        assert list(stored.columns) == kline_store.OHLCV_COLUMNS
+        assert not store._holes[('BTCUSDT', '1h')]
+
+    asyncio.run(scenario())
+
+def test_split_windows_align_to_interval_boundaries():
+    """Cửa sổ bắt đầu ở open time đầu tiên >= start_time, liền nhau, tối đa page_size nến"""
+    start = 1_700_002_800_000 + 1_234  # giữa nến 1h
+    end = start + 2_500 * HOUR
+    windows = kline_store.split_windows(start, end, '1h', page_size=1000)
+
+    assert windows[0][0] == 1_700_002_800_000 + HOUR
+    assert windows[-1][1] == end - 1
+    assert all(window_start % HOUR == 0 for window_start, _ in windows)
+    assert all(b[0] == a[1] + 1 for a, b in zip(windows, windows[1:]))
+    assert all((window_end + 1 - window_start) <= 1000 * HOUR for window_start, window_end in windows)
+    assert len(windows) == 3
+
+    # start_time đúng mốc giờ thì giữ nguyên
+    assert kline_store.split_windows(1_700_002_800_000, 1_700_002_800_000 + HOUR, '1h')[0][0] == 1_700_002_800_000
+
+def test_split_windows_weekly_candles_open_on_monday():
+    """Nến 1w của Binance mở 00:00 UTC thứ Hai, không phải thứ Năm như bội số tuần tính từ epoch"""
+    start = kline_store.to_milliseconds('2024-01-04 12:00')  # thứ Năm
+    end = kline_store.to_milliseconds('2024-03-01')
+    windows = kline_store.split_windows(start, end, '1w', page_size=3)
+
+    opens = [pd.Timestamp(window_start, unit='ms') for window_start, _ in windows]
+    assert opens[0] == pd.Timestamp('2024-01-08')
+    assert all(ts.dayofweek == 0 and ts == ts.normalize() for ts in opens)
+    assert kline_store.candle_open_time(start, '1w') == kline_store.to_milliseconds('2024-01-01')
+
+class RangeKlines:
+    """/klines giả lập trả về nến trong [start_time, end_time], ghi lại request và số request chạy đồng thời"""
+
+    def __init__(self, overlap=0, latency=0.0):
+        self.overlap = overlap
+        self.latency = latency
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def opens(self, interval, start_time, end_time):
+        return np.arange(start_time, end_time + 1, INTERVAL_MS[interval], dtype=np.int64)
+
+    async def fetch(self, symbol, interval, start_time=None, end_time=None, limit=500):
+        self.calls.append((start_time, end_time))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            # Trang chồng lên trang trước `overlap` nến (server trả thừa ở biên)
+            opens = self.opens(interval, start_time - self.overlap * INTERVAL_MS.get(interval, 0), end_time)[:limit]
+        finally:
+            self.in_flight -= 1
+        close = opens.astype(float)
+        return pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close,
+                             'volume': np.ones(len(opens))}, index=pd.Index(opens, name='timestamp'))
+
+def test_backfill_merges_overlapping_pages():
+    server = RangeKlines(overlap=3)
+    start = 1_700_002_800_000
+    end = start + 250 * HOUR
+
+    df = asyncio.run(kline_store.backfill(server.fetch, 'BTCUSDT', '1h', start, end, page_size=100))
+    assert len(server.calls) == 3
+    assert df.index.is_unique and df.index.is_monotonic_increasing
+    assert list(df.index) == list(range(start, end, HOUR))
+
+def test_backfill_bounds_concurrency_with_semaphore():
+    server = RangeKlines(latency=0.01)
+    start = 1_700_002_800_000
+
+    async def scenario():
+        return await kline_store.backfill(server.fetch, 'BTCUSDT', '1h', start, start + 1_000 * HOUR,
+                                          semaphore=asyncio.Semaphore(2), page_size=100)
+
+    df = asyncio.run(scenario())
+    assert len(server.calls) == 10 and len(df) == 1_000
+    assert server.max_in_flight == 2
+
+class MonthlyKlines(RangeKlines):
+    """Nến 1M mở vào ngày đầu tháng (độ dài không cố định)"""
+
+    def opens(self, interval, start_time, end_time):
+        months = pd.date_range(pd.Timestamp(start_time, unit='ms').ceil('D'), pd.Timestamp(end_time, unit='ms'),
+                               freq='MS')
+        return months.as_unit('ms').asi8.astype(np.int64)
+
+def test_monthly_backfill_pages_serially():
+    """'1M' không chia cửa sổ trước được: phân trang tuần tự theo open time của nến cuối"""
+    server = MonthlyKlines()
+    start = kline_store.to_milliseconds('2020-01-01')
+    end = kline_store.to_milliseconds('2024-01-01')
+
+    df = asyncio.run(kline_store.backfill(server.fetch, 'BTCUSDT', '1M', start, end, page_size=12))
+    assert len(df) == 48 and df.index.is_unique
+    assert server.max_in_flight == 1
+    assert [call[0] for call in server.calls[1:]] == [int(df.index[i]) + 1 for i in (11, 23, 35, 47)]
+    assert pd.Timestamp(df.index[-1], unit='ms') == pd.Timestamp('2023-12-01')
+
+@pytest.mark.parametrize('value, expected', [
+    (1_700_000_000_000, 1_700_000_000_000),
+    (np.int64(1_700_000_000_000), 1_700_000_000_000),
+    (1.7e12, 1_700_000_000_000),
+    (np.float64(1_700_000_000_000.0), 1_700_000_000_000),
+    ('1700000000000', 1_700_000_000_000),
+    ('2023-11-14 22:13:20', 1_700_000_000_000),
+    (pd.Timestamp('2023-11-14 22:13:20'), 1_700_000_000_000),
+    (datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc), 1_700_000_000_000),
+])
+def test_to_milliseconds(value, expected):
+    assert kline_store.to_milliseconds(value) == expected
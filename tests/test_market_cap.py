@@ -0,0 +1,93 @@
+import os
+import time
+import asyncio
+from types import SimpleNamespace
+
+from aiohttp import web
+
+import market_cap
+from market_cap import MarketCapCache
+from tests.support import make_client, start_stub_server
+
+COINS = [{'id': 'bitcoin', 'symbol': 'btc', 'name': 'Bitcoin'},
+         {'id': 'ethereum', 'symbol': 'eth', 'name': 'Ethereum'},
+         {'id': 'near', 'symbol': 'near', 'name': 'NEAR Protocol'},
+         {'id': 'near-fake', 'symbol': 'near', 'name': 'Near Fake'},
+         {'id': 'pepe', 'symbol': 'pepe', 'name': 'Pepe'}]
+MARKET_CAPS = {'bitcoin': 1.3e12, 'ethereum': 4e11, 'near': 6e9, 'near-fake': 1e4, 'pepe': 4e9}
+
+def start_coingecko(calls, coins=COINS, market_caps=MARKET_CAPS):
+    async def coins_list(request):
+        calls['list'] += 1
+        return web.json_response(coins)
+
+    async def coins_markets(request):
+        calls['markets'] += 1
+        calls.setdefault('ids', []).append(request.query['ids'].split(','))
+        return web.json_response([{
+            'id': coin_id, 'market_cap': market_caps[coin_id], 'total_supply': 1e9,
+            'circulating_supply': 9e8, 'max_supply': None
+        } for coin_id in request.query['ids'].split(',') if coin_id in market_caps])
+
+    return start_stub_server({'/coins/list': coins_list, '/coins/markets': coins_markets})
+
+def test_watchlist_in_one_request_and_cached(tmp_path):
+    """Market cap cả watchlist trong một request /coins/markets, symbol trùng chọn coin market cap lớn nhất"""
+    calls = {'list': 0, 'markets': 0}
+
+    async def scenario():
+        runner, base_url = await start_coingecko(calls)
+        client = make_client(base_url)
+        client.market_caps = MarketCapCache(client._fetch_json, base_url=base_url,
+                                            index_path=str(tmp_path / 'coins.json'),
+                                            watchlist=['BTC', 'ETH', 'NEAR', 'PEPE'])
+        try:
+            near = await client.get_market_cap_info('NEARUSDT')
+            pepe = [await client.get_market_cap_info('PEPEUSDT') for _ in range(10)]
+            btc = await client.get_market_cap_info('BTCUSDT')
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+        assert calls['list'] == 1 and calls['markets'] == 1
+        assert near['id'] == 'near'
+        assert pepe[-1]['market_cap'] == 4e9 and btc['market_cap'] == 1.3e12
+        assert os.path.exists(tmp_path / 'coins.json')
+
+    asyncio.run(scenario())
+
+def test_picks_largest_of_all_candidates_and_expires_idle_assets(tmp_path, monkeypatch):
+    """Coin thật đứng sau nhiều token trùng symbol vẫn được chọn; asset lâu không được hỏi thì thôi làm mới"""
+    coins = [{'id': f"near-clone-{i}", 'symbol': 'near', 'name': f"Clone {i}"} for i in range(8)]
+    coins += [{'id': 'near', 'symbol': 'near', 'name': 'NEAR Protocol'},
+              {'id': 'pepe', 'symbol': 'pepe', 'name': 'Pepe'}]
+    market_caps = {coin['id']: 1e4 for coin in coins} | {'near': 6e9, 'pepe': 4e9}
+    calls = {'list': 0, 'markets': 0}
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(market_cap, 'time', SimpleNamespace(monotonic=lambda: clock['now'], time=time.time))
+
+    async def scenario():
+        runner, base_url = await start_coingecko(calls, coins, market_caps)
+        client = make_client(base_url)
+        cache = MarketCapCache(client._fetch_json, base_url=base_url, index_path=str(tmp_path / 'coins.json'),
+                               ttl=60, track_ttl=600, watchlist=['BTC'])
+        try:
+            near = await cache.get('NEAR')
+            assert near['id'] == 'near'
+            assert len(calls['ids'][-1]) == 10
+
+            clock['now'] += 300
+            await cache.get('PEPE')
+            assert 'NEAR' in cache.tracked
+
+            # NEAR không được hỏi lại quá track_ttl: lần làm mới sau chỉ còn watchlist và PEPE
+            clock['now'] += 400
+            await cache.get('PEPE')
+            assert cache.tracked == {'BTC', 'PEPE'}
+            assert 'NEAR' not in cache.entries
+            assert set(calls['ids'][-1]) == {'bitcoin', 'pepe'}
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from market_universe import UniverseSnapshot
+from tests.support import make_client, start_stub_server, make_24hr_tickers, legacy_top_movers
+
+@pytest.mark.parametrize('limit, min_quote_volume', [
+    (10, 1000000),
+    (1, 1000000),
+    (37, 1000000),
+    (10, 0),
+    (10, 5e6),
+    (1000, 1000000),
+    (10, 1e12),
+])
+def test_top_movers_matches_sorted(limit, min_quote_volume):
+    """argpartition cho cùng kết quả và cùng thứ tự tie với sort ổn định của cách cũ"""
+    tickers = make_24hr_tickers()
+    snapshot = UniverseSnapshot(tickers)
+    assert snapshot.top_movers(limit, min_quote_volume) == legacy_top_movers(tickers, limit, min_quote_volume)
+
+def test_top_movers_ties_keep_ticker_order():
+    tickers = [{'symbol': symbol, 'lastPrice': '1', 'priceChangePercent': change, 'quoteVolume': '2000000'}
+               for symbol, change in [('AUSDT', '5'), ('BUSDT', '7'), ('CUSDT', '5'), ('DUSDT', '5'), ('EUSDT', '-1')]]
+    movers = UniverseSnapshot(tickers).top_movers(3)
+    assert [row['symbol'] for row in movers['gainers']] == ['BUSDT', 'AUSDT', 'CUSDT']
+    assert [row['symbol'] for row in movers['losers']] == ['EUSDT', 'AUSDT', 'CUSDT']
+
+def test_gainers_and_losers_share_snapshot():
+    """Gainers và losers đọc chung một snapshot /ticker/24hr tới khi hết TTL"""
+    calls = 0
+    tickers = make_24hr_tickers()
+
+    async def ticker_24hr(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return web.json_response(tickers)
+
+    async def scenario():
+        runner, base_url = await start_stub_server({'/api/v3/ticker/24hr': ticker_24hr})
+        client = make_client(base_url)
+        try:
+            gainers, losers = await asyncio.gather(client.get_top_gainers(5), client.get_top_losers(5))
+            assert await client.get_top_gainers(3) == gainers[:3]
+            assert calls == 1
+            expected = legacy_top_movers(tickers, 5)
+            assert (gainers, losers) == (expected['gainers'], expected['losers'])
+
+            # Hết TTL: tải lại đúng một lần
+            client.universe.fetched_at -= client.universe_ttl
+            await asyncio.gather(client.get_top_gainers(5), client.get_top_losers(5))
+            assert calls == 2
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
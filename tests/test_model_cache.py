@@ -0,0 +1,79 @@
+import time
+import asyncio
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from crypto_predictor import CryptoPredictor
+from model_cache import ModelCache
+from model_registry import ModelRegistry
+from model_training import make_candidates, select_model
+from tests.support import FakeKlineClient, FakeClock, make_ohlcv, publish_models
+
+SYMBOLS = [f"COIN{i}USDT" for i in range(30)]
+CORE = ('COIN0USDT', 'COIN1USDT', 'COIN2USDT')
+
+@pytest.fixture(scope='module')
+def published(tmp_path_factory):
+    """30 symbol trong registry (xen kẽ rf / gb / lr), cùng (model, scaler) tham chiếu và dữ liệu dự đoán"""
+    predictor = CryptoPredictor.__new__(CryptoPredictor)
+    X, y = predictor.prepare_features(predictor.calculate_technical_indicators(make_ohlcv(300, seed=6)))
+    trained = []
+    for name in ('rf', 'gb', 'lr'):
+        _, model, _ = select_model({name: make_candidates()[name]}, X.values, y.values, X.values, y.values)
+        trained.append((model, StandardScaler().fit(X)))
+    registry = ModelRegistry(root=str(tmp_path_factory.mktemp('registry')))
+    publish_models(registry, trained, SYMBOLS)
+    reference = {symbol: trained[i % len(trained)] for i, symbol in enumerate(SYMBOLS)}
+    return registry, reference, X.tail(5)
+
+@pytest.mark.parametrize('policy', ['lru', 'lfu'])
+def test_cache_bounded_pins_core_and_reloads(published, policy, requests=200):
+    """Bộ nhớ model không vượt giới hạn byte, watchlist chính không bị bỏ, model bị bỏ load lại đúng"""
+    registry, reference, rows = published
+    total_bytes = sum(registry.metadata(symbol, 1)['bytes'] for symbol in SYMBOLS)
+    rng = np.random.default_rng(7)
+    weights = 1.0 / np.arange(1, len(SYMBOLS) + 1) ** 1.1
+    trace = [SYMBOLS[i] for i in rng.choice(len(SYMBOLS), size=requests, p=weights / weights.sum())]
+
+    predictor = CryptoPredictor(FakeKlineClient(FakeClock(time.time())))
+    predictor.registry = registry
+    predictor.model_cache = ModelCache(max_bytes=total_bytes // 4, policy=policy, pinned=CORE)
+
+    async def scenario():
+        loaded_core = set()
+        try:
+            for symbol in trace:
+                loads = predictor.model_cache.stats['loads']
+                entry = await predictor.get_model(symbol)
+                assert entry is not None
+                if predictor.model_cache.stats['loads'] > loads:
+                    model, scaler = reference[symbol]
+                    np.testing.assert_allclose(entry.model.predict(entry.scaler.transform(rows)),
+                                               model.predict(scaler.transform(rows)))
+                assert predictor.model_cache.nbytes <= total_bytes // 4
+                if symbol in CORE:
+                    loaded_core.add(symbol)
+                assert all(s in predictor.model_cache for s in loaded_core)
+            assert predictor.model_cache.stats['evictions'] > 0
+        finally:
+            await predictor.close()
+
+    asyncio.run(scenario())
+
+def test_concurrent_misses_load_once(published):
+    """Nhiều request cùng miss một symbol chỉ load từ registry một lần"""
+    registry, _, _ = published
+    predictor = CryptoPredictor(FakeKlineClient(FakeClock(time.time())))
+    predictor.registry = registry
+
+    async def scenario():
+        try:
+            entries = await asyncio.gather(*[predictor.get_model(SYMBOLS[-1]) for _ in range(10)])
+            assert all(entries)
+            assert predictor.model_cache.stats['loads'] == 1
+        finally:
+            await predictor.close()
+
+    asyncio.run(scenario())
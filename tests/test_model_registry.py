@@ -0,0 +1,149 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+import crypto_predictor
+from crypto_predictor import CryptoPredictor
+from indicators import FEATURE_COLUMNS
+from model_cache import ModelCache
+from model_registry import ModelRegistry
+from model_training import make_candidates, select_model
+from retrain_scheduler import RetrainScheduler
+from training_queue import TrainingQueue
+from tests.support import FakeKlineClient, FakeClock, make_ohlcv, publish_models
+
+def test_hot_swap_rollback_restart_and_scheduler(monkeypatch, readers=5):
+    """Retrain hot swap khi đang dự đoán, metadata phiên bản, rollback, khởi động lại, scheduler"""
+    clock = FakeClock(time.time())
+    monkeypatch.setattr(crypto_predictor, 'time', clock)
+    client = FakeKlineClient(clock)
+    predictor = CryptoPredictor(client)
+    predictor.training_queue = TrainingQueue(max_workers=1)
+
+    async def scenario():
+        try:
+            await predictor.train_model('BTCUSDT')
+            v1 = predictor.model_cache.peek('BTCUSDT')
+
+            # Một giờ sau: dữ liệu mới, retrain trong khi các request dự đoán vẫn chạy
+            clock.now += 3600
+            features = (await predictor.get_features('BTCUSDT')).latest
+            expected = {1: v1.model.predict(v1.scaler.transform(features))[0]}
+            predictions = []
+            done = asyncio.Event()
+
+            async def reader():
+                while not done.is_set():
+                    prediction = await predictor.predict_price('BTCUSDT')
+                    predictions.append(prediction['predicted_price'] if prediction else None)
+                    await asyncio.sleep(0.005)
+
+            tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+            assert await predictor.train_model('BTCUSDT', retrain=True)
+            await asyncio.sleep(0.05)
+            done.set()
+            await asyncio.gather(*tasks)
+
+            v2 = predictor.model_cache.peek('BTCUSDT')
+            expected[2] = v2.model.predict(v2.scaler.transform(features))[0]
+            assert None not in predictions
+            seen = {version for version, price in expected.items() for p in predictions if np.isclose(p, price)}
+            assert seen == {1, 2}
+            assert all(any(np.isclose(p, price) for price in expected.values()) for p in predictions)
+
+            registry = predictor.registry
+            meta = registry.metadata('BTCUSDT', 2)
+            assert registry.versions('BTCUSDT') == [1, 2] and registry.current_version('BTCUSDT') == 2
+            assert meta['features'] == FEATURE_COLUMNS and meta['training_window']['samples'] > 0
+            assert 'mape' in meta['metrics']
+
+            # Rollback về v1
+            assert await predictor.rollback_model('BTCUSDT')
+            prediction = await predictor.predict_price('BTCUSDT')
+            assert registry.current_version('BTCUSDT') == 1
+            assert np.isclose(prediction['predicted_price'], expected[1])
+
+            # Khởi động lại: load phiên bản active từ registry
+            restarted = CryptoPredictor(client)
+            restarted.registry = registry
+            try:
+                assert await restarted.train_model('BTCUSDT')
+                assert restarted.model_versions['BTCUSDT']['version'] == 1
+            finally:
+                await restarted.close()
+
+            # Scheduler: chỉ retrain symbol chưa có model hoặc model quá cũ
+            scheduler = RetrainScheduler(predictor, watchlist=['BTCUSDT', 'ETHUSDT'], max_age_hours=1)
+            assert await scheduler.run_once() == {'ETHUSDT': True}
+            assert scheduler.in_window(datetime(2024, 1, 1, 4, tzinfo=timezone.utc))
+            assert not scheduler.in_window(datetime(2024, 1, 1, 12, tzinfo=timezone.utc))
+        finally:
+            await predictor.close()
+
+    asyncio.run(scenario())
+
+def test_bundles_load_lazily_and_detect_corruption(tmp_path, symbols=6):
+    """Khởi động chỉ đọc metadata, bundle được load khi cần, checksum phát hiện bundle hỏng"""
+    predictor = CryptoPredictor.__new__(CryptoPredictor)
+    X, y = predictor.prepare_features(predictor.calculate_technical_indicators(make_ohlcv(300, seed=5)))
+    trained = []
+    for name in ('lr', 'rf'):
+        _, model, _ = select_model({name: make_candidates()[name]}, X.values, y.values, X.values, y.values)
+        trained.append((model, StandardScaler().fit(X)))
+
+    registry = ModelRegistry(root=str(tmp_path / 'bundles'))
+    names = [f"COIN{i}USDT" for i in range(symbols)]
+    publish_models(registry, trained, names)
+
+    loader = CryptoPredictor.__new__(CryptoPredictor)
+    loader.registry = registry
+    loader.model_dir = str(tmp_path)
+    loader.model_cache, loader.model_versions = ModelCache(), {}
+
+    async def scenario():
+        assert len(loader.discover_models()) == symbols
+        assert not loader.model_cache
+
+        assert await loader.load_model(names[0])
+        entry = loader.model_cache.peek(names[0])
+        model, scaler = trained[0]
+        np.testing.assert_allclose(entry.model.predict(entry.scaler.transform(X)),
+                                   model.predict(scaler.transform(X)))
+        assert len(loader.model_cache) == 1
+
+        # Bundle format 1 (joblib) ghi trước khi đổi format vẫn load được
+        legacy = registry.staging_path(names[3])
+        joblib.dump({'format': 1, 'metadata': {}, 'model': trained[1][0], 'scaler': trained[1][1]}, legacy)
+        registry.activate(names[3], registry.commit(names[3], legacy, {'features': FEATURE_COLUMNS}))
+        assert await loader.load_model(names[3])
+        entry = loader.model_cache.peek(names[3])
+        np.testing.assert_allclose(entry.model.predict(entry.scaler.transform(X)),
+                                   trained[1][0].predict(trained[1][1].transform(X)))
+
+        # Bundle bị hỏng: không install model
+        path = registry.bundle_path(names[1], 1)
+        with open(path, 'r+b') as f:
+            f.seek(os.path.getsize(path) // 2)
+            f.write(b'\x00' * 16)
+        assert not await loader.load_model(names[1])
+        assert names[1] not in loader.model_cache
+
+    asyncio.run(scenario())
+
+    # Mỗi phiên bản là một file, không còn file tạm
+    assert sorted(os.listdir(registry._symbol_dir(names[2]))) == ['index.json', 'v1.bundle']
+
+def test_sweep_removes_only_stale_staging_files(tmp_path):
+    """File staging cũ (bot dừng khi worker đang ghi) bị xóa, file của job đang chạy thì giữ"""
+    registry = ModelRegistry(root=str(tmp_path / 'registry'))
+    stale, fresh = registry.staging_path('BTCUSDT'), registry.staging_path('BTCUSDT')
+    old = time.time() - 7200
+    os.utime(stale, (old, old))
+
+    assert registry.sweep_staging(max_age=3600) == 1
+    assert not os.path.exists(stale) and os.path.exists(fresh)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from crypto_predictor import CryptoPredictor
+from model_training import train_candidates
+from tests.support import make_ohlcv
+
+def make_datasets(symbols, seed=100):
+    predictor = CryptoPredictor.__new__(CryptoPredictor)
+    return [predictor.prepare_features(predictor.calculate_technical_indicators(make_ohlcv(500, seed=seed + i)))
+            for i in range(symbols)]
+
+def test_halving_keeps_quality_of_full_fit(symbols=3):
+    """Model chọn bằng successive halving tốt gần bằng model tốt nhất khi fit đủ mọi ứng viên"""
+    datasets = make_datasets(symbols)
+    full = [train_candidates(X, y, n_jobs=1, eta=1) for X, y in datasets]
+    halving = [train_candidates(X, y, n_jobs=1, eta=3) for X, y in datasets]
+    assert sum(b['mse'] for b in halving) / sum(a['mse'] for a in full) <= 1.05
+
+def test_parallel_fit_matches_serial():
+    """Fit song song (thread) cho cùng model và MSE với fit tuần tự"""
+    X, y = make_datasets(1)[0]
+    serial = train_candidates(X, y, n_jobs=1, eta=3)
+    parallel = train_candidates(X, y, n_jobs=2, eta=3)
+    assert serial['name'] == parallel['name']
+    assert np.isclose(serial['mse'], parallel['mse'])
@@ -0,0 +1,106 @@
+import json
+import asyncio
+
+from order_book import DepthStream
+from tests.support import record_depth_diffs, reference_top, make_depth_snapshot
+
+def test_replay_matches_reference_and_resyncs_on_gap(events=2000):
+    """Replay diff depth đã ghi khớp book tham chiếu; hụt sequence thì đồng bộ lại bằng snapshot mới"""
+    diffs, states = record_depth_diffs(events)
+    snapshot_at = {'index': 100}
+    snapshots = 0
+
+    async def fetch_snapshot(symbol, limit):
+        # Snapshot chụp giữa event `index` (lastUpdateId nằm trong [U, u] của event đó)
+        nonlocal snapshots
+        snapshots += 1
+        i = snapshot_at['index']
+        return make_depth_snapshot(states[i - 1], diffs[i]['U'])
+
+    async def scenario():
+        stream = DepthStream(fetch_snapshot, symbols=['BTCUSDT'])
+
+        # Các diff tới trước khi snapshot về được buffer lại
+        for event in diffs[:150]:
+            stream.handle_message(json.dumps({'stream': 'btcusdt@depth@100ms', 'data': event}))
+        await asyncio.gather(*stream._sync_tasks.values())
+        for event in diffs[150:1000]:
+            stream.handle_message(json.dumps(event))
+
+        book = stream.get_book('BTCUSDT')
+        assert book is not None
+        assert book.top(1000) == reference_top(states[999], 1000)
+
+        # Mất event 1000: phát hiện hụt sequence và đồng bộ lại
+        snapshot_at['index'] = 1005
+        for event in diffs[1001:1010]:
+            stream.handle_message(json.dumps(event))
+        await asyncio.gather(*stream._sync_tasks.values())
+        for event in diffs[1010:]:
+            stream.handle_message(json.dumps(event))
+
+        book = stream.get_book('BTCUSDT')
+        assert book is not None
+        assert book.stats['resyncs'] == 1 and snapshots == 2
+        assert book.top(1000) == reference_top(states[-1], 1000)
+
+    asyncio.run(scenario())
+
+def test_failed_sync_backs_off_with_one_task_per_symbol(duration=1.5):
+    """Snapshot không bao giờ khớp: chỉ một task đồng bộ cho symbol, sau vài lần thử thì giãn dần thay vì lặp lại"""
+    diffs, states = record_depth_diffs(400)
+    snapshots = 0
+
+    async def fetch_snapshot(symbol, limit):
+        # Snapshot luôn cũ hơn diff đầu tiên trong buffer
+        nonlocal snapshots
+        snapshots += 1
+        return make_depth_snapshot(states[0], diffs[0]['U'] - 10)
+
+    async def scenario():
+        stream = DepthStream(fetch_snapshot, symbols=['BTCUSDT'])
+        stream.max_sync_attempts, stream.min_backoff, stream.max_backoff = 2, 0.5, 0.5
+        tasks = set()
+        try:
+            for event in diffs[:int(duration / 0.01)]:
+                stream.handle_message(json.dumps(event))
+                tasks.add(stream._sync_tasks['BTCUSDT'])
+                await asyncio.sleep(0.01)
+        finally:
+            await stream.stop()
+
+        assert len(tasks) == 1
+        # 2 lần thử nhanh, sau đó tối đa một snapshot mỗi 0.5s
+        assert snapshots <= 2 + duration / 0.5
+
+    asyncio.run(scenario())
+
+def test_idle_books_evicted_in_lru_order_and_unsubscribed():
+    """Đủ số symbol: book rảnh lâu nhất bị bỏ kèm UNSUBSCRIBE, book cấu hình sẵn và book đang dùng được giữ"""
+    sent = []
+
+    class RecordingWebSocket:
+        closed = False
+
+        async def send_json(self, payload):
+            sent.append(payload)
+
+    async def fetch_snapshot(symbol, limit):
+        return make_depth_snapshot({'bids': {}, 'asks': {}}, 1)
+
+    async def scenario():
+        stream = DepthStream(fetch_snapshot, symbols=['BTCUSDT'], max_symbols=3, idle_seconds=0.1)
+        stream._ws = RecordingWebSocket()
+        assert await stream.subscribe('ETHUSDT') and await stream.subscribe('SOLUSDT')
+        assert not await stream.subscribe('XRPUSDT')
+
+        await asyncio.sleep(0.15)
+        stream.get_book('ETHUSDT')
+        assert await stream.subscribe('XRPUSDT')
+
+        assert list(stream.books) == ['BTCUSDT', 'ETHUSDT', 'XRPUSDT']
+        assert [(msg['method'], msg['params']) for msg in sent[-2:]] == [
+            ('UNSUBSCRIBE', ['solusdt@depth@100ms']), ('SUBSCRIBE', ['xrpusdt@depth@100ms'])
+        ]
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+import time
+import asyncio
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+import crypto_predictor
+from crypto_predictor import CryptoPredictor
+from batch_predict import predict_rows
+from model_registry import ModelRegistry
+from model_training import make_candidates, select_model, _limit_threads
+from training_queue import TrainingQueue
+from tests.support import FakeKlineClient, FakeClock, make_ohlcv, publish_models
+
+def test_predict_many_matches_predict_price_and_isolates_failures(tmp_path, monkeypatch, symbols=12):
+    """predict_many cho cùng kết quả với predict_price từng symbol; symbol lỗi không làm hỏng batch"""
+    predictor = CryptoPredictor.__new__(CryptoPredictor)
+    X, y = predictor.prepare_features(predictor.calculate_technical_indicators(make_ohlcv(300, seed=8)))
+    trained = []
+    for name in ('rf', 'gb', 'lr'):
+        _, model, _ = select_model({name: make_candidates()[name]}, X.values, y.values, X.values, y.values)
+        trained.append((_limit_threads(model, 1), StandardScaler().fit(X)))
+    registry = ModelRegistry(root=str(tmp_path / 'predict-many'))
+    names = [f"COIN{i}USDT" for i in range(symbols)]
+    publish_models(registry, trained, names)
+
+    clock = FakeClock(time.time())
+    monkeypatch.setattr(crypto_predictor, 'time', clock)
+    client = FakeKlineClient(clock)
+    predictor = CryptoPredictor(client)
+    predictor.registry = registry
+    predictor.training_queue = TrainingQueue(max_workers=1)
+
+    async def scenario():
+        try:
+            serial = {symbol: await predictor.predict_price(symbol) for symbol in names}
+            batched = await predictor.predict_many(names)
+            assert sorted(batched) == sorted(names)
+            for symbol in names:
+                assert np.isclose(batched[symbol]['predicted_price'], serial[symbol]['predicted_price'])
+                assert batched[symbol]['recommendation'] == serial[symbol]['recommendation']
+
+            # Không tải được dữ liệu, chưa có model: các symbol khác vẫn có kết quả
+            client.failing.add('BROKENUSDT')
+            clock.now += 3600
+            partial = await predictor.predict_many(names[:5] + ['BROKENUSDT'])
+            assert sorted(partial) == sorted(names[:5])
+
+            sentiment = await predictor.get_market_sentiment(names)
+            assert sentiment is not None and len(sentiment['predictions']) == symbols
+        finally:
+            await predictor.close()
+
+    asyncio.run(scenario())
+
+def test_predict_rows_calls_each_model_once():
+    """Mỗi model gọi predict() một lần cho mọi dòng của nó; model lỗi chỉ cho NaN ở dòng của nó"""
+    predictor = CryptoPredictor.__new__(CryptoPredictor)
+    X, y = predictor.prepare_features(predictor.calculate_technical_indicators(make_ohlcv(300, seed=9)))
+    models = {}
+    for name in ('rf', 'gb', 'lr'):
+        _, models[name], _ = select_model({name: make_candidates()[name]}, X.values, y.values, X.values, y.values)
+
+    calls = []
+
+    class Counting:
+        def __init__(self, model):
+            self.model = model
+            self.n_features_in_ = model.n_features_in_
+
+        def predict(self, rows):
+            calls.append(len(rows))
+            return self.model.predict(rows)
+
+    class Broken:
+        def predict(self, rows):
+            raise ValueError("hỏng")
+
+    rf, gb, broken = Counting(models['rf']), Counting(models['gb']), Broken()
+    row_models = [rf, gb, models['lr'], rf, broken, gb, rf]
+    rows = X.values[:len(row_models)]
+    predicted = predict_rows(row_models, rows)
+
+    assert sorted(calls) == [2, 3]
+    expected = [getattr(model, 'model', model).predict(rows[i:i + 1])[0] if model is not broken else np.nan
+                for i, model in enumerate(row_models)]
+    np.testing.assert_allclose(predicted, expected)
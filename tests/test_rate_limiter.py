@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RequestScheduler, request_weight, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from tests.support import FakeClock
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Đồng hồ monotonic giả chỉ cho rate_limiter, không đụng tới đồng hồ của event loop"""
+    clock = FakeClock(1000.0)
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=clock.time))
+    return clock
+
+async def advance(clock, scheduler, seconds):
+    """Tua đồng hồ rồi đánh thức dispatcher để nó kiểm tra lại bucket"""
+    clock.now += seconds
+    scheduler._wakeup.set()
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+@pytest.mark.parametrize('path, params, weight', [
+    ('/api/v3/ticker/24hr', {'symbol': 'BTCUSDT'}, 2),
+    ('/api/v3/ticker/24hr', {'symbols': ','.join(['"BTCUSDT"'] * 20)}, 2),
+    ('/api/v3/ticker/24hr', {'symbols': ','.join(['"BTCUSDT"'] * 21)}, 40),
+    ('/api/v3/ticker/24hr', {'symbols': ','.join(['"BTCUSDT"'] * 101)}, 80),
+    ('/api/v3/ticker/24hr', None, 80),
+    ('/api/v3/ticker/price', {'symbol': 'BTCUSDT'}, 2),
+    ('/api/v3/ticker/price', None, 4),
+    ('/api/v3/depth', None, 5),
+    ('/api/v3/depth', {'limit': 500}, 25),
+    ('/api/v3/depth', {'limit': 1000}, 50),
+    ('/api/v3/depth', {'limit': 5000}, 250),
+    ('/api/v3/exchangeInfo', None, 20),
+    ('/api/v3/klines', {'symbol': 'BTCUSDT', 'limit': 1000}, 2),
+    ('/api/v3/ping', None, 1),
+])
+def test_request_weight_table(path, params, weight):
+    assert request_weight(path, params) == weight
+
+def test_interactive_requests_jump_queued_background(clock):
+    """Khi bucket cạn, request tương tác đang chờ được cấp trước job nền vào hàng đợi trước nó"""
+    scheduler = RequestScheduler(weight_limit=60, background_reserve=0)
+
+    async def scenario():
+        await scheduler.acquire(60)
+        background = asyncio.create_task(scheduler.acquire(10, PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(scheduler.acquire(10, PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        assert scheduler.metrics()['queue_interactive'] == 1
+        assert scheduler.metrics()['queue_background'] == 1
+
+        # Refill 1 weight/s: đủ cho đúng một request
+        await advance(clock, scheduler, 10)
+        assert interactive.done() and not background.done()
+
+        await advance(clock, scheduler, 10)
+        assert background.done()
+        assert scheduler.metrics()['queue_depth'] == 0
+
+    asyncio.run(scenario())
+
+def test_background_waits_for_reserve(clock):
+    """Job nền chỉ chạy khi còn đủ reserve + weight; request tương tác được dùng cả phần reserve"""
+    scheduler = RequestScheduler(weight_limit=120, background_reserve=0.25)
+
+    async def scenario():
+        await scheduler.acquire(80, PRIORITY_BACKGROUND)
+        assert scheduler.tokens == 40
+
+        background = asyncio.create_task(scheduler.acquire(20, PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        assert not background.done()
+
+        # Request tương tác không phải xếp sau job nền và được tiêu vào reserve
+        await scheduler.acquire(30, PRIORITY_INTERACTIVE)
+        assert scheduler.tokens == 10
+
+        # Refill 2 weight/s: cần tokens >= 30 (reserve) + 20, tức 20s
+        await advance(clock, scheduler, 19)
+        assert not background.done()
+        await advance(clock, scheduler, 1)
+        assert background.done()
+        assert scheduler.tokens == 30
+
+    asyncio.run(scenario())
+
+def test_used_weight_header_clamps_bucket(clock):
+    """Header X-MBX-USED-WEIGHT-1M chỉ hạ bucket xuống, không cộng thêm budget đã tiêu cục bộ"""
+    scheduler = RequestScheduler(weight_limit=6000, background_reserve=0)
+
+    scheduler.update_from_response(200, {'X-MBX-USED-WEIGHT-1M': '5000', 'x-mbx-used-weight': 'x'})
+    assert scheduler.used_weight == {'1m': 5000}
+    assert scheduler.tokens == 1000
+
+    scheduler.charge(900)
+    scheduler.update_from_response(200, {'X-MBX-USED-WEIGHT-1M': '100'})
+    assert scheduler.tokens == 100
+    assert scheduler.metrics()['used_weight'] == {'1m': 100}
+
+@pytest.mark.parametrize('status', [429, 418])
+def test_retry_after_pauses_all_requests(clock, status):
+    """429/418: dừng mọi request (kể cả tương tác) tới hết Retry-After dù bucket còn đầy"""
+    scheduler = RequestScheduler(weight_limit=6000, background_reserve=0)
+
+    async def scenario():
+        scheduler.update_from_response(status, {'Retry-After': '30'})
+        assert scheduler.metrics()['paused_for'] == 30
+        assert scheduler.stats['throttled'] == 1
+
+        request = asyncio.create_task(scheduler.acquire(1))
+        await asyncio.sleep(0)
+        await advance(clock, scheduler, 29)
+        assert not request.done()
+        await advance(clock, scheduler, 1)
+        assert request.done()
+        assert scheduler.metrics()['paused_for'] == 0
+
+    asyncio.run(scenario())
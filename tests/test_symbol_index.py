@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from symbol_index import SymbolIndex
+from tests.support import make_client, start_stub_server, make_exchange_info
+
+EXTRA = [
+    ('BTCUSDT', 'BTC', 'USDT', 'TRADING'),
+    ('WBTCUSDT', 'WBTC', 'USDT', 'TRADING'),
+    ('BTCDOMUSDT', 'BTCDOM', 'USDT', 'TRADING'),
+    ('BTCUPUSDT', 'BTCUP', 'USDT', 'BREAK'),
+    ('BTCBUSD', 'BTC', 'BUSD', 'TRADING'),
+]
+
+def make_index(path=None):
+    index = SymbolIndex(path)
+    index.load_exchange_info(make_exchange_info(EXTRA, coins=50))
+    return index
+
+def test_search_ranking_and_filters():
+    """Khớp chính xác > base asset > prefix > substring base > substring symbol; lọc theo quote/status"""
+    index = make_index()
+
+    assert index.search('btc/usdt') == ['BTCUSDT', 'WBTCUSDT']
+    assert index.search('BTC', quote_asset='USDT') == ['BTCUSDT', 'BTCDOMUSDT', 'WBTCUSDT']
+    assert index.search('BTC', quote_asset='USDT', status=None) == ['BTCUSDT', 'BTCUPUSDT', 'BTCDOMUSDT', 'WBTCUSDT']
+    assert index.search('BTC', quote_asset='BUSD') == ['BTCBUSD']
+    # Không lọc quote: cặp quote BTC chỉ khớp substring symbol nên xếp cuối
+    results = index.search('BTC')
+    assert results[:4] == ['BTCBUSD', 'BTCUSDT', 'BTCDOMUSDT', 'WBTCUSDT']
+    assert all(symbol.endswith('BTC') for symbol in results[4:]) and len(results) == 20
+    assert len(index.search('COIN', limit=5)) == 5
+    assert index.search(' / ') == []
+
+def test_prefix_table_sorted_by_length():
+    index = make_index()
+
+    assert index.prefix('btcu') == ['BTCUSDT', 'BTCUPUSDT']
+    assert index.prefix('COIN1B') == ['COIN1BTC', 'COIN1BUSD']
+    assert index.prefix('XRP') == []
+    assert index.is_trading('BTCUSDT') and not index.is_trading('BTCUPUSDT')
+    assert index.get_filters('BTCUSDT')['PRICE_FILTER']['tickSize'] == '0.01'
+
+def test_save_load_round_trip(tmp_path):
+    """Lưu atomic rồi load lại cho cùng index và cùng kết quả tìm kiếm"""
+    path = str(tmp_path / 'cache' / 'exchange_info.json')
+    index = make_index(path)
+    assert index.save()
+    assert os.listdir(tmp_path / 'cache') == ['exchange_info.json']
+
+    loaded = SymbolIndex(path)
+    assert loaded.load()
+    assert loaded.symbols == index.symbols
+    assert loaded.updated_at == index.updated_at
+    assert loaded.prefix('BTC') == index.prefix('BTC')
+    assert loaded.search('BTC', quote_asset='USDT') == index.search('BTC', quote_asset='USDT')
+
+@pytest.mark.parametrize('cache, refetches', [
+    ('fresh', 0),
+    ('stale', 1),
+    ('corrupt', 1),
+    ('missing', 1),
+])
+def test_client_falls_back_to_exchange_info(cache, refetches):
+    """Index trên đĩa còn hạn thì dùng luôn; hết hạn, hỏng hoặc không có thì tải lại /exchangeInfo"""
+    calls = 0
+
+    async def exchange_info(request):
+        nonlocal calls
+        calls += 1
+        return web.json_response(make_exchange_info(EXTRA, coins=50))
+
+    async def scenario():
+        runner, base_url = await start_stub_server({'/api/v3/exchangeInfo': exchange_info})
+        client = make_client(base_url)
+        path = client.symbol_index.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if cache == 'corrupt':
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('{"updated_at": 1, "symbols": {')
+        elif cache != 'missing':
+            saved = make_index(path)
+            if cache == 'stale':
+                saved.updated_at = time.time() - client.exchange_info_ttl - 1
+            saved.save()
+        try:
+            assert await client.search_symbols('BTC') == ['BTCUSDT', 'BTCDOMUSDT', 'WBTCUSDT']
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+        assert calls == refetches
+        with open(path, 'r', encoding='utf-8') as f:
+            assert 'BTCUSDT' in json.load(f)['symbols']
+
+    asyncio.run(scenario())
@@ -0,0 +1,67 @@
+import time
+import asyncio
+
+import pytest
+
+from crypto_predictor import CryptoPredictor
+from training_queue import TrainingQueue, QueueFullError
+from tests.support import FakeKlineClient, FakeClock
+
+def test_jobs_deduplicated_cancelled_and_bounded():
+    """Job trùng symbol được gộp, predict_price chờ job training, job hủy báo cancelled, hàng đợi có giới hạn"""
+    predictor = CryptoPredictor(FakeKlineClient(FakeClock(time.time())))
+    predictor.training_queue = TrainingQueue(max_workers=2, max_pending=3)
+
+    async def scenario():
+        try:
+            results = await asyncio.gather(*[predictor.train_model('BTCUSDT', retrain=True) for _ in range(5)])
+            queue = predictor.training_queue.metrics()
+            assert all(results)
+            assert queue['submitted'] == 1 and queue['deduplicated'] == 4
+            assert 'BTCUSDT' in predictor.model_cache
+
+            prediction = await predictor.predict_price('ETHUSDT')
+            assert prediction is not None
+            assert predictor.training_queue.status('ETHUSDT')['status'] == 'done'
+
+            waiting = asyncio.create_task(predictor.train_model('SOLUSDT', retrain=True))
+            await asyncio.sleep(0)
+            assert predictor.training_queue.cancel('SOLUSDT')
+            assert await waiting is False
+            assert predictor.training_queue.status('SOLUSDT')['status'] == 'cancelled'
+
+            for symbol in ('AUSDT', 'BUSDT', 'CUSDT'):
+                predictor.training_queue.submit(symbol, lambda: asyncio.sleep(0.2))
+            with pytest.raises(QueueFullError):
+                predictor.training_queue.submit('DUSDT', lambda: asyncio.sleep(0.2))
+        finally:
+            await predictor.close()
+
+    asyncio.run(scenario())
+
+def test_cancelled_job_removes_staging_after_worker_finishes(isolated_dirs):
+    """Hủy job khi worker đang fit: file staging được xóa sau khi worker ghi xong, không bị bỏ lại"""
+    predictor = CryptoPredictor(FakeKlineClient(FakeClock(time.time())))
+    predictor.training_queue = TrainingQueue(max_workers=1)
+    staging_files = lambda: list((isolated_dirs / 'registry').glob('*/.staging-*'))
+
+    async def scenario():
+        try:
+            waiting = asyncio.create_task(predictor.train_model('BTCUSDT', retrain=True))
+            for _ in range(500):
+                if staging_files():
+                    break
+                await asyncio.sleep(0.01)
+            assert staging_files()
+            assert predictor.training_queue.cancel('BTCUSDT')
+            assert await waiting is False
+
+            # Một worker duy nhất: job sau chỉ chạy khi worker training đã xong
+            await predictor.training_queue.run_in_worker(time.time)
+            await asyncio.sleep(0.05)
+            assert staging_files() == []
+            assert predictor.registry.versions('BTCUSDT') == []
+        finally:
+            await predictor.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,162 @@
+import os
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Hàng đợi training đã đầy"""
+
+class TrainingJob:
+    """Một job training theo symbol: trạng thái queued -> running -> done/failed/cancelled"""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.status = 'queued'
+        self.task = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def info(self):
+        return {
+            'symbol': self.symbol,
+            'status': self.status,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'wait_seconds': (self.started_at or time.time()) - self.submitted_at,
+            'run_seconds': (self.finished_at or time.time()) - self.started_at if self.started_at else None
+        }
+
+class TrainingQueue:
+    """Hàng đợi training có giới hạn: phần CPU chạy trong ProcessPoolExecutor, mỗi symbol tối đa một job"""
+
+    def __init__(self, max_workers=None, max_pending=None, cpu_budget=None):
+        self.max_workers = int(max_workers or os.getenv('TRAINING_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+        self.max_pending = int(max_pending or os.getenv('TRAINING_QUEUE_SIZE', '20'))
+        # Tổng số core dành cho training, chia đều cho các worker
+        self.cpu_budget = int(cpu_budget or os.getenv('TRAINING_CPU_BUDGET', str(os.cpu_count() or 1)))
+        self.job_cpus = max(1, self.cpu_budget // self.max_workers)
+        # Worker không fork từ process bot (đang có event loop, thread, socket): forkserver, hoặc spawn nếu không hỗ trợ
+        start_method = os.getenv('TRAINING_START_METHOD', 'forkserver')
+        if start_method not in multiprocessing.get_all_start_methods():
+            start_method = 'spawn'
+        self.start_method = start_method
+        self.jobs = {}          # symbol -> TrainingJob gần nhất
+        self._executor = None
+        self._slots = None
+        self.stats = {'submitted': 0, 'deduplicated': 0, 'rejected': 0,
+                      'done': 0, 'failed': 0, 'cancelled': 0}
+
+    @property
+    def executor(self):
+        # Process pool chỉ được tạo khi có job đầu tiên
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context(self.start_method))
+        return self._executor
+
+    def pending(self):
+        return sum(1 for job in self.jobs.values() if job.active())
+
+    def submit(self, symbol, job_func):
+        """Đưa job_func() (coroutine function) vào hàng đợi; symbol đang có job thì dùng lại job đó"""
+        job = self.jobs.get(symbol)
+        if job is not None and job.active():
+            self.stats['deduplicated'] += 1
+            return job
+
+        if self.pending() >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise QueueFullError(f"Hàng đợi training đầy ({self.max_pending} job)")
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        job = TrainingJob(symbol)
+        job.task = asyncio.ensure_future(self._run(job, job_func))
+        job.task.add_done_callback(lambda task: self._finished(job, task))
+        self.jobs[symbol] = job
+        self.stats['submitted'] += 1
+        return job
+
+    async def _run(self, job, job_func):
+        try:
+            async with self._slots:
+                job.status = 'running'
+                job.started_at = time.time()
+                job.result = await job_func()
+            job.status = 'done'
+            self.stats['done'] += 1
+            return job.result
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e) or type(e).__name__
+            self.stats['failed'] += 1
+            logger.error(f"Job training {job.symbol} lỗi: {job.error}")
+            raise
+        finally:
+            job.finished_at = time.time()
+
+    def _finished(self, job, task):
+        if task.cancelled():
+            # Job bị hủy khi đang chờ slot hoặc đang chạy
+            job.status = 'cancelled'
+            job.finished_at = job.finished_at or time.time()
+            self.stats['cancelled'] += 1
+        else:
+            # Đánh dấu exception đã được xử lý (đã log trong _run)
+            task.exception()
+
+    async def run_in_worker(self, func, *args):
+        """Chạy func(*args) trong process pool, không chặn event loop"""
+        # Khởi động worker bằng forkserver/spawn mất hàng trăm ms: submit ở thread riêng
+        future = await asyncio.to_thread(self.executor.submit, func, *args)
+        return await asyncio.wrap_future(future)
+
+    async def wait(self, symbol, timeout=None):
+        """Chờ job của symbol; caller bị hủy hoặc hết timeout không làm hủy job"""
+        job = self.jobs.get(symbol)
+        if job is None:
+            return None
+        return await asyncio.wait_for(asyncio.shield(job.task), timeout)
+
+    def status(self, symbol):
+        job = self.jobs.get(symbol)
+        return job.info() if job else None
+
+    def cancel(self, symbol):
+        """Hủy job của symbol. Job đang fit trong worker thì kết quả bị bỏ, process vẫn chạy nốt phần đang làm"""
+        job = self.jobs.get(symbol)
+        if job is None or not job.active():
+            return False
+        job.task.cancel()
+        return True
+
+    def metrics(self):
+        return {
+            **self.stats,
+            'pending': self.pending(),
+            'running': sum(1 for job in self.jobs.values() if job.status == 'running'),
+            'max_pending': self.max_pending,
+            'workers': self.max_workers,
+            'job_cpus': self.job_cpus
+        }
+
+    async def close(self):
+        """Hủy các job còn lại và tắt process pool"""
+        for job in self.jobs.values():
+            if job.active():
+                job.task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None